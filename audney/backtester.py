@@ -0,0 +1,225 @@
+# Import necessary modules
+import re
+import logging
+import numpy as np
+from datetime import date
+from .market_data import get_bars, find_mentioned_tickers
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Names people use for series we store under a ticker
+BACKTEST_ALIASES = {
+    'bitcoin': 'X:BTCUSD',
+    'btc': 'X:BTCUSD',
+    's&p 500': 'SPY',
+    's&p500': 'SPY',
+    'clorox': 'CLX',
+}
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+          'november', 'december']
+
+AMOUNT_PATTERN = re.compile(r'\$\s?(\d[\d,]*(?:\.\d+)?)\s*(k|thousand)?\b', re.IGNORECASE)
+MONTHLY_PATTERN = re.compile(r'(?:/|\bper\b|\ba\b|\bevery\b|\beach\b)\s*month\b|\bmonthly\b', re.IGNORECASE)
+START_PATTERN = re.compile(r'\b(?:since|in|from|starting(?: in)?|back in)\s+(?:(' + '|'.join(MONTHS) + r')\s+)?((?:19|20)\d{2})\b', re.IGNORECASE)
+YEARS_AGO_PATTERN = re.compile(r'\b(\d{1,2})\s+years?\s+ago\b', re.IGNORECASE)
+
+DAYS_PER_YEAR = 365.25
+
+# Start dates held for less than this are left out of the range of outcomes; their annualized returns are noise
+MIN_YEARS_FOR_RANGE = 1
+
+# Newton iterations for the money-weighted return of contribution schedules
+IRR_ITERATIONS = 50
+
+# Start dates evaluated together in one (starts, days) matrix, which bounds memory for long histories
+BACKTEST_CHUNK = 64
+
+# Most start dates sampled (one per month) for the range of outcomes
+MAX_RANGE_STARTS = 360
+
+
+# Function to get the first trading day of each month in a date array
+def first_trading_days(dates):
+    months = dates.astype('datetime64[M]')
+    return np.concatenate([[True], months[1:] != months[:-1]])
+
+
+# Function to backtest investing in one price series from many start dates at once
+def backtest(closes, dates, starts, amount, monthly=False):
+    """
+    Runs a lump-sum investment of `amount` (or, with monthly=True, `amount` on the start day and
+    again on the first trading day of every later month) from every start index in `starts`,
+    holding to the last bar. Start dates are evaluated BACKTEST_CHUNK at a time on a
+    (starts, days) value matrix, so memory stays bounded however many starts are asked for.
+
+    Returns a dict of arrays with one entry per start: 'total_invested', 'final_value',
+    'annual_return' (CAGR for lump sums, money-weighted for contributions) and 'max_drawdown'
+    of the account value.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    chunks = [backtest_chunk(closes, dates, starts[offset:offset + BACKTEST_CHUNK], amount, monthly)
+              for offset in range(0, len(starts), BACKTEST_CHUNK)]
+    if not chunks:
+        return {name: np.array([]) for name in ('total_invested', 'final_value', 'annual_return', 'max_drawdown')}
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+# Function to backtest one chunk of start dates on a (starts, days) matrix from the earliest start on
+def backtest_chunk(closes, dates, starts, amount, monthly):
+    # Days before the earliest start in the chunk hold nothing, so they are left out of the matrix
+    offset = int(starts.min())
+    closes, dates, starts = closes[offset:], dates[offset:], starts - offset
+    days = np.arange(len(closes))
+    held = days[None, :] >= starts[:, None]
+    opening_shares = amount / closes[starts]
+
+    if monthly:
+        contribution_days = first_trading_days(dates)
+        # Shares bought by monthly contributions up to each day, and per start only those after the start day
+        bought = np.cumsum(np.where(contribution_days, amount / closes, 0.0))
+        shares = opening_shares[:, None] + bought[None, :] - bought[starts][:, None]
+        later_contributions = contribution_days.sum() - np.cumsum(contribution_days)[starts]
+        total_invested = float(amount) * (1 + later_contributions)
+    else:
+        shares = np.broadcast_to(opening_shares[:, None], held.shape)
+        total_invested = np.full(len(starts), float(amount))
+
+    value = np.where(held, shares * closes[None, :], 0.0)
+    peak = np.maximum.accumulate(value, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_drawdown = np.where(held, value / peak - 1, 0.0).min(axis=1)
+    final_value = value[:, -1]
+
+    years_held = (dates[-1] - dates[starts]).astype(np.float64) / DAYS_PER_YEAR
+    if monthly:
+        annual_return = money_weighted_return(dates, starts, amount, contribution_days, final_value)
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annual_return = np.where(years_held > 0, (final_value / amount) ** (1 / years_held) - 1, np.nan)
+
+    return {
+        'total_invested': total_invested,
+        'final_value': final_value,
+        'annual_return': annual_return,
+        'max_drawdown': max_drawdown,
+    }
+
+
+# Function to solve for the annual rate that grows every contribution to the final value, for all starts at once
+def money_weighted_return(dates, starts, amount, contribution_days, final_value):
+    years_left = (dates[-1] - dates).astype(np.float64) / DAYS_PER_YEAR
+    contribution_years = years_left[contribution_days]
+    contribution_index = np.flatnonzero(contribution_days)
+    # Contributions after each start, plus the opening contribution on the start day
+    flows = np.where(contribution_index[None, :] > np.asarray(starts)[:, None], amount, 0.0)
+    opening_years = years_left[starts]
+
+    rate = np.full(len(starts), 0.05)
+    for _ in range(IRR_ITERATIONS):
+        growth = (1 + rate[:, None]) ** contribution_years[None, :]
+        opening_growth = (1 + rate) ** opening_years
+        value = amount * opening_growth + (flows * growth).sum(axis=1) - final_value
+        slope = (amount * opening_years * opening_growth / (1 + rate)
+                 + (flows * contribution_years[None, :] * growth / (1 + rate[:, None])).sum(axis=1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.clip(rate - value / slope, -0.99, 100)
+    rate[opening_years <= 0] = np.nan
+    return rate
+
+
+# Function to pull the amount, schedule, ticker and start date out of a "what if I had invested" question
+def parse_backtest_question(user_input):
+    """
+    Returns {'amount', 'monthly', 'ticker', 'start'} or None, e.g. "$500/month into TQQQ since
+    2022" -> {'amount': 500.0, 'monthly': True, 'ticker': 'TQQQ', 'start': date(2022, 1, 1)}.
+    """
+    amount_match = AMOUNT_PATTERN.search(user_input)
+    if not amount_match:
+        return None
+    amount = float(amount_match.group(1).replace(',', ''))
+    if amount_match.group(2):
+        amount *= 1000
+
+    lowered = user_input.lower()
+    tickers = find_mentioned_tickers(user_input) or [ticker for alias, ticker in BACKTEST_ALIASES.items() if alias in lowered]
+    if not tickers:
+        return None
+
+    start_match = START_PATTERN.search(user_input)
+    years_ago_match = YEARS_AGO_PATTERN.search(user_input)
+    if start_match:
+        month = MONTHS.index(start_match.group(1).lower()) + 1 if start_match.group(1) else 1
+        start = date(int(start_match.group(2)), month, 1)
+    elif years_ago_match:
+        today = date.today()
+        start = today.replace(year=today.year - int(years_ago_match.group(1)), day=1)
+    else:
+        return None
+
+    return {'amount': amount, 'monthly': bool(MONTHLY_PATTERN.search(user_input)), 'ticker': tickers[0], 'start': start}
+
+
+# Function to run a question's scenario, plus the same strategy from every later start date for context
+def run_backtest(ticker, amount, start, monthly=False):
+    bars = get_bars(ticker)
+    if bars is None or len(bars['close']) < 2:
+        return None
+
+    dates, closes = bars['date'], bars['close']
+    first = min(int(np.searchsorted(dates, np.datetime64(start, 'D'))), len(dates) - 2)
+    scenario = backtest(closes, dates, np.array([first]), amount, monthly)
+
+    # Range of outcomes: the same strategy from the first trading day of every later month, evenly thinned
+    # to at most MAX_RANGE_STARTS
+    month_starts = np.flatnonzero(first_trading_days(dates[first:-1])) + first
+    starts = month_starts[np.unique(np.linspace(0, len(month_starts) - 1, MAX_RANGE_STARTS).round().astype(np.int64))]
+    results = backtest(closes, dates, starts, amount, monthly)
+    years_held = (dates[-1] - dates[starts]).astype(np.float64) / DAYS_PER_YEAR
+    in_range = years_held >= MIN_YEARS_FOR_RANGE
+    if not in_range.any():
+        in_range[:] = True
+
+    return {
+        'ticker': ticker,
+        'amount': amount,
+        'monthly': monthly,
+        'start': str(dates[first]),
+        'end': str(dates[-1]),
+        'clamped': bool(np.datetime64(start, 'D') < dates[0]),
+        'scenario': {name: float(values[0]) for name, values in scenario.items()},
+        'annual_return_percentiles': {
+            percentile: float(value)
+            for percentile, value in zip((10, 50, 90), np.nanpercentile(results['annual_return'][in_range], [10, 50, 90]))
+        },
+    }
+
+
+# Function to answer a "what if I had invested" question with a backtest for the advice prompt
+def get_backtest_message(user_input):
+    question = parse_backtest_question(user_input)
+    if not question:
+        return None
+
+    result = run_backtest(question['ticker'], question['amount'], question['start'], question['monthly'])
+    if not result:
+        logger.warning(f"No stored bars to backtest {question['ticker']}")
+        return None
+
+    scenario = result['scenario']
+    strategy = f"${result['amount']:,.0f} per month" if result['monthly'] else f"a ${result['amount']:,.0f} lump sum"
+    return_label = "money-weighted" if result['monthly'] else "CAGR"
+    lines = [
+        f"Backtest of {strategy} in {result['ticker']} from {result['start']} to {result['end']} "
+        f"(adjusted closes):",
+        f"- Total invested ${scenario['total_invested']:,.0f}, final value ${scenario['final_value']:,.0f}",
+        f"- Annual return {scenario['annual_return']:.1%} ({return_label}), max drawdown {scenario['max_drawdown']:.1%}",
+        f"- Starting at the beginning of any later month from {result['start']} (held at least a year), the annual return ranged from "
+        f"{result['annual_return_percentiles'][10]:.1%} (10th percentile) through {result['annual_return_percentiles'][50]:.1%} "
+        f"(median) to {result['annual_return_percentiles'][90]:.1%} (90th percentile)",
+    ]
+    if result['clamped']:
+        lines.append(f"- Stored history for {result['ticker']} only starts on {result['start']}, so the backtest starts there.")
+    return "\n".join(lines)
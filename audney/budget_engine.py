@@ -0,0 +1,159 @@
+# Import necessary modules
+import logging
+import numpy as np
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Budget allocation guidelines
+BUDGET_GUIDELINES = {
+    'housing': 0.30,  # 30% of income for housing
+    'groceries': 0.10,  # 10% for groceries
+    'transportation': 0.10,  # 10% for transportation
+    'utilities': 0.07,  # 7% for utilities
+    'clothing': 0.05,  # 5% for clothing
+    'debt_repayment': 0.10  # 10% for debt repayment (this is a variable figure)
+}
+
+# Allocation profiles per UserProfile.financial_goals, as shares of gross income. Goals not
+# listed use BUDGET_GUIDELINES unchanged.
+ALLOCATION_PROFILES = {
+    'default': BUDGET_GUIDELINES,
+    'budgeting': BUDGET_GUIDELINES,
+    'debt_management': {**BUDGET_GUIDELINES, 'clothing': 0.03, 'debt_repayment': 0.15},
+    'retirement_planning': {**BUDGET_GUIDELINES, 'clothing': 0.04, 'debt_repayment': 0.08},
+    'investment_management': {**BUDGET_GUIDELINES, 'clothing': 0.04, 'debt_repayment': 0.08},
+    'wealth_management': {**BUDGET_GUIDELINES, 'clothing': 0.04, 'debt_repayment': 0.06},
+    'insurance_planning': {**BUDGET_GUIDELINES, 'insurance': 0.05, 'clothing': 0.04},
+}
+
+# Default savings-rate scenarios per goal
+DEFAULT_SAVINGS_RATES = {
+    'default': [0.10, 0.15, 0.20],
+    'retirement_planning': [0.10, 0.15, 0.20, 0.25],
+    'wealth_management': [0.15, 0.20, 0.30],
+    'debt_management': [0.05, 0.10, 0.15],
+}
+
+# Most incomes and savings rates one projection request may ask for
+MAX_PROJECTION_SCENARIOS = 10
+
+# Representative annual incomes for UserProfile.INCOME_LEVEL_CHOICES
+INCOME_LEVEL_ESTIMATES = {
+    '<55000': 45000,
+    '55001_89000': 72000,
+    '89001_150000': 120000,
+    '150001_plus': 175000,
+}
+
+# Long-run assumptions used when the caller doesn't give any
+DEFAULT_INFLATION_RATE = 0.03
+DEFAULT_INCOME_GROWTH = 0.03
+
+
+# Function to get the allocation profile for a financial goal
+def get_allocation_profile(financial_goal=None):
+    return ALLOCATION_PROFILES.get(financial_goal, ALLOCATION_PROFILES['default'])
+
+
+# Function to allocate one or many incomes across the budget categories in one array operation
+def allocate(incomes, financial_goal=None):
+    """
+    Returns (categories, expenses) where expenses has shape (len(incomes), len(categories)).
+    """
+    profile = get_allocation_profile(financial_goal)
+    categories = list(profile)
+    shares = np.array([profile[category] for category in categories])
+    return categories, np.round(np.outer(np.asarray(incomes, dtype=np.float64), shares), 2)
+
+
+# Function to project budgets across incomes, years and savings-rate what-ifs
+def project_budget(incomes, financial_goal=None, years=1, inflation_rate=DEFAULT_INFLATION_RATE,
+                   income_growth=DEFAULT_INCOME_GROWTH, savings_rates=None, savings_return=0.0):
+    """
+    Projects budgets for a vector of incomes over several years and savings-rate what-ifs,
+    broadcasting over (savings rate, income, year, category) with no per-row Python loops.
+
+    Category costs start at the goal's allocation of the first-year income and grow with
+    inflation; income grows with income_growth. Savings are that year's income times the
+    savings rate, and whatever is left is discretionary. Cumulative savings compound at
+    savings_return.
+
+    Returns a dict of arrays; 'expenses' has shape (rates, incomes, years, categories) and
+    'income', 'savings', 'discretionary' and 'cumulative_savings' have shape (rates, incomes, years).
+    """
+    incomes = np.asarray(incomes, dtype=np.float64).reshape(-1)
+    if savings_rates is None:
+        savings_rates = DEFAULT_SAVINGS_RATES.get(financial_goal, DEFAULT_SAVINGS_RATES['default'])
+    rates = np.asarray(savings_rates, dtype=np.float64).reshape(-1)
+    year_index = np.arange(years)
+
+    categories, base_expenses = allocate(incomes, financial_goal)
+    inflation = (1 + inflation_rate) ** year_index
+    growth = (1 + income_growth) ** year_index
+
+    # (incomes, years, categories) -> broadcast across savings rates
+    expenses = base_expenses[:, None, :] * inflation[None, :, None]
+    income = incomes[:, None] * growth[None, :]
+    savings = rates[:, None, None] * income[None, :, :]
+    discretionary = income[None, :, :] - expenses.sum(axis=2)[None, :, :] - savings
+
+    # Future value of each year's savings: (1 + r)^t * cumsum(s_j / (1 + r)^j)
+    compounding = (1 + savings_return) ** year_index
+    cumulative_savings = np.cumsum(savings / compounding, axis=2) * compounding
+
+    return {
+        'categories': categories,
+        'incomes': incomes,
+        'savings_rates': rates,
+        'years': year_index + 1,
+        'income': np.round(np.broadcast_to(income, savings.shape), 2),
+        'expenses': np.round(np.broadcast_to(expenses, (len(rates),) + expenses.shape), 2),
+        'savings': np.round(savings, 2),
+        'discretionary': np.round(discretionary, 2),
+        'cumulative_savings': np.round(cumulative_savings, 2),
+    }
+
+
+# Function to convert a projection into JSON-serializable rows, one per (savings rate, income, year)
+def projection_rows(projection):
+    rates, incomes, years = projection['savings'].shape
+    rate_index, income_index, year_index = np.indices((rates, incomes, years)).reshape(3, -1)
+    expenses = projection['expenses'].reshape(-1, len(projection['categories']))
+    return [
+        {
+            'savings_rate': float(projection['savings_rates'][r]),
+            'starting_income': float(projection['incomes'][i]),
+            'year': int(projection['years'][y]),
+            'income': float(projection['income'][r, i, y]),
+            'expenses': dict(zip(projection['categories'], expenses[row].tolist())),
+            'savings': float(projection['savings'][r, i, y]),
+            'discretionary': float(projection['discretionary'][r, i, y]),
+            'cumulative_savings': float(projection['cumulative_savings'][r, i, y]),
+        }
+        for row, (r, i, y) in enumerate(zip(rate_index, income_index, year_index))
+    ]
+
+
+# Phrases that ask about budgeting or saving, which get the scenario table in the advice prompt
+BUDGET_KEYWORDS = ['budget', 'save', 'saving', 'spend', 'afford', 'expenses']
+
+
+# Function to render savings-rate scenarios for one income as a markdown table for the advice prompt
+def get_budget_scenarios_message(income, financial_goal=None, years=10):
+    if not income:
+        return None
+
+    projection = project_budget([income], financial_goal, years=years)
+    shown_years = [year for year in (1, 5, 10) if year <= years]
+    header = "| Savings rate | " + " | ".join(f"Year {year} discretionary | Year {year} total saved" for year in shown_years) + " |"
+    divider = "|---" * (1 + 2 * len(shown_years)) + "|"
+    lines = [header, divider]
+    for r, rate in enumerate(projection['savings_rates']):
+        cells = [f"${projection['discretionary'][r, 0, year - 1]:,.0f} | ${projection['cumulative_savings'][r, 0, year - 1]:,.0f}" for year in shown_years]
+        lines.append(f"| {rate:.0%} | " + " | ".join(cells) + " |")
+
+    return (
+        f"Budget scenarios for a ${income:,.0f} income ({DEFAULT_INFLATION_RATE:.0%} inflation, "
+        f"{DEFAULT_INCOME_GROWTH:.0%} annual raises, '{financial_goal or 'default'}' allocation profile):\n" + "\n".join(lines)
+    )
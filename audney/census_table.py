@@ -0,0 +1,175 @@
+# Import necessary modules
+import os
+import logging
+import numpy as np
+from django.db.models import Count, Max
+from .models import CensusPlace
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Directory holding the memory-mapped Census table, built by `manage.py build_census_table`
+CENSUS_TABLE_DIR = os.path.join(os.path.dirname(__file__), 'data', 'census_table')
+
+# Numeric CensusPlace fields stored as float32 columns (NaN = missing). Every ACS count and
+# median we keep is below 2**24, so float32 holds them exactly at half the size of float64.
+NUMERIC_COLUMNS = [
+    'median_income',
+    'total_population',
+    'below_poverty',
+    'labor_force',
+    'employed',
+    'unemployed',
+    'median_home_value',
+    'median_gross_rent',
+]
+
+# Width of the fixed-size "SS|place name" lookup keys
+KEY_WIDTH = 96
+
+
+# Function to build the fixed-width lookup key for a state and normalized place name
+def make_key(state_fips, place_name):
+    return f"{state_fips}|{place_name}".encode('ascii', 'ignore')[:KEY_WIDTH]
+
+
+# Function to write the local Census store out as memory-mappable column files
+def build_census_table(directory=CENSUS_TABLE_DIR):
+    """
+    Writes every CensusPlace as a set of .npy column files: one float32 array per numeric
+    column, state/place FIPS codes, an interned name table (one byte blob plus offsets) and a
+    sorted key array mapping "state|normalized name" (and the name with its descriptor kept)
+    to a row, so lookups are a binary search over the mapped file.
+    """
+    from .financial_statistics import normalize_place_name
+
+    places = list(CensusPlace.objects.order_by('state_fips', 'place_fips'))
+    os.makedirs(directory, exist_ok=True)
+
+    columns = {
+        field: np.array([getattr(place, field) if getattr(place, field) is not None else np.nan for place in places], dtype=np.float32)
+        for field in NUMERIC_COLUMNS
+    }
+    columns['state_fips'] = np.array([int(place.state_fips) for place in places], dtype=np.uint8)
+    columns['place_fips'] = np.array([int(place.place_fips) for place in places], dtype=np.int32)
+
+    # Interned name table: all names in one UTF-8 blob, row i spanning offsets[i]:offsets[i + 1]
+    encoded_names = [place.name.encode('utf-8') for place in places]
+    columns['name_offsets'] = np.concatenate([[0], np.cumsum([len(name) for name in encoded_names])]).astype(np.int64)
+    columns['name_blob'] = np.frombuffer(b''.join(encoded_names), dtype=np.uint8)
+
+    # Larger places claim a shared key first, matching PlaceIndex
+    keys = {}
+    for row in sorted(range(len(places)), key=lambda row: places[row].total_population or 0, reverse=True):
+        place = places[row]
+        for place_name in (place.place_name, normalize_place_name(place.name, strip_descriptor=False)):
+            keys.setdefault(make_key(place.state_fips, place_name), row)
+    sorted_keys = sorted(keys)
+    columns['keys'] = np.array(sorted_keys, dtype=f'S{KEY_WIDTH}')
+    columns['key_rows'] = np.array([keys[key] for key in sorted_keys], dtype=np.int32)
+
+    # Write then rename each file, never over a file a worker has mapped (truncating a mapped file
+    # kills the reader with SIGBUS). The keys go last: readers remap when keys.npy is replaced, by
+    # which point every other column is in place.
+    for column in sorted(columns, key=lambda column: column == 'keys'):
+        temporary_path = os.path.join(directory, f'{column}.tmp.npy')
+        np.save(temporary_path, columns[column])
+        os.replace(temporary_path, os.path.join(directory, f'{column}.npy'))
+
+    logger.info(f"Built Census table with {len(places)} places in {directory}")
+    return len(places)
+
+
+class CensusTable:
+    """
+    Read-only view over the column files written by build_census_table. Arrays are opened with
+    mmap_mode='r', so nothing is deserialized and every process mapping the files shares the
+    same physical pages through the OS page cache.
+    """
+
+    def __init__(self, directory=CENSUS_TABLE_DIR):
+        self.columns = {
+            name[:-len('.npy')]: np.load(os.path.join(directory, name), mmap_mode='r')
+            for name in os.listdir(directory) if name.endswith('.npy') and not name.endswith('.tmp.npy')
+        }
+
+    def __len__(self):
+        return len(self.columns['state_fips'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def find(self, state_fips, place_name):
+        keys = self.columns['keys']
+        key = make_key(state_fips, place_name)
+        position = int(np.searchsorted(keys, key))
+        if position < len(keys) and keys[position] == key:
+            return int(self.columns['key_rows'][position])
+        return None
+
+    def name(self, row):
+        offsets = self.columns['name_offsets']
+        return self.columns['name_blob'][offsets[row]:offsets[row + 1]].tobytes().decode('utf-8')
+
+    def record(self, row):
+        """
+        Returns the row as an unsaved CensusPlace so callers can treat it like a stored place.
+        """
+        from .financial_statistics import normalize_place_name
+
+        name = self.name(row)
+        place = CensusPlace(
+            state_fips=f"{int(self.columns['state_fips'][row]):02d}",
+            place_fips=f"{int(self.columns['place_fips'][row]):05d}",
+            name=name,
+            place_name=normalize_place_name(name),
+        )
+        for field in NUMERIC_COLUMNS:
+            value = self.columns[field][row]
+            setattr(place, field, None if np.isnan(value) else int(value))
+        return place
+
+
+# Table shared by the whole process; loaded before the WSGI server forks its workers
+census_table = None
+census_table_loaded = False
+
+# Identity of the keys.npy the table was mapped from, so a rebuilt table is picked up
+census_table_stamp = None
+
+
+# Function to identify the current build of the table files, or None if there is none
+def get_census_table_stamp(directory=CENSUS_TABLE_DIR):
+    try:
+        stat = os.stat(os.path.join(directory, 'keys.npy'))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+# Function to map the Census table files into this process
+def load_census_table(directory=CENSUS_TABLE_DIR):
+    global census_table, census_table_loaded, census_table_stamp
+    census_table_loaded = True
+    census_table_stamp = get_census_table_stamp(directory)
+    if census_table_stamp is not None:
+        census_table = CensusTable(directory)
+        logger.info(f"Loaded Census table with {len(census_table)} places from {directory}")
+    else:
+        census_table = None
+        logger.info(f"No Census table at {directory}; Census lookups will use the database.")
+    return census_table
+
+
+# Function to get the process-wide Census table, mapping it on first use and again after a rebuild
+def get_census_table(directory=CENSUS_TABLE_DIR):
+    if not census_table_loaded or get_census_table_stamp(directory) != census_table_stamp:
+        load_census_table(directory)
+    return census_table
+
+
+# Function to fingerprint the Census data indexes are built from: the table's build stamp, or the store's row count and newest update
+def get_census_fingerprint(directory=CENSUS_TABLE_DIR):
+    if get_census_table(directory) is not None:
+        return census_table_stamp
+    return tuple(CensusPlace.objects.aggregate(count=Count('id'), updated=Max('last_updated')).values())
@@ -0,0 +1,138 @@
+# Import necessary modules
+import logging
+import numpy as np
+from django.core.cache import cache
+from .market_data import TRACKED_TICKERS, get_bars, get_latest_bar_date, find_mentioned_tickers
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Benchmark every beta is quoted against
+BENCHMARK_TICKER = 'SPY'
+
+# Number of aligned daily returns the matrices are estimated from (about one year)
+CORRELATION_WINDOW = 252
+
+# Financial goals whose advice includes correlations and betas
+CORRELATION_GOALS = ['investment_management', 'wealth_management']
+
+# Matrices are recomputed when a new bar arrives; this only bounds how long an unused entry is kept
+CORRELATION_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+# Function to align daily closes of several tickers on the dates they all traded
+def align_returns(closes_by_ticker, window=CORRELATION_WINDOW):
+    """
+    Takes {ticker: (dates, closes)} and returns (common dates, a (days, tickers) matrix of
+    simple daily returns) over the last `window` returns all tickers share.
+    """
+    dates = None
+    for ticker_dates, _ in closes_by_ticker.values():
+        dates = ticker_dates if dates is None else np.intersect1d(dates, ticker_dates, assume_unique=True)
+    dates = dates[-(window + 1):]
+
+    closes = np.column_stack([
+        closes[np.searchsorted(ticker_dates, dates)] for ticker_dates, closes in closes_by_ticker.values()
+    ])
+    return dates[1:], closes[1:] / closes[:-1] - 1
+
+
+# Function to compute the correlation and beta matrices of a returns matrix in one batched pass
+def compute_correlations(returns):
+    """
+    Returns (correlation, beta) for a (days, tickers) returns matrix, where beta[i, j] is the
+    beta of ticker i measured against ticker j. The covariance matrix is a single BLAS matrix
+    product; both results are derived from it with broadcasting.
+    """
+    centered = returns - returns.mean(axis=0)
+    covariance = centered.T @ centered / (len(returns) - 1)
+    variance = np.diag(covariance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.sqrt(np.outer(variance, variance))
+        beta = covariance / variance[None, :]
+    return correlation, beta
+
+
+# Function to get aligned daily returns for several tickers, cached until the next bar
+def get_aligned_returns(tickers=TRACKED_TICKERS, window=CORRELATION_WINDOW):
+    """
+    Returns {'tickers', 'dates', 'returns'} for the tickers that have enough bars, with
+    returns a (days, tickers) matrix, or None if none of them have data.
+    """
+    as_of = get_latest_bar_date()
+    cache_key = f"aligned_returns_{'_'.join(sorted(tickers))}_{window}_{as_of}".replace(':', '_')
+    aligned = cache.get(cache_key)
+    if aligned is not None:
+        return aligned
+
+    closes_by_ticker = {}
+    for ticker in tickers:
+        bars = get_bars(ticker)
+        if bars is None or len(bars['close']) < 3:
+            logger.warning(f"Not enough bars for {ticker} to compute correlations")
+            continue
+        closes_by_ticker[ticker] = (bars['date'], bars['close'])
+    if not closes_by_ticker:
+        return None
+
+    dates, returns = align_returns(closes_by_ticker, window)
+    if len(returns) < 2:
+        return None
+    aligned = {'tickers': list(closes_by_ticker), 'dates': dates, 'returns': returns}
+    cache.set(cache_key, aligned, CORRELATION_CACHE_TIMEOUT)
+    return aligned
+
+
+# Function to get the correlation and beta matrices for the tracked tickers, cached until the next bar
+def get_correlation_matrix(tickers=TRACKED_TICKERS):
+    as_of = get_latest_bar_date()
+    cache_key = f"correlations_{'_'.join(sorted(tickers))}_{as_of}".replace(':', '_')
+    matrices = cache.get(cache_key)
+    if matrices is not None:
+        return matrices
+
+    aligned = get_aligned_returns(tickers)
+    if aligned is None or len(aligned['tickers']) < 2:
+        return None
+    correlation, beta = compute_correlations(aligned['returns'])
+    matrices = {
+        'tickers': aligned['tickers'],
+        'start': str(aligned['dates'][0]),
+        'end': str(aligned['dates'][-1]),
+        'correlation': correlation,
+        'beta': beta,
+    }
+    cache.set(cache_key, matrices, CORRELATION_CACHE_TIMEOUT)
+    logger.info(f"Computed correlations for {matrices['tickers']} over {len(aligned['returns'])} days")
+    return matrices
+
+
+# Function to render correlations and betas for the advice prompt, for the tickers the user mentions
+def get_correlation_message(user_input):
+    matrices = get_correlation_matrix()
+    if not matrices:
+        return None
+
+    tickers = matrices['tickers']
+    shown = [ticker for ticker in find_mentioned_tickers(user_input) if ticker in tickers] or list(tickers)
+    if BENCHMARK_TICKER in tickers and BENCHMARK_TICKER not in shown:
+        shown.append(BENCHMARK_TICKER)
+    positions = [tickers.index(ticker) for ticker in shown]
+
+    lines = [
+        f"Daily-return correlations from {matrices['start']} to {matrices['end']}:",
+        "| | " + " | ".join(shown) + " |",
+        "|---" * (len(shown) + 1) + "|",
+    ]
+    for row in positions:
+        cells = " | ".join(f"{matrices['correlation'][row, column]:.2f}" for column in positions)
+        lines.append(f"| {tickers[row]} | {cells} |")
+
+    if BENCHMARK_TICKER in tickers:
+        benchmark = tickers.index(BENCHMARK_TICKER)
+        betas = ", ".join(
+            f"{tickers[row]} {matrices['beta'][row, benchmark]:.2f}" for row in positions if row != benchmark
+        )
+        if betas:
+            lines.append(f"Betas against {BENCHMARK_TICKER}: {betas}.")
+    return "\n".join(lines)
@@ -0,0 +1,144 @@
+# Import necessary modules
+import logging
+import numpy as np
+from .models import CensusPlace
+from .census_table import get_census_table, get_census_fingerprint
+from .financial_statistics import get_state_fips, find_place
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Metrics ranked nationally, with the label used in the advice prompt and how to format them
+COST_OF_LIVING_METRICS = {
+    'median_income': ('median household income', '${:,.0f}'),
+    'median_gross_rent': ('median gross rent', '${:,.0f}'),
+    'median_home_value': ('median home value', '${:,.0f}'),
+    'poverty_rate': ('poverty rate', '{:.1f}%'),
+    'unemployment_rate': ('unemployment rate', '{:.1f}%'),
+}
+
+# Places smaller than this are left out of the national distributions; their ACS estimates are too noisy
+MIN_POPULATION = 1000
+
+
+# Function to derive the ranked metrics from raw ACS count columns (scalars or NumPy arrays)
+def compute_metrics(columns):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'median_income': columns['median_income'],
+            'median_gross_rent': columns['median_gross_rent'],
+            'median_home_value': columns['median_home_value'],
+            'poverty_rate': columns['below_poverty'] / columns['total_population'] * 100,
+            'unemployment_rate': columns['unemployed'] / columns['labor_force'] * 100,
+        }
+
+
+class CostOfLivingIndex:
+    """
+    Sorted national distribution of each metric over every place with at least MIN_POPULATION
+    residents. A value's percentile is a binary search into the sorted array, so any place,
+    including ones too small to be in the distribution, can be ranked in O(log n).
+    """
+
+    def __init__(self, columns):
+        population = np.asarray(columns['total_population'], dtype=np.float64)
+        metrics = compute_metrics({field: np.asarray(values, dtype=np.float64) for field, values in columns.items()})
+        included = population >= MIN_POPULATION
+
+        self.distributions = {}
+        for metric, values in metrics.items():
+            values = values[included]
+            self.distributions[metric] = np.sort(values[np.isfinite(values)])
+
+    def __len__(self):
+        return max((len(values) for values in self.distributions.values()), default=0)
+
+    def percentile(self, metric, value):
+        distribution = self.distributions[metric]
+        if value is None or not np.isfinite(value) or not len(distribution):
+            return None
+        # Midpoint of the tied range, so a value equal to the median ranks at the 50th percentile
+        below = np.searchsorted(distribution, value, side='left')
+        at_or_below = np.searchsorted(distribution, value, side='right')
+        return (below + at_or_below) / 2 / len(distribution) * 100
+
+    def rank_place(self, place):
+        columns = {field: float(getattr(place, field)) if getattr(place, field) is not None else np.nan
+                   for field in ('median_income', 'median_gross_rent', 'median_home_value',
+                                 'below_poverty', 'total_population', 'unemployed', 'labor_force')}
+        ranking = {}
+        for metric, value in compute_metrics(columns).items():
+            percentile = self.percentile(metric, value)
+            if percentile is not None:
+                ranking[metric] = {'value': float(value), 'percentile': percentile}
+        return ranking
+
+
+# Index shared by the process, with the fingerprint of the Census data it was built from
+cost_of_living_index = None
+cost_of_living_fingerprint = None
+
+
+# Function to get the national cost-of-living index, rebuilt whenever the Census table or store has been reloaded
+def get_cost_of_living_index():
+    global cost_of_living_index, cost_of_living_fingerprint
+    fingerprint = get_census_fingerprint()
+    if cost_of_living_index is not None and fingerprint == cost_of_living_fingerprint:
+        return cost_of_living_index
+
+    fields = ['median_income', 'median_gross_rent', 'median_home_value', 'below_poverty',
+              'total_population', 'unemployed', 'labor_force']
+    table = get_census_table()
+    if table is not None:
+        columns = {field: table[field] for field in fields}
+    else:
+        rows = list(CensusPlace.objects.values_list(*fields))
+        if not rows:
+            return None
+        values = np.array(rows, dtype=np.float64)  # None becomes NaN
+        columns = {field: values[:, position] for position, field in enumerate(fields)}
+
+    cost_of_living_index = CostOfLivingIndex(columns)
+    cost_of_living_fingerprint = fingerprint
+    logger.info(f"Built cost-of-living index over {len(cost_of_living_index)} places")
+    return cost_of_living_index
+
+
+# Function to rank a city against every US place on each cost-of-living metric
+def get_location_ranking(city, state_name_or_abbr):
+    if not city or not state_name_or_abbr:
+        return None
+    index = get_cost_of_living_index()
+    state_fips = get_state_fips(state_name_or_abbr)
+    if index is None or not state_fips:
+        return None
+
+    place = find_place(city, state_fips)
+    if not place:
+        return None
+    return index.rank_place(place)
+
+
+# Function to format an ordinal percentile, e.g. 72 -> "72nd"
+def ordinal(number):
+    number = int(round(number))
+    suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+
+# Function to render the national rankings of one or more locations for the advice prompt
+def get_cost_of_living_message(locations):
+    lines = []
+    for city, state in locations:
+        ranking = get_location_ranking(city, state)
+        if not ranking:
+            continue
+        parts = [
+            f"{label} {value_format.format(ranking[metric]['value'])} ({ordinal(ranking[metric]['percentile'])} percentile)"
+            for metric, (label, value_format) in COST_OF_LIVING_METRICS.items() if metric in ranking
+        ]
+        lines.append(f"{city}, {state}: " + ", ".join(parts) + ".")
+
+    if not lines:
+        return None
+    return "National percentile ranks among US places (100th = highest):\n" + "\n".join(lines)
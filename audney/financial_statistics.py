@@ -1,9 +1,22 @@
 import os
+import csv
 import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone as dt_timezone
+from collections import Counter, defaultdict
 import requests
 import logging
+import numpy as np
 import us
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
 from openai import OpenAI
+from .models import CensusPlace, CensusMetroArea, LocationSnapshot
+from .census_table import get_census_table, get_census_fingerprint, get_census_table_stamp
+from .budget_engine import allocate
 
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
@@ -23,15 +36,15 @@ census_api_key = os.getenv('CENSUS_API_KEY')
 if not census_api_key:
     logger.error("CENSUS_API_KEY is not set in the environment.")
 
-# Budget allocation guidelines
-BUDGET_GUIDELINES = {
-    'housing': 0.30,  # 30% of income for housing
-    'groceries': 0.10,  # 10% for groceries
-    'transportation': 0.10,  # 10% for transportation
-    'utilities': 0.07,  # 7% for utilities
-    'clothing': 0.05,  # 5% for clothing
-    'debt_repayment': 0.10  # 10% for debt repayment (this is a variable figure)
-}
+# Census API endpoints for the 2019 ACS 5-year estimates
+CENSUS_ACS5_URL = "https://api.census.gov/data/2019/acs/acs5"
+CENSUS_PROFILE_URL = "https://api.census.gov/data/2019/acs/acs5/profile"
+
+# Crosswalk from Census places to the metro/micro area (CBSA) they are a principal city of
+CBSA_CROSSWALK_PATH = os.path.join(os.path.dirname(__file__), 'data', 'place_cbsa_crosswalk.csv')
+
+# Descriptors the Census appends to place names, e.g. "Denver city" or "Vail town"
+PLACE_DESCRIPTORS = [' city', ' town', ' village', ' cdp']
 
 # Function to dynamically get FIPS code for a given state name or abbreviation
 def get_state_fips(state_name_or_abbr):
@@ -46,83 +59,500 @@ def get_state_fips(state_name_or_abbr):
 
     return state_fips
 
-# Function to get median household income for a metropolitan area or place
-def get_census_data_msa_or_place(city, state_name_or_abbr):
-    state_fips = get_state_fips(state_name_or_abbr)
+# Function to convert a raw Census value to an int, treating nulls and negative sentinels (e.g. -666666666) as missing
+def parse_census_value(value):
+    if value in ('null', None, ''):
+        return None
+    try:
+        parsed = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed >= 0 else None
+
+# Function to normalize a place name such as "Denver city, Colorado" or "St. Louis" for lookups
+def normalize_place_name(name, strip_descriptor=True):
+    place_name = unicodedata.normalize('NFKD', name.split(',')[0]).encode('ascii', 'ignore').decode()
+    place_name = re.sub(r"[^a-z0-9 ]", " ", place_name.lower().replace("'", ""))
+    place_name = " ".join(place_name.split())
+    if strip_descriptor:
+        for desc in PLACE_DESCRIPTORS:
+            if place_name.endswith(desc):
+                return place_name[:-len(desc)]
+    return place_name
+
+# Function to split a normalized name into padded character trigrams
+def get_trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class PlaceIndex:
+    """
+    Hash index over the places of one state. Names are normalized once with
+    normalize_place_name, so exact lookups are a dict hit; misses fall back to the place with
+    the highest trigram (Jaccard) similarity above FUZZY_THRESHOLD.
+    """
+    FUZZY_THRESHOLD = 0.5
+
+    def __init__(self, places):
+        self.places = places
+        self.by_name = {}
+        self.trigrams = defaultdict(set)
+        self.trigram_counts = []
+
+        # Index larger places first so e.g. a city wins over a same-named CDP
+        for place in sorted(places, key=lambda p: p.total_population or 0, reverse=True):
+            for key in (place.place_name, normalize_place_name(place.name, strip_descriptor=False)):
+                self.by_name.setdefault(key, place)
+
+        for position, place in enumerate(places):
+            trigrams = get_trigrams(place.place_name)
+            self.trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self.trigrams[trigram].add(position)
+
+    def lookup(self, city):
+        for key in (normalize_place_name(city, strip_descriptor=False), normalize_place_name(city)):
+            if key in self.by_name:
+                return self.by_name[key]
+        return self.fuzzy_lookup(city)
+
+    def fuzzy_lookup(self, city):
+        query = get_trigrams(normalize_place_name(city))
+        shared = Counter()
+        for trigram in query:
+            shared.update(self.trigrams.get(trigram, ()))
+
+        best_place, best_score = None, self.FUZZY_THRESHOLD
+        for position, count in shared.items():
+            score = count / (len(query) + self.trigram_counts[position] - count)
+            if score > best_score:
+                best_place, best_score = self.places[position], score
+
+        if best_place:
+            logger.debug(f"Fuzzy matched '{city}' to '{best_place.name}' (score {best_score:.2f})")
+        return best_place
+
+# Detailed-table variables fetched for every place, mapped to CensusPlace fields
+PLACE_VARIABLES = {
+    'B19013_001E': 'median_income',
+    'B17001_002E': 'below_poverty',
+    'B23025_003E': 'labor_force',
+    'B23025_004E': 'employed',
+    'B23025_005E': 'unemployed',
+    'B25077_001E': 'median_home_value',
+    'B25064_001E': 'median_gross_rent',
+}
 
-    if not state_fips:
-        logger.error(f"State FIPS code not found for {state_name_or_abbr}")
+# ACS 2019 data never changes, so fetched Census payloads can be cached for a day
+CENSUS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Function to request a Census API endpoint and return the parsed rows (header row removed)
+def fetch_census_rows(url, params):
+    params = {**params, 'key': census_api_key}
+    response = requests.get(url, params=params)
+    if response.status_code != 200:
+        logger.error(f"Census API request failed ({response.status_code}): {response.text}")
+        return None
+    try:
+        return response.json()[1:]
+    except ValueError as e:
+        logger.error(f"Error parsing JSON from Census API response: {e}")
         return None
 
-    # Try querying for a Metropolitan Statistical Area (MSA) first
-    base_url_msa = f"https://api.census.gov/data/2019/acs/acs5"
-    params_msa = {
+# Function to fetch every place in a state with all variables at once
+def fetch_state_places(state_fips):
+    """
+    Fetches every place in a state with one detailed-table request carrying the union of
+    PLACE_VARIABLES and one profile request for DP05, merges them by place code and returns
+    unsaved CensusPlace records. The result is cached per state so the income, demographic,
+    employment and housing lookups for a message share a single fetch.
+    """
+    cache_key = f"census_places_{state_fips}"
+    places = cache.get(cache_key)
+    if places is not None:
+        return places
+
+    geography = {'for': 'place:*', 'in': f'state:{state_fips}'}
+    detailed = fetch_census_rows(CENSUS_ACS5_URL, {'get': ','.join(['NAME'] + list(PLACE_VARIABLES)), **geography})
+    profile = fetch_census_rows(CENSUS_PROFILE_URL, {'get': 'DP05_0001E', **geography})
+    if detailed is None or profile is None:
+        return []
+
+    # Rows end with the state and place codes; key the population by place code
+    population = {record[-1]: parse_census_value(record[0]) for record in profile}
+
+    places = []
+    for record in detailed:
+        place = CensusPlace(
+            state_fips=state_fips,
+            place_fips=record[-1],
+            name=record[0],
+            place_name=normalize_place_name(record[0]),
+            total_population=population.get(record[-1]),
+        )
+        for index, field in enumerate(PLACE_VARIABLES.values(), start=1):
+            setattr(place, field, parse_census_value(record[index]))
+        places.append(place)
+
+    cache.set(cache_key, places, CENSUS_CACHE_TIMEOUT)
+    return places
+
+# Function to fetch median household income for every metropolitan/micropolitan area
+def fetch_metro_areas():
+    metro_areas = cache.get('census_metro_areas')
+    if metro_areas is not None:
+        return metro_areas
+
+    rows = fetch_census_rows(CENSUS_ACS5_URL, {
         'get': 'NAME,B19013_001E',
         'for': 'metropolitan statistical area/micropolitan statistical area:*',
-        'key': census_api_key
-    }
+    })
+    if rows is None:
+        return []
+
+    metro_areas = [
+        CensusMetroArea(cbsa_code=record[2], name=record[0], median_income=parse_census_value(record[1]))
+        for record in rows
+    ]
+    cache.set('census_metro_areas', metro_areas, CENSUS_CACHE_TIMEOUT)
+    return metro_areas
+
+# Place indexes built per state, with the time they were built
+place_indexes = {}
+
+# Function to get the place index for a state, built from the local Census store or a single merged Census fetch
+def get_place_index(state_fips):
+    cached = place_indexes.get(state_fips)
+    if cached and time.monotonic() - cached[1] < CENSUS_CACHE_TIMEOUT:
+        return cached[0]
+
+    # Use the local Census store when it has been loaded with `manage.py importcensus`
+    places = list(CensusPlace.objects.filter(state_fips=state_fips))
+    if not places:
+        places = fetch_state_places(state_fips)
+        if not places:
+            return PlaceIndex([])
+
+    index = PlaceIndex(places)
+    place_indexes[state_fips] = (index, time.monotonic())
+    return index
+
+# Function to find a place by city name
+def find_place(city, state_fips):
+    # Exact matches come straight from the memory-mapped Census table when it has been built
+    table = get_census_table()
+    if table is not None:
+        for key in (normalize_place_name(city, strip_descriptor=False), normalize_place_name(city)):
+            row = table.find(state_fips, key)
+            if row is not None:
+                return table.record(row)
+
+    return get_place_index(state_fips).lookup(city)
+
+# Function to fetch median household income for a single metropolitan/micropolitan area
+def fetch_metro_area(cbsa_code):
+    cache_key = f"census_metro_area_{cbsa_code}"
+    metro_area = cache.get(cache_key)
+    if metro_area is not None:
+        return metro_area
+
+    rows = fetch_census_rows(CENSUS_ACS5_URL, {
+        'get': 'NAME,B19013_001E',
+        'for': f'metropolitan statistical area/micropolitan statistical area:{cbsa_code}',
+    })
+    if not rows:
+        return None
 
-    response_msa = requests.get(base_url_msa, params=params_msa)
-    logger.debug(f"Census API MSA Response: {response_msa.text}")
+    metro_area = CensusMetroArea(cbsa_code=cbsa_code, name=rows[0][0], median_income=parse_census_value(rows[0][1]))
+    cache.set(cache_key, metro_area, CENSUS_CACHE_TIMEOUT)
+    return metro_area
 
-    if response_msa.status_code == 200:
-        try:
-            data_msa = response_msa.json()
-            for record in data_msa[1:]:
-                if city.lower() in record[0].lower():
-                    try:
-                        median_income = int(record[1])
-                        return median_income
-                    except ValueError as e:
-                        logger.error(f"Error parsing income for {city}, {state_name_or_abbr}: {e}")
-                        return None
-        except ValueError as e:
-            logger.error(f"Error parsing JSON from Census MSA API response: {e}")
-
-    # Fallback to place-level data if no MSA match is found
-    base_url_place = f"https://api.census.gov/data/2019/acs/acs5"
-    params_place = {
-        'get': 'NAME,B19013_001E',
-        'for': 'place:*',
-        'in': f'state:{state_fips}',
-        'key': census_api_key
-    }
+# Function to find a metropolitan area by CBSA code, from the local Census store or the Census API
+def find_metro_area(cbsa_code):
+    if CensusMetroArea.objects.exists():
+        return CensusMetroArea.objects.filter(cbsa_code=cbsa_code).first()
+    return fetch_metro_area(cbsa_code)
 
-    response_place = requests.get(base_url_place, params=params_place)
-    logger.debug(f"Census API Place Response: {response_place.text}")
+# Crosswalk from (state FIPS, place FIPS) to CBSA code, loaded lazily from CBSA_CROSSWALK_PATH
+cbsa_crosswalk = None
 
-    if response_place.status_code == 200:
+# Function to get the place-to-CBSA crosswalk built by `manage.py build_cbsa_crosswalk`
+def get_cbsa_crosswalk():
+    global cbsa_crosswalk
+    if cbsa_crosswalk is None:
         try:
-            data_place = response_place.json()
-            for record in data_place[1:]:
-                if city.lower() in record[0].lower():
-                    try:
-                        median_income = int(record[1])
-                        return median_income
-                    except ValueError as e:
-                        logger.error(f"Error parsing income for {city}, {state_name_or_abbr}: {e}")
-                        return None
-        except ValueError as e:
-            logger.error(f"Error parsing JSON from Census Place API response: {e}")
+            with open(CBSA_CROSSWALK_PATH, newline='', encoding='utf-8') as csvfile:
+                cbsa_crosswalk = {
+                    (row['state_fips'], row['place_fips']): row['cbsa_code']
+                    for row in csv.DictReader(csvfile)
+                }
+        except FileNotFoundError:
+            logger.warning(f"CBSA crosswalk not found at {CBSA_CROSSWALK_PATH}; matching metro areas by principal city name.")
+            cbsa_crosswalk = {}
+    return cbsa_crosswalk
+
+# Stored metro areas keyed by (state abbreviation, principal city), with the fingerprint of the table they were built from
+metro_areas_by_city = None
+metro_areas_fingerprint = None
+
+# Function to get the stored metro areas by principal city, rebuilt whenever the CensusMetroArea table has been reloaded
+def get_metro_areas_by_city():
+    """
+    Principal cities and states are read from the CBSA name, e.g. "Denver-Aurora-Lakewood, CO
+    Metro Area" gives ('CO', 'denver'), ('CO', 'aurora') and ('CO', 'lakewood'). A city named
+    in several areas of one state goes to the area listing it first.
+    """
+    global metro_areas_by_city, metro_areas_fingerprint
+    fingerprint = tuple(CensusMetroArea.objects.aggregate(count=Count('id'), updated=Max('last_updated')).values())
+    if metro_areas_by_city is None or fingerprint != metro_areas_fingerprint:
+        ranked = {}
+        for metro_area in CensusMetroArea.objects.all():
+            cities, _, rest = metro_area.name.partition(', ')
+            states = rest.split(' ')[0].split('-')
+            for position, city in enumerate(re.split(r'[-/]', cities)):
+                for state_abbr in states:
+                    key = (state_abbr, normalize_place_name(city))
+                    if key not in ranked or position < ranked[key][0]:
+                        ranked[key] = (position, metro_area)
+        metro_areas_by_city = {key: metro_area for key, (position, metro_area) in ranked.items()}
+        metro_areas_fingerprint = fingerprint
+    return metro_areas_by_city
+
+# Function to get median household income for a metropolitan area or place
+def get_census_data_msa_or_place(city, state_name_or_abbr):
+    state_fips = get_state_fips(state_name_or_abbr)
+
+    if not state_fips:
+        logger.error(f"State FIPS code not found for {state_name_or_abbr}")
+        return None
+
+    place = find_place(city, state_fips)
+    if not place:
+        logger.error(f"No income data found for {city}, {state_name_or_abbr}")
+        return None
+
+    # Prefer the Metropolitan Statistical Area (MSA) the place belongs to, if it is a principal city;
+    # without the crosswalk, match the place against the principal cities named in the stored MSAs
+    crosswalk = get_cbsa_crosswalk()
+    if crosswalk:
+        cbsa_code = crosswalk.get((state_fips, place.place_fips))
+        metro_area = find_metro_area(cbsa_code) if cbsa_code else None
+    else:
+        state_abbr = us.states.lookup(state_fips).abbr
+        metro_area = get_metro_areas_by_city().get((state_abbr, normalize_place_name(place.name)))
+    if metro_area and metro_area.median_income is not None:
+        return metro_area.median_income
+
+    # Fallback to place-level data if the place isn't in an MSA
+    if place.median_income is not None:
+        return place.median_income
 
     logger.error(f"No income data found for {city}, {state_name_or_abbr}")
     return None
 
-# Function to estimate household expenses based on income
-def estimate_expenses(median_income):
+# Function to estimate household expenses based on income, using the allocation profile for a financial goal
+def estimate_expenses(median_income, financial_goal=None):
     if not median_income:
         logger.warning("No income data available for expense estimation.")
         return "Income data not available."
 
-    expenses = {category: round(median_income * percentage, 2) for category, percentage in BUDGET_GUIDELINES.items()}
+    categories, expenses = allocate([median_income], financial_goal)
+    expenses = dict(zip(categories, expenses[0].tolist()))
     logger.debug(f"Estimated expenses: {expenses}")
     return expenses
 
+# States recognised by the rule-based location extractor, keyed by lowercased name and abbreviation
+STATES_BY_NAME = {state.name.lower(): state.abbr for state in us.states.STATES + [us.states.DC]}
+STATES_BY_ABBR = {state.abbr: state.abbr for state in us.states.STATES + [us.states.DC]}
+
+# Capitalized words that start questions rather than place names, e.g. "Is Austin Texas expensive?"
+LEADING_NON_PLACE_WORDS = {
+    'what', 'whats', 'how', 'hows', 'is', 'are', 'was', 'tell', 'can', 'could', 'should', 'would',
+    'will', 'do', 'does', 'i', 'im', 'my', 'me', 'the', 'in', 'show', 'give', 'compare', 'any',
+    'provide', 'please', 'hi', 'hello', 'hey', 'about', 'and', 'or', 'versus', 'vs', 'than',
+}
+
+# Abbreviations that are usually ordinary words ("OK", "HI") when they appear on their own
+AMBIGUOUS_STATE_ABBRS = {'OK', 'HI', 'OH', 'ME', 'IN', 'OR'}
+
+# A run of capitalized words, e.g. "San Francisco" or "St. Louis"
+CAPITALIZED_RUN = r"(?:[A-Z][\w.'-]*\s+)*[A-Z][\w.'-]*"
+STATE_NAMES = "|".join(sorted((re.escape(name) for name in STATES_BY_NAME), key=len, reverse=True))
+
+# "Denver, CO", "Denver, Colorado", "Austin Texas" and "Austin TX"
+CITY_STATE_PATTERN = re.compile(rf"({CAPITALIZED_RUN})(?:,\s*|\s+)((?i:{STATE_NAMES})|[A-Z]{{2}})\b")
+# "in Denver", "for Boulder", ... with no state given
+CITY_ONLY_PATTERN = re.compile(rf"\b(?:in|for|near|around|at|from|to|of|about)\s+({CAPITALIZED_RUN})")
+# "is Austin", "than Denver": capitalized words following a lowercase word, i.e. not starting a sentence
+BARE_PLACE_PATTERN = re.compile(rf"(?<=[a-z] )({CAPITALIZED_RUN})")
+STATE_ONLY_PATTERN = re.compile(rf"\b((?i:{STATE_NAMES})|[A-Z]{{2}})\b")
+
+# Gazetteer of normalized place name -> [(state abbreviation, population)], largest first, with the
+# fingerprint of the Census data it was built from
+place_gazetteer = None
+place_gazetteer_fingerprint = None
+
+# Function to get the gazetteer of every known US place, rebuilt whenever the Census table or store has been reloaded
+def get_place_gazetteer():
+    global place_gazetteer, place_gazetteer_fingerprint
+    fingerprint = get_census_fingerprint()
+    if place_gazetteer is not None and fingerprint == place_gazetteer_fingerprint:
+        return place_gazetteer
+
+    abbr_by_fips = {state.fips: state.abbr for state in us.states.STATES + [us.states.DC]}
+    entries = defaultdict(dict)
+
+    table = get_census_table()
+    if table is not None:
+        population = table['total_population']
+        for key, row in zip(table['keys'], table['key_rows']):
+            state_fips, place_name = key.decode().split('|', 1)
+            entries[place_name][abbr_by_fips.get(state_fips)] = float(np.nan_to_num(population[row]))
+    else:
+        for state_fips, place_name, name, total_population in CensusPlace.objects.values_list('state_fips', 'place_name', 'name', 'total_population'):
+            for key in (place_name, normalize_place_name(name, strip_descriptor=False)):
+                entries[key].setdefault(abbr_by_fips.get(state_fips), total_population or 0)
+
+    gazetteer = {
+        place_name: sorted(states.items(), key=lambda item: item[1], reverse=True)
+        for place_name, states in entries.items()
+    }
+
+    # An empty store may be loaded later, so only keep a populated gazetteer
+    if gazetteer:
+        place_gazetteer = gazetteer
+        place_gazetteer_fingerprint = fingerprint
+    return gazetteer
+
+# Function to drop leading question words from a run of capitalized words
+def trim_place_candidate(candidate):
+    words = candidate.split()
+    while words and normalize_place_name(words[0]) in LEADING_NON_PLACE_WORDS:
+        words = words[1:]
+    return " ".join(words)
+
+# Function to find the states a candidate place name is in, trying shorter trailing word runs too
+def match_gazetteer(candidate, gazetteer):
+    words = candidate.split()
+    for start in range(len(words)):
+        city = " ".join(words[start:])
+        for key in (normalize_place_name(city, strip_descriptor=False), normalize_place_name(city)):
+            if key in gazetteer:
+                return city, [state for state, population in gazetteer[key]]
+    return None, []
+
+# Function to extract "City, ST" with rules over the state table and place gazetteer
+def extract_location_with_rules(user_input, user_profile):
+    """
+    Returns (city, state, resolved). resolved is False when the input mentions something that
+    may be a location but the rules can't pin it down, and the caller should ask the model.
+    """
+    gazetteer = get_place_gazetteer()
+    profile_state = (user_profile.get('state') or '').upper()
+
+    # Explicit "City, State" / "City State" mentions, preferring ones the gazetteer confirms
+    unconfirmed = None
+    for match in CITY_STATE_PATTERN.finditer(user_input):
+        state_text = match.group(2)
+        state = STATES_BY_ABBR.get(state_text) if len(state_text) == 2 else STATES_BY_NAME.get(state_text.lower())
+        city = trim_place_candidate(match.group(1))
+        if not state or not city:
+            continue
+        if gazetteer:
+            known_city, states = match_gazetteer(city, gazetteer)
+            if state not in states:
+                unconfirmed = unconfirmed or (city, state)
+                continue
+            city = known_city
+        return city, state, True
+    if unconfirmed:
+        return unconfirmed[0], unconfirmed[1], True
+
+    # A place mentioned without its state ("in Boulder", "is Austin"): resolve it through the gazetteer
+    candidates = [(match, True) for match in CITY_ONLY_PATTERN.finditer(user_input)]
+    candidates += [(match, False) for match in BARE_PLACE_PATTERN.finditer(user_input)]
+    for match, after_preposition in candidates:
+        candidate = trim_place_candidate(match.group(1))
+        if not candidate:
+            continue
+        if not gazetteer:
+            # Without a gazetteer only "in <Place>" style mentions are worth asking the model about
+            if after_preposition and not STATES_BY_NAME.get(candidate.lower()):
+                return None, None, False
+            continue
+        city, states = match_gazetteer(candidate, gazetteer)
+        if not states:
+            continue
+        if profile_state in states:
+            return city, profile_state, True
+        if len(states) == 1:
+            return city, states[0], True
+        return None, None, False
+
+    # A state on its own doesn't say which place to use
+    for match in STATE_ONLY_PATTERN.finditer(user_input):
+        state_text = match.group(1)
+        if state_text in AMBIGUOUS_STATE_ABBRS:
+            continue
+        if STATES_BY_ABBR.get(state_text) or STATES_BY_NAME.get(state_text.lower()):
+            return None, None, False
+
+    # No place mentioned, so use the user's profile location
+    return user_profile.get('city'), user_profile.get('state'), True
+
+# Function to find every place the input mentions, e.g. both cities in "is Austin pricier than Denver?"
+def find_location_mentions(user_input, user_profile):
+    """
+    Returns the (city, state) of each place mentioned, in order. Unlike
+    extract_location_with_rules, a place found in several states resolves to the profile's
+    state or, failing that, the most populous one, so comparisons never need the model.
+    """
+    gazetteer = get_place_gazetteer()
+    profile_state = (user_profile.get('state') or '').upper()
+    mentions = []
+
+    for match in CITY_STATE_PATTERN.finditer(user_input):
+        state_text = match.group(2)
+        state = STATES_BY_ABBR.get(state_text) if len(state_text) == 2 else STATES_BY_NAME.get(state_text.lower())
+        city = trim_place_candidate(match.group(1))
+        if state and city:
+            mentions.append((match.start(), city, state))
+
+    if gazetteer:
+        for pattern in (CITY_ONLY_PATTERN, BARE_PLACE_PATTERN):
+            for match in pattern.finditer(user_input):
+                city, states = match_gazetteer(trim_place_candidate(match.group(1)), gazetteer)
+                if states:
+                    mentions.append((match.start(), city, profile_state if profile_state in states else states[0]))
+
+    locations = []
+    for position, city, state in sorted(mentions):
+        if not any(normalize_place_name(city) == normalize_place_name(known) and state == known_state for known, known_state in locations):
+            locations.append((city, state))
+    return locations
+
+# Function to get the user's profile location, or (None, None) if it's incomplete
+def get_profile_location(user_profile):
+    city = user_profile.get('city')
+    state = user_profile.get('state')
+    if city and state:
+        logger.info(f"Using location from user profile: {city}, {state}")
+        return city, state
+    logger.warning("No location provided in input or user profile.")
+    return None, None
+
 def extract_location(user_input, user_profile):
     """
-    Extracts the city and state from the user's input using ChatGPT 4.0.
+    Extracts the city and state from the user's input, with deterministic rules first and
+    ChatGPT 4.0 only when the rules find an ambiguous mention.
     If no city and state are found in the input, pull from the user profile.
     """
+    city, state, resolved = extract_location_with_rules(user_input, user_profile)
+    if resolved:
+        if city and state:
+            logger.info(f"Rule-based extractor found location: {city}, {state}")
+            return city, state
+        return get_profile_location(user_profile)
 
     # Define the system prompt to ensure ChatGPT extracts the city and state
     system_prompt = """
@@ -140,56 +570,52 @@ def extract_location(user_input, user_profile):
         # Extract the city and state from the response
         chatgpt_response = response.choices[0].message.content.strip()
         logger.info(f"ChatGPT-4 extracted location: {chatgpt_response}")
-
-        # If OpenAI doesn't provide a location, check the user's profile
-        if not chatgpt_response:
-            city = user_profile.get('city')
-            state = user_profile.get('state')
-            if city and state:
-                logger.info(f"Using location from user profile: {city}, {state}")
-                return city, state
-            else:
-                logger.warning("No location provided in input or user profile.")
-                return None, None
-
-        # Assuming ChatGPT returns the location in a "City, State" format
-        city, state = chatgpt_response.split(", ")
-        return city.strip(), state.strip().upper()
-
     except Exception as e:
         logger.error(f"Error while querying OpenAI: {e}")
         return None, None
 
+    # Expect a "City, State" answer; anything else (e.g. "None" or a lone state) uses the profile
+    if chatgpt_response.count(",") >= 1:
+        city, state_text = (part.strip() for part in chatgpt_response.rsplit(",", 1))
+        state_info = us.states.lookup(state_text)
+        if city and state_info:
+            return city, state_info.abbr
+
+    return get_profile_location(user_profile)
+
 # Function to get demographic data for a city
 def get_demographic_data(city, state_name_or_abbr):
     state_fips = get_state_fips(state_name_or_abbr)
     if not state_fips:
         return None
 
-    base_url = "https://api.census.gov/data/2019/acs/acs5/profile"
-    params = {
-        'get': 'NAME,DP05_0001E,B17001_002E',
-        'for': 'place:*',
-        'in': f'state:{state_fips}',
-        'key': census_api_key
-    }
+    place = find_place(city, state_fips)
+    if not place or place.total_population is None or place.below_poverty is None:
+        logger.error(f"No demographic data found for {city}, {state_name_or_abbr}")
+        return None
 
-    response = requests.get(base_url, params=params)
+    poverty_rate = (place.below_poverty / place.total_population) * 100 if place.total_population else 0
+    return {'total_population': place.total_population, 'poverty_rate': poverty_rate}
 
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            for record in data[1:]:
-                if city.lower() in record[0].lower():
-                    total_population = int(record[1])
-                    individuals_below_poverty = int(record[2])
-                    poverty_rate = (individuals_below_poverty / total_population) * 100 if total_population else 0
-                    return {'total_population': total_population, 'poverty_rate': poverty_rate}
-        except ValueError as e:
-            logger.error(f"Error parsing demographic data: {e}")
+# Function to derive employment and unemployment rates from labor force counts
+def build_employment_data(labor_force, employed, unemployed):
+    if labor_force and employed is not None:
+        employment_rate = (employed / labor_force) * 100
     else:
-        logger.error(f"Failed to retrieve demographic data: {response.text}")
-    return None
+        employment_rate = None
+
+    if labor_force and unemployed is not None:
+        unemployment_rate = (unemployed / labor_force) * 100
+    else:
+        unemployment_rate = None
+
+    return {
+        'labor_force': labor_force,
+        'employed': employed,
+        'unemployed': unemployed,
+        'employment_rate': employment_rate,
+        'unemployment_rate': unemployment_rate
+    }
 
 # Function to get employment data for a city
 def get_employment_data(city, state_name_or_abbr):
@@ -198,61 +624,14 @@ def get_employment_data(city, state_name_or_abbr):
         logger.error(f"State FIPS code not found for '{state_name_or_abbr}'")
         return None
 
-    base_url = "https://api.census.gov/data/2019/acs/acs5"
-    params = {
-        'get': 'NAME,B23025_003E,B23025_004E,B23025_005E',
-        'for': 'place:*',
-        'in': f'state:{state_fips}',
-        'key': census_api_key
-    }
+    place = find_place(city, state_fips)
+    if not place:
+        logger.warning(f"No employment data found for '{city}', '{state_name_or_abbr}'")
+        return None
 
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            logger.debug(f"Employment data retrieved: {data}")
-
-            city_input = city.strip().lower()
-
-            for record in data[1:]:
-                place_full_name = record[0].split(',')[0].strip().lower()
-
-                descriptors = [' city', ' town', ' village', ' cdp']
-                place_name = place_full_name
-                for desc in descriptors:
-                    if place_full_name.endswith(desc):
-                        place_name = place_full_name[:-len(desc)]
-                        break
-
-                if place_name == city_input:
-                    labor_force = int(record[1]) if record[1] not in ('null', None, '') else None
-                    employed = int(record[2]) if record[2] not in ('null', None, '') else None
-                    unemployed = int(record[3]) if record[3] not in ('null', None, '') else None
-
-                    if labor_force and employed is not None:
-                        employment_rate = (employed / labor_force) * 100
-                    else:
-                        employment_rate = None
-
-                    if labor_force and unemployed is not None:
-                        unemployment_rate = (unemployed / labor_force) * 100
-                    else:
-                        unemployment_rate = None
-
-                    logger.debug(f"Employment data for {city}: Labor Force: {labor_force}, Employed: {employed}, Unemployment Rate: {unemployment_rate}")
-                    return {
-                        'labor_force': labor_force,
-                        'employed': employed,
-                        'unemployed': unemployed,
-                        'employment_rate': employment_rate,
-                        'unemployment_rate': unemployment_rate
-                    }
-            logger.warning(f"No employment data found for '{city}', '{state_name_or_abbr}'")
-        except ValueError as e:
-            logger.error(f"Error parsing employment data: {e}")
-    else:
-        logger.error(f"Failed to retrieve employment data: {response.text}")
-    return None
+    employment_data = build_employment_data(place.labor_force, place.employed, place.unemployed)
+    logger.debug(f"Employment data for {city}: Labor Force: {place.labor_force}, Employed: {place.employed}, Unemployment Rate: {employment_data['unemployment_rate']}")
+    return employment_data
 
 # Function to get housing data for a city
 def get_housing_data(city, state_name_or_abbr):
@@ -260,28 +639,168 @@ def get_housing_data(city, state_name_or_abbr):
     if not state_fips:
         return None
 
-    base_url = "https://api.census.gov/data/2019/acs/acs5"
-    params = {
-        'get': 'NAME,B25077_001E,B25064_001E',
-        'for': 'place:*',
-        'in': f'state:{state_fips}',
-        'key': census_api_key
+    place = find_place(city, state_fips)
+    if not place:
+        logger.error(f"No housing data found for {city}, {state_name_or_abbr}")
+        return None
+
+    return {
+        'median_home_value': place.median_home_value,
+        'median_gross_rent': place.median_gross_rent
     }
 
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            for record in data[1:]:
-                if city.lower() in record[0].lower():
-                    median_home_value = int(record[1]) if record[1] not in ('null', None, '') else None
-                    median_gross_rent = int(record[2]) if record[2] not in ('null', None, '') else None
-                    return {
-                        'median_home_value': median_home_value,
-                        'median_gross_rent': median_gross_rent
-                    }
-        except ValueError as e:
-            logger.error(f"Error parsing housing data: {e}")
+# Function to render the Census income, expense, demographic, employment and housing summary for a location
+def build_location_message(city, state):
+    """
+    Returns (location message, complete), where complete is False when any of the Census lookups
+    came back empty, so a render from a failed lookup isn't stored as the place's snapshot.
+    """
+    # Get census data for the city and state
+    median_income = get_census_data_msa_or_place(city, state)
+    logger.debug(f"Median income for {city}, {state}: {median_income}")
+
+    # Get additional demographic, employment, and housing data
+    demographic_data = get_demographic_data(city, state)
+    logger.debug(f"Demographic data for {city}, {state}: {demographic_data}")
+
+    employment_data = get_employment_data(city, state)
+    logger.debug(f"Employment data for {city}, {state}: {employment_data}")
+
+    housing_data = get_housing_data(city, state)
+    logger.debug(f"Housing data for {city}, {state}: {housing_data}")
+
+    # Construct location message with the retrieved data
+    location_messages = []
+
+    if isinstance(median_income, int):
+        location_messages.append(f"The median household income in {city}, {state} is ${median_income}.")
+        expense_estimates = estimate_expenses(median_income)
+        expenses_str = ", ".join([f"{category}: ${amount}" for category, amount in expense_estimates.items()])
+        location_messages.append(f"Estimated expenses based on median income are: {expenses_str}.")
+    else:
+        location_messages.append("Income data not available for the specified location.")
+
+    if demographic_data:
+        total_population = demographic_data.get('total_population')
+        poverty_rate = demographic_data.get('poverty_rate')
+        if total_population is not None and poverty_rate is not None:
+            location_messages.append(f"The total population is {total_population}, with a poverty rate of {poverty_rate:.2f}%.")
+        else:
+            location_messages.append("Demographic data is incomplete.")
+    else:
+        location_messages.append("Demographic data not available.")
+
+    if employment_data:
+        employment_rate = employment_data.get('employment_rate')
+        unemployment_rate = employment_data.get('unemployment_rate')
+        if employment_rate is not None and unemployment_rate is not None:
+            location_messages.append(f"The employment rate is {employment_rate:.2f}%, and the unemployment rate is {unemployment_rate:.2f}%.")
+        else:
+            location_messages.append("Employment data is incomplete.")
     else:
-        logger.error(f"Failed to retrieve housing data: {response.text}")
-    return None
\ No newline at end of file
+        location_messages.append("Employment data not available.")
+
+    if housing_data:
+        median_home_value = housing_data.get('median_home_value')
+        median_gross_rent = housing_data.get('median_gross_rent')
+        if median_home_value is not None:
+            location_messages.append(f"The median home value in {city}, {state} is ${median_home_value}.")
+        else:
+            location_messages.append("Median home value data not available.")
+        if median_gross_rent is not None:
+            location_messages.append(f"The median gross rent in {city}, {state} is ${median_gross_rent}.")
+        else:
+            location_messages.append("Median gross rent data not available.")
+    else:
+        location_messages.append("Housing data not available.")
+
+    # Combine all location messages
+    complete = isinstance(median_income, int) and None not in (demographic_data, employment_data, housing_data)
+    return " ".join(location_messages), complete
+
+# Function to get the (city key, state abbreviation) a LocationSnapshot is stored under
+def get_location_key(city, state):
+    state_info = us.states.lookup(state.strip())
+    state_abbr = state_info.abbr if state_info else state.strip().upper()
+    return normalize_place_name(city), state_abbr
+
+# Function to get when the Census data location snapshots are rendered from was last loaded, or None when it hasn't been
+def get_census_updated():
+    """
+    Uses the modification time of the Census table, which importcensus rebuilds after every load,
+    so checking it is a stat rather than a query. Without a table the store's newest
+    last_updated is read, at most once per CENSUS_CACHE_TIMEOUT.
+    """
+    stamp = get_census_table_stamp()
+    if stamp is not None:
+        return datetime.fromtimestamp(stamp[1] / 1e9, tz=dt_timezone.utc)
+
+    updated = cache.get('census_updated')
+    if updated is None:
+        updated = max(filter(None, [
+            CensusMetroArea.objects.aggregate(updated=Max('last_updated'))['updated'],
+            CensusPlace.objects.aggregate(updated=Max('last_updated'))['updated'],
+        ]), default=False)
+        cache.set('census_updated', updated, CENSUS_CACHE_TIMEOUT)
+    return updated or None
+
+# Function to tell whether a snapshot was rendered before the Census data was last loaded
+def is_snapshot_stale(snapshot):
+    census_updated = get_census_updated()
+    return census_updated is not None and snapshot.last_updated < census_updated
+
+# Function to build and store the location message for a city, shared by every user in that place
+def refresh_location_snapshot(city, state):
+    city_key, state_abbr = get_location_key(city, state)
+    location_message, complete = build_location_message(city, state)
+    if not complete:
+        logger.warning(f"Census lookups failed for {city}, {state}; not storing the location snapshot")
+        return location_message
+
+    LocationSnapshot.objects.update_or_create(
+        city_key=city_key, state=state_abbr,
+        defaults={'location_message': location_message}
+    )
+    logger.info(f"Refreshed location snapshot for {city}, {state}")
+    return location_message
+
+# Function to build a location snapshot off the request thread, at most one refresh per place at a time
+def start_location_refresh(city, state):
+    city_key, state_abbr = get_location_key(city, state)
+
+    # cache.add only succeeds for the first caller until the lock expires or is released
+    lock_key = f"location_snapshot_refresh_{state_abbr}_{city_key}".replace(' ', '_')
+    if not cache.add(lock_key, True, timeout=10 * 60):
+        return
+
+    def refresh():
+        try:
+            refresh_location_snapshot(city, state)
+        except Exception as e:
+            logger.error(f"Error refreshing location snapshot for {city}, {state}: {e}")
+        finally:
+            cache.delete(lock_key)
+            connection.close()
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+# Function to build a missing or stale location snapshot in the background
+def schedule_location_snapshot(city, state):
+    city_key, state_abbr = get_location_key(city, state)
+    snapshot = LocationSnapshot.objects.filter(city_key=city_key, state=state_abbr).first()
+    if snapshot is None or is_snapshot_stale(snapshot):
+        start_location_refresh(city, state)
+
+# Function to get the location message for a city, reading the stored snapshot when there is one
+def get_location_message(city, state):
+    if not city or not state:
+        return "Location data not available."
+
+    # Snapshots are only ever built in the background; a stale one is served until its replacement is stored
+    city_key, state_abbr = get_location_key(city, state)
+    snapshot = LocationSnapshot.objects.filter(city_key=city_key, state=state_abbr).first()
+    if snapshot is None or is_snapshot_stale(snapshot):
+        start_location_refresh(city, state)
+    if snapshot is None:
+        return f"Location data for {city}, {state} is still being gathered."
+    return snapshot.location_message
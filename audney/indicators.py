@@ -0,0 +1,277 @@
+# Import necessary modules
+import logging
+import re
+from collections import deque
+import numpy as np
+from scipy.signal import lfilter
+from django.core.cache import cache
+from .market_data import get_bars, find_mentioned_tickers, indicator_cache_key
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Indicator periods
+SMA_WINDOWS = (20, 50, 200)
+EMA_SPANS = (12, 26)
+MACD_SIGNAL_SPAN = 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+VOLATILITY_WINDOW = 20
+TRADING_DAYS_PER_YEAR = 252
+
+# RSI levels conventionally read as overbought / oversold
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+
+# Phrases that ask about technicals, which get indicator readings in the advice prompt
+INDICATOR_KEYWORDS = ['overbought', 'oversold', 'rsi', 'macd', 'moving averages?', 'sma', 'ema', 'atr',
+                      r'technicals?', 'momentum', r'volatil\w*', r'trend\w*']
+INDICATOR_PATTERN = re.compile(r'\b(?:' + '|'.join(INDICATOR_KEYWORDS) + r')\b', re.IGNORECASE)
+
+# How long indicator state is kept in the cache; it is brought forward from the stored bars on every read
+INDICATOR_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+# Function to compute a simple moving average; the first window - 1 values are NaN
+def sma(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.concatenate([[0.0], values]))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+# Function to compute an exponential moving average with smoothing factor alpha, seeded with the first value
+def ewma(values, alpha):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    # y[n] = alpha * x[n] + (1 - alpha) * y[n - 1] as one linear filter pass
+    result, _ = lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+    return result
+
+
+# Function to compute an exponential moving average over a span (alpha = 2 / (span + 1))
+def ema(values, span):
+    return ewma(values, 2 / (span + 1))
+
+
+# Function to compute the MACD line, signal line and histogram
+def macd(closes, fast=EMA_SPANS[0], slow=EMA_SPANS[1], signal=MACD_SIGNAL_SPAN):
+    line = ema(closes, fast) - ema(closes, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+# Function to compute Wilder's RSI
+def rsi(closes, period=RSI_PERIOD):
+    changes = np.diff(np.asarray(closes, dtype=np.float64))
+    average_gain = ewma(np.maximum(changes, 0), 1 / period)
+    average_loss = ewma(np.maximum(-changes, 0), 1 / period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(average_loss == 0, 100.0, 100 - 100 / (1 + average_gain / average_loss))
+    return np.concatenate([[np.nan], values])
+
+
+# Function to compute the true range of each bar; the first bar's is its high - low
+def true_range(highs, lows, closes):
+    highs, lows, closes = (np.asarray(values, dtype=np.float64) for values in (highs, lows, closes))
+    previous_close = np.concatenate([[np.nan], closes[:-1]])
+    return np.fmax(highs - lows, np.fmax(np.abs(highs - previous_close), np.abs(lows - previous_close)))
+
+
+# Function to compute Wilder's average true range
+def atr(highs, lows, closes, period=ATR_PERIOD):
+    return ewma(true_range(highs, lows, closes), 1 / period)
+
+
+# Function to compute annualized rolling volatility of daily log returns
+def rolling_volatility(closes, window=VOLATILITY_WINDOW):
+    returns = np.diff(np.log(np.asarray(closes, dtype=np.float64)))
+    result = np.full(len(closes), np.nan)
+    if len(returns) >= window:
+        sums = np.cumsum(np.concatenate([[0.0], returns]))
+        squares = np.cumsum(np.concatenate([[0.0], returns ** 2]))
+        window_sum = sums[window:] - sums[:-window]
+        window_squares = squares[window:] - squares[:-window]
+        variance = np.maximum(window_squares - window_sum ** 2 / window, 0) / (window - 1)
+        result[window:] = np.sqrt(variance * TRADING_DAYS_PER_YEAR)
+    return result
+
+
+class RollingWindow:
+    """
+    Fixed-size window keeping a running sum and sum of squares, so the mean and standard
+    deviation of the last `size` values are O(1) per update.
+    """
+
+    def __init__(self, size, values=()):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.squares = 0.0
+        for value in values:
+            self.push(value)
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            dropped = self.values[0]
+            self.total -= dropped
+            self.squares -= dropped ** 2
+        self.values.append(value)
+        self.total += value
+        self.squares += value ** 2
+
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.total / self.size if self.full() else np.nan
+
+    def std(self):
+        if not self.full():
+            return np.nan
+        return float(np.sqrt(max(self.squares - self.total ** 2 / self.size, 0) / (self.size - 1)))
+
+
+class IndicatorState:
+    """
+    Latest value of every indicator for one ticker plus whatever each needs to advance by one
+    bar: moving-average windows, EMA and Wilder averages, and the previous close. Built once from
+    the full series with the vectorized functions above, then updated in O(1) per new bar.
+    """
+
+    def __init__(self, bars):
+        closes, highs, lows = bars['close'], bars['high'], bars['low']
+        self.as_of = bars['date'][-1]
+        self.close = float(closes[-1])
+
+        self.sma_windows = {window: RollingWindow(window, closes[-window:]) for window in SMA_WINDOWS}
+        self.emas = {span: float(ema(closes, span)[-1]) for span in EMA_SPANS}
+        line, signal_line, _ = macd(closes)
+        self.macd_signal = float(signal_line[-1])
+
+        changes = np.diff(closes)
+        self.average_gain = float(ewma(np.maximum(changes, 0), 1 / RSI_PERIOD)[-1]) if len(changes) else np.nan
+        self.average_loss = float(ewma(np.maximum(-changes, 0), 1 / RSI_PERIOD)[-1]) if len(changes) else np.nan
+        self.atr = float(atr(highs, lows, closes)[-1])
+
+        returns = np.diff(np.log(closes))
+        self.volatility_window = RollingWindow(VOLATILITY_WINDOW, returns[-VOLATILITY_WINDOW:])
+
+    def update(self, day, high, low, close):
+        """
+        Advances every indicator by one bar.
+        """
+        previous_close = self.close
+        change = close - previous_close
+
+        for window in self.sma_windows.values():
+            window.push(close)
+        for span in EMA_SPANS:
+            alpha = 2 / (span + 1)
+            self.emas[span] = alpha * close + (1 - alpha) * self.emas[span]
+        signal_alpha = 2 / (MACD_SIGNAL_SPAN + 1)
+        self.macd_signal = signal_alpha * self.macd_line + (1 - signal_alpha) * self.macd_signal
+
+        if np.isnan(self.average_gain):
+            self.average_gain, self.average_loss = max(change, 0), max(-change, 0)
+        else:
+            self.average_gain += (max(change, 0) - self.average_gain) / RSI_PERIOD
+            self.average_loss += (max(-change, 0) - self.average_loss) / RSI_PERIOD
+        true_range = max(high - low, abs(high - previous_close), abs(low - previous_close))
+        self.atr += (true_range - self.atr) / ATR_PERIOD
+
+        self.volatility_window.push(float(np.log(close / previous_close)))
+        self.close = close
+        self.as_of = day
+
+    @property
+    def macd_line(self):
+        return self.emas[EMA_SPANS[0]] - self.emas[EMA_SPANS[1]]
+
+    @property
+    def rsi(self):
+        if np.isnan(self.average_gain):
+            return np.nan
+        if self.average_loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.average_gain / self.average_loss)
+
+    def snapshot(self):
+        """
+        Returns the latest readings as a JSON-serializable dict, with None for indicators that
+        don't have enough history yet.
+        """
+        def clean(value, digits=2):
+            return None if value is None or np.isnan(value) else round(float(value), digits)
+
+        return {
+            'as_of': str(self.as_of),
+            'close': clean(self.close),
+            **{f'sma_{window}': clean(state.mean()) for window, state in self.sma_windows.items()},
+            **{f'ema_{span}': clean(value) for span, value in self.emas.items()},
+            'macd': clean(self.macd_line, 4),
+            'macd_signal': clean(self.macd_signal, 4),
+            'macd_histogram': clean(self.macd_line - self.macd_signal, 4),
+            'rsi': clean(self.rsi),
+            'atr': clean(self.atr),
+            'volatility_pct': clean(self.volatility_window.std() * np.sqrt(TRADING_DAYS_PER_YEAR) * 100),
+        }
+
+
+# Function to get a ticker's indicator readings, advancing the cached state by any bars stored since
+def get_indicators(ticker):
+    """
+    Only bars after the cached state's as_of date are read. sync_daily_bars drops the cached
+    state when it reloads a ticker's history, so the next read rebuilds from the full series.
+    """
+    ticker = ticker.upper()
+    cache_key = indicator_cache_key(ticker)
+    state = cache.get(cache_key)
+    if state is None:
+        bars = get_bars(ticker)
+        if bars is None or len(bars['close']) < 2:
+            return None
+        state = IndicatorState(bars)
+    else:
+        bars = get_bars(ticker, start=(state.as_of + np.timedelta64(1, 'D')).item())
+        if bars is None:
+            return state.snapshot()
+        first_new = int(np.searchsorted(bars['date'], state.as_of, side='right'))
+        for position in range(first_new, len(bars['date'])):
+            state.update(bars['date'][position], float(bars['high'][position]), float(bars['low'][position]),
+                         float(bars['close'][position]))
+    cache.set(cache_key, state, INDICATOR_CACHE_TIMEOUT)
+    return state.snapshot()
+
+
+# Function to render indicator readings for the advice prompt when the user asks about technicals
+def get_indicators_message(user_input):
+    tickers = find_mentioned_tickers(user_input)
+    if not tickers and not INDICATOR_PATTERN.search(user_input):
+        return None
+
+    lines = []
+    for ticker in tickers or ['SPY']:
+        readings = get_indicators(ticker)
+        if not readings:
+            continue
+        parts = [f"close ${readings['close']:,.2f} on {readings['as_of']}"]
+        if readings['rsi'] is not None:
+            zone = 'overbought' if readings['rsi'] >= RSI_OVERBOUGHT else 'oversold' if readings['rsi'] <= RSI_OVERSOLD else 'neutral'
+            parts.append(f"RSI(14) {readings['rsi']:.1f} ({zone})")
+        for window in SMA_WINDOWS:
+            average = readings[f'sma_{window}']
+            if average is not None:
+                parts.append(f"{window}-day SMA ${average:,.2f} (price {'above' if readings['close'] > average else 'below'})")
+        parts.append(f"MACD {readings['macd']:+.2f} vs signal {readings['macd_signal']:+.2f}")
+        parts.append(f"ATR(14) ${readings['atr']:,.2f}")
+        if readings['volatility_pct'] is not None:
+            parts.append(f"20-day annualized volatility {readings['volatility_pct']:.1f}%")
+        lines.append(f"{ticker}: " + ", ".join(parts) + ".")
+
+    if not lines:
+        return None
+    return "Technical indicators from daily bars:\n" + "\n".join(lines)
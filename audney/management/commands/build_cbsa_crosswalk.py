@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+import csv
+import os
+from audney.financial_statistics import CENSUS_ACS5_URL, CBSA_CROSSWALK_PATH, fetch_census_rows
+
+
+class Command(BaseCommand):
+    help = 'Builds the Census place to metro/micro area (CBSA) crosswalk used by the income lookup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=CBSA_CROSSWALK_PATH, help='Where to write the crosswalk CSV')
+
+    def handle(self, *args, **options):
+        # Principal cities are reported per CBSA and state part, and their codes are place FIPS codes
+        rows = fetch_census_rows(CENSUS_ACS5_URL, {
+            'get': 'NAME',
+            'for': 'principal city (or part):*',
+            'in': 'metropolitan statistical area/micropolitan statistical area:* state (or part):*',
+        })
+        if not rows:
+            raise CommandError("No principal city data returned by the Census API")
+
+        os.makedirs(os.path.dirname(options['output']), exist_ok=True)
+        with open(options['output'], 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['state_fips', 'place_fips', 'cbsa_code', 'name'])
+            for name, cbsa_code, state_fips, place_fips in sorted(rows, key=lambda row: (row[2], row[3])):
+                writer.writerow([state_fips, place_fips, cbsa_code, name])
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(rows)} crosswalk rows to {options['output']}"))
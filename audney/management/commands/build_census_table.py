@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from audney.census_table import CENSUS_TABLE_DIR, build_census_table
+
+
+class Command(BaseCommand):
+    help = 'Builds the memory-mapped columnar Census table from the local Census store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=CENSUS_TABLE_DIR, help='Directory to write the column files to')
+
+    def handle(self, *args, **options):
+        count = build_census_table(options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Built Census table with {count} places in {options['output']}"))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+import us
+from audney.models import CensusPlace, CensusMetroArea
+from audney.financial_statistics import fetch_state_places, fetch_metro_areas
+from audney.census_table import build_census_table
+
+
+class Command(BaseCommand):
+    help = 'Bulk-loads 2019 ACS 5-year Census data for every place and metro area into the local Census store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--states', nargs='+', help='Only load these states (names or abbreviations)')
+
+    def handle(self, *args, **options):
+        if options['states']:
+            states = [us.states.lookup(state) for state in options['states']]
+            if not all(states):
+                raise CommandError(f"Unrecognized state in {options['states']}")
+        else:
+            states = us.states.STATES
+
+        self.load_metro_areas()
+        for state in states:
+            self.load_state_places(state)
+
+        # Rebuild the memory-mapped table the web workers read from; location snapshots rendered
+        # from the previous data are now stale and are refreshed in the background on next use
+        build_census_table()
+
+        self.stdout.write(self.style.SUCCESS('Successfully imported Census data'))
+
+    def load_metro_areas(self):
+        metro_areas = fetch_metro_areas()
+        if not metro_areas:
+            raise CommandError("No metro area data returned by the Census API")
+
+        with transaction.atomic():
+            CensusMetroArea.objects.all().delete()
+            CensusMetroArea.objects.bulk_create(metro_areas, batch_size=500)
+        self.stdout.write(f"Loaded {len(metro_areas)} metro areas")
+
+    def load_state_places(self, state):
+        places = fetch_state_places(state.fips)
+        if not places:
+            raise CommandError(f"No place data returned by the Census API for {state.name}")
+
+        with transaction.atomic():
+            CensusPlace.objects.filter(state_fips=state.fips).delete()
+            CensusPlace.objects.bulk_create(places, batch_size=500)
+        self.stdout.write(f"Loaded {len(places)} places for {state.name}")
@@ -1,19 +1,31 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 import csv
-from audney.models import Stock
+from audney.stock_index import parse_listings, fetch_listings, load_stocks
 
 
 class Command(BaseCommand):
-    help = 'Imports stock tickers from a CSV file'
+    help = 'Bulk-loads listed stock tickers into the local Stock table from a listings CSV or Alpha Vantage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', nargs='?', default='audney/stock_tickers.csv',
+                            help='Listings CSV (Alpha Vantage LISTING_STATUS columns or "Ticker Symbol,Company Name")')
+        parser.add_argument('--download', action='store_true', help='Download the current listings from Alpha Vantage instead')
 
     def handle(self, *args, **options):
-        csv_file_path = 'audney/stock_tickers.csv'
-        with open(csv_file_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                Stock.objects.get_or_create(
-                    company_name=row['Company Name'],
-                    ticker_symbol=row['Ticker Symbol']
-                )
-        self.stdout.write(self.style.SUCCESS(
-            'Successfully imported stock tickers'))
+        if options['download']:
+            rows = fetch_listings()
+            if rows is None:
+                raise CommandError("No listings returned by Alpha Vantage")
+        else:
+            try:
+                with open(options['csv_file'], newline='', encoding='utf-8') as csvfile:
+                    rows = list(csv.DictReader(csvfile))
+            except FileNotFoundError:
+                raise CommandError(f"Listings file {options['csv_file']} not found; pass a path or use --download")
+
+        stocks = parse_listings(rows)
+        if not stocks:
+            raise CommandError("No active listings found")
+
+        count = load_stocks(stocks)
+        self.stdout.write(self.style.SUCCESS(f'Successfully imported {count} stock tickers'))
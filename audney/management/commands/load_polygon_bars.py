@@ -0,0 +1,29 @@
+import glob
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from audney.price_series import PRICE_SERIES_DIR, load_polygon_file, update_price_series
+
+
+class Command(BaseCommand):
+    help = 'Converts Polygon aggregate dumps (*_response.txt) and live Polygon bars into memory-mapped price series'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Polygon /aggs JSON files (default: *_response.txt in the project root)')
+        parser.add_argument('--fetch', nargs='+', default=[], metavar='TICKER', help='Also download daily bars for these tickers from Polygon')
+        parser.add_argument('--days', type=int, default=730, help='How many days of history to download with --fetch')
+        parser.add_argument('--output', default=PRICE_SERIES_DIR, help='Directory to write the price series to')
+
+    def handle(self, *args, **options):
+        files = options['files'] or sorted(glob.glob(os.path.join(settings.BASE_DIR, '*_response.txt')))
+        for path in files:
+            ticker, count = load_polygon_file(path, options['output'])
+            self.stdout.write(f"Loaded {count} bars for {ticker} from {path}")
+
+        for ticker in options['fetch']:
+            count = update_price_series(ticker, days=options['days'], directory=options['output'])
+            if count is None:
+                raise CommandError(f"Could not download Polygon bars for {ticker}")
+            self.stdout.write(f"Stored {count} bars for {ticker} from Polygon")
+
+        self.stdout.write(self.style.SUCCESS('Successfully loaded price series'))
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from audney.market_analysis import update_market_conditions
+from audney.market_data import TRACKED_TICKERS, next_market_refresh, sync_daily_bars
+from audney.portfolio_optimizer import get_portfolio_universe
+
+
+class Command(BaseCommand):
+    help = 'Syncs daily bars and recomputes market conditions, once or on the after-close weekday schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and refresh after every weekday close')
+
+    def handle(self, *args, **options):
+        self.refresh()
+        while options['loop']:
+            next_refresh = next_market_refresh(timezone.now())
+            self.stdout.write(f"Next market refresh at {next_refresh:%Y-%m-%d %H:%M %Z}")
+            time.sleep(max((next_refresh - timezone.now()).total_seconds(), 0))
+            self.refresh()
+
+    def refresh(self):
+        update_market_conditions()
+        # The optimizer's ETFs beyond the tracked tickers, which update_market_conditions has just synced
+        for ticker in get_portfolio_universe():
+            if ticker not in TRACKED_TICKERS:
+                sync_daily_bars(ticker)
+        self.stdout.write(self.style.SUCCESS(f"Refreshed market conditions at {timezone.now():%Y-%m-%d %H:%M %Z}"))
@@ -1,10 +1,20 @@
 # Import necessary modules
 import os
-from .models import MarketCondition
-import pandas as pd
+import numpy as np
+from .models import MarketCondition, MarketConditionHistory
+from .market_data import TRACKED_TICKERS, sync_daily_bars, get_bars
+from .market_regimes import REGIME_HORIZONS, compute_regimes
+from .quotes import QuoteFetchError, get_quote
+from .stock_index import MATCH_LIST_SIZE, find_stocks, rank_matches
+from .mentions import find_mentions
 import logging
+import threading
 from datetime import datetime as dt, date, timedelta
 import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
 from openai import OpenAI
 
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
@@ -29,121 +39,134 @@ def calculate_user_age(date_of_birth):
 
 
 def get_stock_price(ticker_symbol):
-    try:
-        api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-        if not api_key:
-            logger.error("Alpha Vantage API key not found in environment variables.")
-            return "Error fetching stock price: API key not found."
-
-        logger.info(f"Fetching stock price for ticker: {ticker_symbol}")
-
-        # Make API call to Alpha Vantage for the stock price
-        url = f'https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={ticker_symbol}&interval=5min&apikey={api_key}'
-        response = requests.get(url)
+    if not os.getenv('ALPHA_VANTAGE_API_KEY'):
+        logger.error("Alpha Vantage API key not found in environment variables.")
+        return "Error fetching stock price: API key not found."
 
-        if response.status_code == 200:
-            data = response.json()
-
-            # Extract the latest closing price from the API response
-            time_series = data.get('Time Series (5min)', {})
-            if time_series:
-                latest_timestamp = max(time_series.keys())
-                price = time_series[latest_timestamp]['4. close']
-                formatted_price = "${:.2f}".format(float(price))
-                logger.info(f"Retrieved stock price for {ticker_symbol}: {formatted_price}")
-                return formatted_price
-            else:
-                logger.warning(f"No stock data available for {ticker_symbol}. It may be inactive or delisted.")
-                return f"Stock data not available for {ticker_symbol}. It may be inactive or delisted."
-        else:
-            logger.error(f"Error fetching stock price from Alpha Vantage: {response.text}")
-            return f"Error fetching stock price: {response.status_code}"
+    logger.info(f"Fetching stock price for ticker: {ticker_symbol}")
 
-    except Exception as e:
+    # Served from the quote cache; only a miss calls the quote endpoint
+    try:
+        quote = get_quote(ticker_symbol)
+    except QuoteFetchError as e:
         logger.error(f"Error fetching stock price for {ticker_symbol}: {e}")
         return f"Error fetching stock price: {e}"
+    if quote is None:
+        logger.warning(f"No stock data available for {ticker_symbol}. It may be inactive or delisted.")
+        return f"Stock data not available for {ticker_symbol}. It may be inactive or delisted."
 
-
-def classify_market(row, threshold=0.20):
-    try:
-        if row >= threshold:
-            return 'Bull'
-        elif row <= -threshold:
-            return 'Bear'
-        else:
-            return 'Neutral'
-    except Exception as e:
-        logger.error(f"Error classifying market: {e}")
-        return 'Unknown'
+    formatted_price = "${:.2f}".format(quote['price'])
+    logger.info(f"Retrieved stock price for {ticker_symbol}: {formatted_price}")
+    return formatted_price
 
 
 def update_market_conditions():
     try:
-        tickers = ['TQQQ', 'SPY', 'CLX']  # Example tickers
-        current_datetime = dt.now()
-
-        # Define the start and end dates for the last five years
-        start_date = current_datetime - timedelta(days=5 * 365)
-        end_date = current_datetime
-        api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-
-        if not api_key:
-            logger.error("Alpha Vantage API key not found.")
+        # Five years of trading days plus a margin for holidays
+        start_date = (dt.now() - timedelta(days=5 * 365 + 30)).date()
+
+        # Append any new bars to the local store, then classify every ticker and horizon from it in one pass
+        tickers, closes, as_of = [], [], []
+        for ticker in TRACKED_TICKERS:
+            sync_daily_bars(ticker)
+            bars = get_bars(ticker, start=start_date)
+            if bars is None or len(bars['close']) < 2:
+                logger.error(f"No data stored for ticker {ticker}.")
+                continue
+            tickers.append(ticker)
+            closes.append(bars['close'])
+            as_of.append(bars['date'][-1].item())
+        if not tickers:
             return
 
-        for ticker in tickers:
-            logger.info(f"Fetching data for {ticker} from Alpha Vantage")
-
-            # Make API call to Alpha Vantage for stock data
-            url = f'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY_ADJUSTED&symbol={ticker}&outputsize=full&apikey={api_key}'
-            response = requests.get(url)
-
-            if response.status_code == 200:
-                data = response.json()
-
-                # Extract time series data
-                time_series = data.get('Time Series (Daily)', {})
-                if time_series:
-                    df = pd.DataFrame(time_series).T  # Transpose the data so dates are the index
-                    df.index = pd.to_datetime(df.index)  # Convert index to datetime
-                    df = df[(df.index >= pd.to_datetime(start_date)) & (df.index <= pd.to_datetime(end_date))]  # Filter by date range
-
-                    # Rename '5. adjusted close' to 'Close' if it exists
-                    if '5. adjusted close' in df.columns:
-                        df = df.rename(columns={'5. adjusted close': 'Close'})
-                    elif '4. close' in df.columns:
-                        df = df.rename(columns={'4. close': 'Close'})
-                    else:
-                        logger.error(f"No 'Close' data available for ticker {ticker}.")
-                        continue
-
-                    # Calculate daily returns
-                    df['Returns'] = df['Close'].pct_change().fillna(0)
-
-                    # Calculate cumulative returns
-                    df['Cumulative_Returns'] = (1 + df['Returns']).cumprod() - 1
-
-                    # Classify the market based on the latest cumulative return
-                    latest_cumulative_return = df['Cumulative_Returns'].iloc[-1]
-                    current_market_condition = classify_market(latest_cumulative_return)
-
-                    # Update or create the market condition in the database
-                    MarketCondition.objects.update_or_create(ticker=ticker, defaults={'condition': current_market_condition})
-                    logger.info(f"Updated market condition for {ticker}: {current_market_condition}")
-                else:
-                    logger.error(f"No data returned for ticker {ticker}.")
-            else:
-                logger.error(f"Error fetching data for {ticker} from Alpha Vantage: {response.text}")
+        regimes = compute_regimes(closes)
+        history = []
+        for horizon, metrics in regimes.items():
+            for row, ticker in enumerate(tickers):
+                values = {
+                    'condition': str(metrics['condition'][row]),
+                    'return_pct': as_percent(metrics['return'][row]),
+                    'drawdown_pct': as_percent(metrics['drawdown'][row]),
+                    'volatility_pct': as_percent(metrics['volatility'][row]),
+                }
+                # Update or create the market condition in the database
+                MarketCondition.objects.update_or_create(ticker=ticker, horizon=horizon, defaults=values)
+                history.append(MarketConditionHistory(ticker=ticker, horizon=horizon, as_of=as_of[row], **values))
+                logger.info(f"Updated {horizon} market condition for {ticker}: {values['condition']}")
+
+        MarketConditionHistory.objects.bulk_create(
+            history, update_conflicts=True, unique_fields=['ticker', 'horizon', 'as_of'],
+            update_fields=['condition', 'return_pct', 'drawdown_pct', 'volatility_pct'],
+        )
     except Exception as e:
         logger.error(f"Error updating market conditions: {e}")
 
 
+# Function to convert a ratio to a rounded percentage, keeping missing values as None
+def as_percent(value):
+    return None if np.isnan(value) else round(float(value) * 100, 2)
+
+
+# Function to describe the stored market conditions for the advice prompt, one line per ticker
+def get_market_conditions_message(market_conditions):
+    by_ticker = {}
+    for mc in sorted(market_conditions, key=lambda mc: (mc.ticker, list(REGIME_HORIZONS).index(mc.horizon))):
+        by_ticker.setdefault(mc.ticker, []).append(mc)
+
+    lines = []
+    for ticker, conditions in by_ticker.items():
+        horizons = ", ".join(
+            f"{mc.horizon} {mc.condition}" + (f" ({mc.return_pct:+.1f}%)" if mc.return_pct is not None else "")
+            for mc in conditions
+        )
+        longest = conditions[-1]
+        line = f"Currently, '{ticker}' seems to be in a {longest.condition} market over {longest.get_horizon_display()} (by horizon: {horizons})"
+        if longest.drawdown_pct is not None:
+            line += f"; {abs(longest.drawdown_pct):.1f}% below its {longest.horizon} peak"
+        if longest.volatility_pct is not None:
+            line += f"; annualized volatility {longest.volatility_pct:.1f}%"
+        lines.append(line + ".")
+    return "\n".join(lines)
+
+
+# Function to refresh market conditions off the request thread, at most one refresh at a time
+def schedule_market_refresh():
+    # cache.add only succeeds for the first caller until the lock expires or is released
+    if not cache.add('market_conditions_refresh', True, timeout=10 * 60):
+        return
+
+    def refresh():
+        try:
+            update_market_conditions()
+        finally:
+            cache.delete('market_conditions_refresh')
+            connection.close()
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+# Function to read the stored market conditions, triggering a background refresh when they are stale
+def get_market_conditions():
+    market_conditions = list(MarketCondition.objects.all())
+    oldest = min((mc.last_updated for mc in market_conditions), default=None)
+    if oldest is None or oldest < timezone.now() - timedelta(seconds=settings.MARKET_CONDITIONS_TTL):
+        logger.info(f"Market conditions last updated {oldest}; scheduling a refresh")
+        schedule_market_refresh()
+    return market_conditions
+
+
 def extract_company_name(user_input):
     try:
         if not user_input:
             logger.warning("Input text is empty.")
             return None
 
+        # Find mentions of listed companies and tickers locally; only ask the model when there are none
+        mentions = find_mentions(user_input)
+        if mentions:
+            logger.info(f"Found company or ticker mentions: {[mention['text'] for mention in mentions]}")
+            return mentions[0]['query']
+
         messages = [
             {
                 "role": "system", 
@@ -181,18 +204,26 @@ def get_ticker_symbol_from_name(company_name):
             logger.warning("Company name is empty.")
             return []
 
+        # Answer from the local stock index when it knows the name or symbol
+        local_matches = find_stocks(company_name, limit=MATCH_LIST_SIZE)
+        if local_matches:
+            logger.info(f"Ticker symbols for {company_name} from the stock index: {local_matches}")
+            return local_matches
+
         api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
         if not api_key:
             logger.error("Alpha Vantage API key not found.")
             return []
 
-        # Use Alpha Vantage's SYMBOL_SEARCH function
+        # Fall back to Alpha Vantage's SYMBOL_SEARCH function
         url = f"https://www.alphavantage.co/query?function=SYMBOL_SEARCH&keywords={company_name}&apikey={api_key}"
         response = requests.get(url)
 
         if response.status_code == 200:
             data = response.json()
             matches = [(result.get('2. name', ''), result.get('1. symbol', '')) for result in data.get('bestMatches', [])]
+            # Keep the few results that actually resemble the name, best first
+            matches = rank_matches(company_name, matches, MATCH_LIST_SIZE)
             logger.info(f"Ticker symbols for {company_name}: {matches}")
             return matches
         else:
@@ -203,14 +234,19 @@ def get_ticker_symbol_from_name(company_name):
         return []
 
 
-def search_company_or_ticker(query):
+def search_company_or_ticker(query, extract=True):
     try:
-        # Ensure the extracted query is valid and clean
-        extracted_query = extract_company_name(query)
+        # Ensure the extracted query is valid and clean; callers that already extracted it skip a second pass
+        extracted_query = extract_company_name(query) if extract else query
         if not extracted_query:
             return []
 
-        # Use Alpha Vantage's SYMBOL_SEARCH function
+        # Answer from the local stock index when it knows the name or symbol
+        local_matches = find_stocks(extracted_query, limit=MATCH_LIST_SIZE)
+        if local_matches:
+            return local_matches[0] if len(local_matches) == 1 else local_matches
+
+        # Fall back to Alpha Vantage's SYMBOL_SEARCH function
         api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
         if not api_key:
             logger.error("Alpha Vantage API key not found.")
@@ -222,19 +258,17 @@ def search_company_or_ticker(query):
         if response.status_code == 200:
             data = response.json()
 
-            # Filter the results based on whether the company name or ticker symbol contains the query (case-insensitive)
-            possible_matches = [
-                (result['2. name'], result['1. symbol'])
-                for result in data.get('bestMatches', [])
-                if extracted_query.lower() in result['2. name'].lower() or extracted_query.lower() in result['1. symbol'].lower()
-            ]
-
-            # Return an exact match if one exists, otherwise return the filtered possible matches
-            exact_matches = [match for match in possible_matches if extracted_query.lower() == match[0].lower()]
-
-            if len(exact_matches) == 1:
-                return exact_matches[0]  # Return the exact match
-            return possible_matches if possible_matches else []
+            # Rank the results by similarity to the query, so "Clorox" finds "The Clorox Company" and typos still match
+            possible_matches = rank_matches(
+                extracted_query,
+                [(result['2. name'], result['1. symbol']) for result in data.get('bestMatches', [])],
+                MATCH_LIST_SIZE,
+            )
+
+            # Return a single clear match on its own, otherwise the ranked candidates
+            if len(possible_matches) == 1:
+                return possible_matches[0]
+            return possible_matches
         else:
             logger.error(f"Error searching for company/ticker: {response.text}")
             return []
@@ -0,0 +1,218 @@
+# Import necessary modules
+import os
+import re
+import logging
+import requests
+import numpy as np
+from datetime import date, datetime as dt, time, timedelta
+from zoneinfo import ZoneInfo
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from .models import DailyBar
+from .price_series import get_price_series
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Tickers whose daily bars are kept in the local store
+TRACKED_TICKERS = ['TQQQ', 'SPY', 'CLX']
+
+ALPHA_VANTAGE_URL = 'https://www.alphavantage.co/query'
+
+# A compact response holds the latest 100 trading days (about 140 calendar days); a store whose
+# newest bar is older than this needs the full history again to avoid a gap
+COMPACT_WINDOW_DAYS = 100
+
+# Daily bars are final shortly after the 4pm Eastern close; refreshes run on weekdays after this time
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+MARKET_REFRESH_TIME = time(16, 30)
+
+# Regular trading session, Eastern
+MARKET_OPEN_TIME = time(9, 30)
+MARKET_CLOSE_TIME = time(16, 0)
+
+# Numeric DailyBar fields loaded as float64 arrays
+BAR_FIELDS = ['open', 'high', 'low', 'close', 'adjusted_close', 'volume']
+
+
+# Function to download daily bars for a ticker from Alpha Vantage, oldest first
+def fetch_daily_bars(ticker, outputsize='compact'):
+    api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        logger.error("Alpha Vantage API key not found.")
+        return None
+
+    try:
+        response = requests.get(ALPHA_VANTAGE_URL, params={
+            'function': 'TIME_SERIES_DAILY_ADJUSTED',
+            'symbol': ticker,
+            'outputsize': outputsize,
+            'apikey': api_key,
+        }, timeout=30)
+        if response.status_code != 200:
+            logger.error(f"Error fetching data for {ticker} from Alpha Vantage: {response.text}")
+            return None
+
+        time_series = response.json().get('Time Series (Daily)', {})
+        bars = [
+            DailyBar(
+                ticker=ticker,
+                date=dt.strptime(day, '%Y-%m-%d').date(),
+                open=float(values['1. open']),
+                high=float(values['2. high']),
+                low=float(values['3. low']),
+                close=float(values['4. close']),
+                adjusted_close=float(values.get('5. adjusted close', values['4. close'])),
+                volume=int(float(values.get('6. volume', values.get('5. volume', 0)))),
+            )
+            for day, values in time_series.items()
+        ]
+        return sorted(bars, key=lambda bar: bar.date)
+    except Exception as e:
+        logger.error(f"Error fetching daily bars for {ticker}: {e}")
+        return None
+
+
+# Function to get the cache key of a ticker's indicator state, which is dropped whenever its bar history is reloaded
+def indicator_cache_key(ticker):
+    return f'indicators_{ticker.upper().replace(":", "_")}'
+
+
+# Function to bring the local bar store for a ticker up to date
+def sync_daily_bars(ticker):
+    """
+    Backfills the full history the first time a ticker is seen (or after a long gap); after that
+    only the compact tail is fetched and bars newer than the last stored one are appended.
+
+    Adjusted closes are rewritten by the provider after dividends and splits. If the compact tail
+    disagrees with the stored adjusted close on an overlapping day, the whole history is reloaded
+    so returns computed from the store stay consistent.
+
+    Returns the number of bars added, or None if the download failed.
+    """
+    latest = DailyBar.objects.filter(ticker=ticker).aggregate(latest=Max('date'))['latest']
+    if latest and latest >= date.today():
+        return 0
+
+    full = latest is None or (date.today() - latest).days > COMPACT_WINDOW_DAYS
+    bars = fetch_daily_bars(ticker, outputsize='full' if full else 'compact')
+    if not bars:
+        return None
+
+    if not full:
+        stored = DailyBar.objects.filter(ticker=ticker, date=latest).values_list('adjusted_close', flat=True).first()
+        overlap = next((bar for bar in bars if bar.date == latest), None)
+        if overlap and not np.isclose(overlap.adjusted_close, stored, rtol=1e-6):
+            logger.info(f"Adjusted closes for {ticker} changed since the last sync; reloading full history")
+            bars = fetch_daily_bars(ticker, outputsize='full')
+            if not bars:
+                return None
+            full = True
+
+    with transaction.atomic():
+        if full:
+            DailyBar.objects.filter(ticker=ticker).delete()
+            cache.delete(indicator_cache_key(ticker))
+        else:
+            bars = [bar for bar in bars if bar.date > latest]
+        DailyBar.objects.bulk_create(bars, batch_size=1000, ignore_conflicts=True)
+
+    logger.info(f"Stored {len(bars)} new daily bars for {ticker}")
+    return len(bars)
+
+
+# Function to load a ticker's stored bars as typed NumPy arrays, oldest first
+def load_daily_bars(ticker, start=None, fields=BAR_FIELDS):
+    """
+    Returns a dict with a datetime64[D] 'date' array and one float64 array per field.
+    """
+    queryset = DailyBar.objects.filter(ticker=ticker)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    rows = list(queryset.order_by('date').values_list('date', *fields))
+
+    bars = {'date': np.array([row[0] for row in rows], dtype='datetime64[D]')}
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(fields))
+    for position, field in enumerate(fields):
+        bars[field] = values[:, position]
+    return bars
+
+
+# Function to get a ticker's split- and dividend-adjusted daily bars from whichever store has them
+def get_bars(ticker, start=None):
+    """
+    Returns a dict of 'date' (datetime64[D]) and float64 'open', 'high', 'low', 'close' and
+    'volume' arrays, oldest first, or None if neither store has the ticker. Bars come from the
+    DailyBar table, with open/high/low scaled by the same adjustment as the close, or else from
+    the memory-mapped Polygon price series (which is already adjusted).
+    """
+    bars = load_daily_bars(ticker, start=start)
+    if len(bars['date']):
+        adjustment = bars['adjusted_close'] / bars['close']
+        return {
+            'date': bars['date'],
+            'open': bars['open'] * adjustment,
+            'high': bars['high'] * adjustment,
+            'low': bars['low'] * adjustment,
+            'close': bars['adjusted_close'],
+            'volume': bars['volume'],
+        }
+
+    series = get_price_series(ticker)
+    if series is None or not len(series):
+        return None
+    dates = series.dates
+    first = int(np.searchsorted(dates, np.datetime64(start, 'D'))) if start else 0
+    return {
+        'date': dates[first:],
+        'open': np.asarray(series['o'][first:]),
+        'high': np.asarray(series['h'][first:]),
+        'low': np.asarray(series['l'][first:]),
+        'close': np.asarray(series['c'][first:]),
+        'volume': np.asarray(series['v'][first:]),
+    }
+
+
+# Function to get the next scheduled market refresh after a moment (an aware datetime)
+def next_market_refresh(after):
+    """
+    Returns the next weekday at MARKET_REFRESH_TIME Eastern strictly after `after`. Exchange
+    holidays are not skipped; a refresh on a holiday simply finds no new bar.
+    """
+    local = after.astimezone(MARKET_TIMEZONE)
+    candidate = dt.combine(local.date(), MARKET_REFRESH_TIME, tzinfo=MARKET_TIMEZONE)
+    if candidate <= local:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+# Function to tell whether the regular session is open at a moment
+def is_market_open(moment):
+    local = moment.astimezone(MARKET_TIMEZONE)
+    return local.weekday() < 5 and MARKET_OPEN_TIME <= local.time() < MARKET_CLOSE_TIME
+
+
+# Function to get the next weekday session open strictly after a moment (holidays are not skipped)
+def next_market_open(after):
+    local = after.astimezone(MARKET_TIMEZONE)
+    candidate = dt.combine(local.date(), MARKET_OPEN_TIME, tzinfo=MARKET_TIMEZONE)
+    if candidate <= local:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+# Function to get the date of the newest stored bar across all tickers
+def get_latest_bar_date():
+    return DailyBar.objects.aggregate(latest=Max('date'))['latest']
+
+
+# Function to find the tracked tickers mentioned in a message, e.g. "SPY" or "$TQQQ"
+def find_mentioned_tickers(user_input):
+    mentioned = {token.lstrip('$').upper() for token in re.findall(r'\$?\b[A-Za-z]{1,5}\b', user_input)
+                 if token.startswith('$') or token.isupper()}
+    return [ticker for ticker in TRACKED_TICKERS if ticker in mentioned]
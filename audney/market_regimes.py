@@ -0,0 +1,97 @@
+# Import necessary modules
+import logging
+import numpy as np
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Horizons as (trading days, return threshold for a Bull/Bear label)
+REGIME_HORIZONS = {
+    '1M': (21, 0.05),
+    '3M': (63, 0.10),
+    '1Y': (252, 0.20),
+    '5Y': (1260, 0.20),
+}
+
+# A close this far below the horizon's peak is a Bear market whatever the total return
+BEAR_DRAWDOWN = -0.20
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+# Function to stack price series of different lengths into one matrix, aligned on the latest bar
+def align_closes(closes):
+    """
+    Returns (matrix, lengths): a (tickers, days) float64 matrix with shorter series padded with
+    NaN on the left, and the number of real bars in each row.
+    """
+    lengths = np.array([len(series) for series in closes], dtype=np.int64)
+    matrix = np.full((len(closes), lengths.max(initial=0)), np.nan)
+    for row, series in enumerate(closes):
+        if len(series):
+            matrix[row, -len(series):] = series
+    return matrix, lengths
+
+
+# Function to label returns and drawdowns as Bull, Bear or Neutral (scalars or arrays)
+def classify_market(returns, threshold=0.20, drawdowns=None):
+    returns = np.asarray(returns, dtype=np.float64)
+    drawdowns = np.full(returns.shape, np.nan) if drawdowns is None else np.asarray(drawdowns, dtype=np.float64)
+    labels = np.select(
+        [np.isnan(returns), drawdowns <= BEAR_DRAWDOWN, returns >= threshold, returns <= -threshold],
+        ['Unknown', 'Bear', 'Bull', 'Bear'],
+        'Neutral',
+    )
+    return str(labels) if labels.ndim == 0 else labels
+
+
+# Function to compute the return, drawdown, volatility and regime of many tickers over every horizon at once
+def compute_regimes(closes, horizons=REGIME_HORIZONS):
+    """
+    Takes one array of adjusted closes per ticker (oldest first) and returns
+    {horizon: {'return', 'drawdown', 'volatility', 'condition'}}, each an array with one entry
+    per ticker. Every metric is computed for all tickers in one set of array operations; the
+    only loop is over horizons.
+
+    A ticker with less history than a horizon is measured over all the history it has.
+    Volatility is the annualized standard deviation of daily log returns.
+    """
+    matrix, lengths = align_closes(closes)
+    tickers, days = matrix.shape
+    rows = np.arange(tickers)
+    latest = matrix[:, -1] if days else np.full(tickers, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_returns = np.diff(np.log(matrix), axis=1)
+
+    regimes = {}
+    for horizon, (window, threshold) in horizons.items():
+        # Per-ticker window: the horizon, or the whole series if it is shorter
+        spans = np.minimum(window, np.maximum(lengths - 1, 0))
+        starts = days - 1 - spans
+        in_window = np.arange(days)[None, :] >= starts[:, None]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_return = latest / matrix[rows, np.maximum(starts, 0)] - 1
+            peak = np.where(in_window, matrix, -np.inf).max(axis=1, initial=-np.inf)
+            drawdown = latest / peak - 1
+
+            # Return j runs from bar j to bar j + 1, so it is in the window when bar j is
+            return_mask = in_window[:, :-1]
+            count = return_mask.sum(axis=1)
+            window_returns = np.where(return_mask, log_returns, 0.0)
+            mean = window_returns.sum(axis=1) / count
+            variance = (np.where(return_mask, log_returns - mean[:, None], 0.0) ** 2).sum(axis=1) / (count - 1)
+            volatility = np.sqrt(variance * TRADING_DAYS_PER_YEAR)
+
+        no_history = spans < 1
+        total_return[no_history] = np.nan
+        drawdown[no_history] = np.nan
+        volatility[count < 2] = np.nan
+
+        regimes[horizon] = {
+            'return': total_return,
+            'drawdown': drawdown,
+            'volatility': volatility,
+            'condition': classify_market(total_return, threshold, drawdown),
+        }
+    return regimes
@@ -0,0 +1,199 @@
+# Import necessary modules
+import logging
+from collections import deque
+from .stock_index import COMPANY_ALIASES, base_company_name, get_stock_index
+from .quotes import NON_TICKER_WORDS
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Names shorter than this are too likely to be ordinary words to count as mentions
+MIN_NAME_LENGTH = 3
+
+# Single-word company names that are also everyday words; these only count when capitalized mid-sentence
+COMMON_WORD_NAMES = {
+    'target', 'block', 'match', 'progressive', 'gap', 'snap', 'box', 'pool', 'zoom', 'square', 'best', 'first',
+    'general', 'united', 'national', 'global', 'american', 'energy', 'capital', 'dollar', 'home', 'world', 'chase',
+    'visa', 'shell', 'carrier', 'compass', 'equity', 'trust', 'select', 'realty', 'apollo', 'fidelity',
+}
+
+# Characters kept when masking text for matching; everything else becomes a space
+MATCH_CHARACTERS = set('abcdefghijklmnopqrstuvwxyz0123456789&')
+
+
+# Function to lowercase text and blank out everything but letters, digits and '&', keeping every position
+def mask_text(text):
+    return ''.join(character if character in MATCH_CHARACTERS else ' ' for character in text.lower())
+
+
+# Function to turn a company name or alias into the pattern it is matched by, e.g. "The Coca-Cola Co" -> "coca cola co"
+def mention_pattern(name):
+    pattern = " ".join(mask_text(name).split())
+    return pattern[4:] if pattern.startswith("the ") else pattern
+
+
+class AhoCorasick:
+    """
+    Multi-pattern string matcher: a trie of every pattern with failure links, so a single
+    left-to-right pass over the text reports every occurrence of every pattern, in time linear in
+    the text plus the number of matches, however many patterns there are.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+    def add(self, pattern, value):
+        node = 0
+        for character in pattern:
+            child = self.goto[node].get(character)
+            if child is None:
+                child = len(self.goto)
+                self.goto[node][character] = child
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            node = child
+        self.outputs[node].append((len(pattern), value))
+
+    def build(self):
+        # Breadth-first, so every node's failure link points at an already-finished shallower node
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for character, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(character, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+                queue.append(child)
+        return self
+
+    def search(self, text):
+        """Yields (start, end, value) for every pattern occurrence in text."""
+        node = 0
+        for position, character in enumerate(text):
+            while node and character not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(character, 0)
+            for length, value in self.outputs[node]:
+                yield position + 1 - length, position + 1, value
+
+
+# Function to build the mention automaton over every listed symbol, company name and alias in a stock index
+def build_mention_matcher(index):
+    """
+    Patterns are each listing's masked full and base names (e.g. "clorox company" and "clorox"),
+    the aliases, and the symbols. Values are (kind, positions) with kind 'name', 'alias' or
+    'symbol' and positions into index.stocks best first.
+    """
+    names = {}
+    for position, stock in enumerate(index.stocks):
+        pattern = mention_pattern(stock.company_name)
+        for key in {pattern, base_company_name(pattern)}:
+            if len(key) >= MIN_NAME_LENGTH:
+                names.setdefault(key, []).append(position)
+    aliases = {
+        mention_pattern(alias): [index.by_symbol[symbol]]
+        for alias, symbol in COMPANY_ALIASES.items() if symbol in index.by_symbol
+    }
+
+    matcher = AhoCorasick()
+    for pattern, positions in names.items():
+        if pattern not in aliases:
+            matcher.add(pattern, ('name', positions))
+    for pattern, positions in aliases.items():
+        matcher.add(pattern, ('alias', positions))
+    for symbol, position in index.by_symbol.items():
+        matcher.add(mention_pattern(symbol), ('symbol', [position]))
+    return matcher.build()
+
+
+# The matcher built in this process, with the stock index it was built from
+mention_matcher = None
+mention_matcher_index = None
+
+
+# Function to get the mention matcher for the current stock index
+def get_mention_matcher():
+    global mention_matcher, mention_matcher_index
+    index = get_stock_index()
+    if mention_matcher is None or mention_matcher_index is not index:
+        mention_matcher = build_mention_matcher(index)
+        mention_matcher_index = index
+        logger.info(f"Built mention matcher over {len(index)} symbols")
+    return mention_matcher, index
+
+
+# Function to tell whether a position starts a sentence, where any word is capitalized
+def is_sentence_start(text, position):
+    preceding = text[:position].rstrip(' "\'(')
+    return not preceding or preceding[-1] in '.!?\n'
+
+
+# Function to find every company or ticker mentioned in a message, in the order they appear
+def find_mentions(user_input):
+    """
+    Returns [{'text', 'name', 'symbol', 'query', 'explicit', 'start', 'end'}, ...], one per
+    company. Multi-word names and aliases match case-insensitively on word boundaries; single-word
+    names only when capitalized ("Apple", not "apple"), and those in COMMON_WORD_NAMES only when
+    capitalized mid-sentence ("buy Target", not "Target dates..."). Symbols match only as a
+    cashtag ("$tsla") or in capitals ("TSLA"). Where matches overlap the leftmost, then longest,
+    wins ("Bank of America" over "America").
+
+    'query' is the symbol when the mention is unambiguous and the mentioned text otherwise
+    (e.g. "Alphabet", listed as GOOGL and GOOG). 'explicit' marks mentions that can hardly be
+    anything but a company: symbols and multi-word names.
+    """
+    if not user_input:
+        return []
+
+    try:
+        matcher, index = get_mention_matcher()
+    except Exception as e:
+        logger.error(f"Error building the mention matcher: {e}")
+        return []
+    if not len(index):
+        return []
+
+    masked = mask_text(user_input)
+    hits = []
+    for start, end, (kind, positions) in matcher.search(masked):
+        # Whole words only
+        if (start and masked[start - 1] != ' ') or (end < len(masked) and masked[end] != ' '):
+            continue
+        written = user_input[start:end]
+        if kind == 'symbol':
+            cashtag = start and user_input[start - 1] == '$'
+            if not cashtag and (written != written.upper() or len(written) < 2 or written in NON_TICKER_WORDS):
+                continue
+        elif kind == 'name' and ' ' not in masked[start:end]:
+            if not written[0].isupper():
+                continue
+            if masked[start:end] in COMMON_WORD_NAMES and is_sentence_start(user_input, start):
+                continue
+        explicit = kind == 'symbol' or ' ' in masked[start:end]
+        hits.append((start, end, positions, explicit))
+
+    mentions, covered_until, seen = [], 0, set()
+    for start, end, positions, explicit in sorted(hits, key=lambda hit: (hit[0], -(hit[1] - hit[0]))):
+        if start < covered_until:
+            continue
+        covered_until = end
+        name, symbol = index.match(positions[0])
+        if symbol in seen:
+            continue
+        seen.add(symbol)
+        text = user_input[start:end]
+        mentions.append({
+            'text': text,
+            'name': name,
+            'symbol': symbol,
+            'query': symbol if len(positions) == 1 else text,
+            'explicit': explicit,
+            'start': start,
+            'end': end,
+        })
+    return mentions
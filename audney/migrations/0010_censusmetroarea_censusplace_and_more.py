@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audney', '0009_alter_userprofile_income_level_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CensusMetroArea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cbsa_code', models.CharField(max_length=5, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('median_income', models.IntegerField(blank=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CensusPlace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state_fips', models.CharField(max_length=2)),
+                ('place_fips', models.CharField(max_length=5)),
+                ('name', models.CharField(max_length=200)),
+                ('place_name', models.CharField(max_length=200)),
+                ('median_income', models.IntegerField(blank=True, null=True)),
+                ('total_population', models.IntegerField(blank=True, null=True)),
+                ('below_poverty', models.IntegerField(blank=True, null=True)),
+                ('labor_force', models.IntegerField(blank=True, null=True)),
+                ('employed', models.IntegerField(blank=True, null=True)),
+                ('unemployed', models.IntegerField(blank=True, null=True)),
+                ('median_home_value', models.IntegerField(blank=True, null=True)),
+                ('median_gross_rent', models.IntegerField(blank=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state_fips', 'place_name'], name='audney_cens_state_f_df8a84_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='censusplace',
+            constraint=models.UniqueConstraint(fields=('state_fips', 'place_fips'), name='unique_census_place'),
+        ),
+    ]
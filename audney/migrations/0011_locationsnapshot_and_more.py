@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audney', '0010_censusmetroarea_censusplace_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_key', models.CharField(max_length=200)),
+                ('state', models.CharField(max_length=2)),
+                ('location_message', models.TextField()),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='locationsnapshot',
+            constraint=models.UniqueConstraint(fields=('city_key', 'state'), name='unique_location_snapshot'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audney', '0011_locationsnapshot_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('date', models.DateField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('adjusted_close', models.FloatField()),
+                ('volume', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailybar',
+            constraint=models.UniqueConstraint(fields=('ticker', 'date'), name='unique_daily_bar'),
+        ),
+    ]
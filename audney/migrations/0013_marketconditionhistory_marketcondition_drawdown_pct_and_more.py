@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audney', '0012_dailybar_dailybar_unique_daily_bar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketConditionHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('horizon', models.CharField(choices=[('1M', '1 month'), ('3M', '3 months'), ('1Y', '1 year'), ('5Y', '5 years')], max_length=2)),
+                ('as_of', models.DateField()),
+                ('condition', models.CharField(max_length=10)),
+                ('return_pct', models.FloatField(blank=True, null=True)),
+                ('drawdown_pct', models.FloatField(blank=True, null=True)),
+                ('volatility_pct', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='marketcondition',
+            name='drawdown_pct',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketcondition',
+            name='horizon',
+            field=models.CharField(choices=[('1M', '1 month'), ('3M', '3 months'), ('1Y', '1 year'), ('5Y', '5 years')], default='5Y', max_length=2),
+        ),
+        migrations.AddField(
+            model_name='marketcondition',
+            name='return_pct',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketcondition',
+            name='volatility_pct',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='marketcondition',
+            constraint=models.UniqueConstraint(fields=('ticker', 'horizon'), name='unique_market_condition'),
+        ),
+        migrations.AddConstraint(
+            model_name='marketconditionhistory',
+            constraint=models.UniqueConstraint(fields=('ticker', 'horizon', 'as_of'), name='unique_market_condition_history'),
+        ),
+    ]
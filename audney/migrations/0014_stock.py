@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audney', '0013_marketconditionhistory_marketcondition_drawdown_pct_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Stock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker_symbol', models.CharField(max_length=20, unique=True)),
+                ('company_name', models.CharField(max_length=255)),
+                ('exchange', models.CharField(blank=True, max_length=20)),
+                ('asset_type', models.CharField(blank=True, max_length=20)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -133,6 +133,13 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     else:
         instance.userprofile.save()
 
+# Receiver to build the shared location snapshot for a profile's city and state in the background
+@receiver(post_save, sender=UserProfile)
+def schedule_profile_location_snapshot(sender, instance, **kwargs):
+    if instance.city and instance.state:
+        from .financial_statistics import schedule_location_snapshot
+        transaction.on_commit(lambda: schedule_location_snapshot(instance.city, instance.state))
+
 
 MESSAGE_TYPES = [
     ('user', 'User'),
@@ -181,8 +188,8 @@ class AudneyMessage(models.Model):
         if self.contains_html:
             self.message = bleach.clean(
                 self.message,
-                tags=['a', 'p', 'ul', 'li'],
-                attributes={'a': ['href', 'class', 'data-ticker-symbol']},
+                tags=['a', 'p', 'ul', 'li', 'table', 'thead', 'tbody', 'tr', 'th', 'td'],
+                attributes={'a': ['href', 'class', 'data-ticker-symbol'], 'table': ['class'], 'td': ['colspan']},
                 strip=True
             )
 
@@ -195,13 +202,137 @@ class AudneyMessage(models.Model):
 
 # Define a MarketCondition model
 class MarketCondition(models.Model):
+    HORIZON_CHOICES = [
+        ('1M', '1 month'),
+        ('3M', '3 months'),
+        ('1Y', '1 year'),
+        ('5Y', '5 years'),
+    ]
+
+    ticker = models.CharField(max_length=10)
+    horizon = models.CharField(max_length=2, choices=HORIZON_CHOICES, default='5Y')
+    condition = models.CharField(max_length=10)
+    return_pct = models.FloatField(null=True, blank=True)  # Total return over the horizon, in percent
+    drawdown_pct = models.FloatField(null=True, blank=True)  # Latest close below the horizon's peak close, in percent
+    volatility_pct = models.FloatField(null=True, blank=True)  # Annualized volatility of daily returns, in percent
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.ticker} ({self.horizon}): {self.condition}"
+
+    class Meta:
+        app_label = 'audney'
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'horizon'], name='unique_market_condition'),
+        ]
+
+# Define a MarketConditionHistory model keeping every computed market condition, one row per ticker, horizon and trading day
+class MarketConditionHistory(models.Model):
     ticker = models.CharField(max_length=10)
+    horizon = models.CharField(max_length=2, choices=MarketCondition.HORIZON_CHOICES)
+    as_of = models.DateField()  # Date of the latest bar the condition was computed from
     condition = models.CharField(max_length=10)
+    return_pct = models.FloatField(null=True, blank=True)
+    drawdown_pct = models.FloatField(null=True, blank=True)
+    volatility_pct = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.ticker} ({self.horizon}) on {self.as_of}: {self.condition}"
+
+    class Meta:
+        app_label = 'audney'
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'horizon', 'as_of'], name='unique_market_condition_history'),
+        ]
+
+
+# Define a CensusPlace model holding 2019 ACS 5-year data for a Census place
+class CensusPlace(models.Model):
+    state_fips = models.CharField(max_length=2)
+    place_fips = models.CharField(max_length=5)
+    name = models.CharField(max_length=200)  # Full Census NAME, e.g. "Denver city, Colorado"
+    place_name = models.CharField(max_length=200)  # normalize_place_name(name), e.g. "denver"
+    median_income = models.IntegerField(null=True, blank=True)  # B19013_001E
+    total_population = models.IntegerField(null=True, blank=True)  # DP05_0001E
+    below_poverty = models.IntegerField(null=True, blank=True)  # B17001_002E
+    labor_force = models.IntegerField(null=True, blank=True)  # B23025_003E
+    employed = models.IntegerField(null=True, blank=True)  # B23025_004E
+    unemployed = models.IntegerField(null=True, blank=True)  # B23025_005E
+    median_home_value = models.IntegerField(null=True, blank=True)  # B25077_001E
+    median_gross_rent = models.IntegerField(null=True, blank=True)  # B25064_001E
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        app_label = 'audney'
+        constraints = [
+            models.UniqueConstraint(fields=['state_fips', 'place_fips'], name='unique_census_place'),
+        ]
+        indexes = [
+            models.Index(fields=['state_fips', 'place_name']),
+        ]
+
+# Define a CensusMetroArea model holding median income for a metropolitan/micropolitan statistical area
+class CensusMetroArea(models.Model):
+    cbsa_code = models.CharField(max_length=5, unique=True)
+    name = models.CharField(max_length=200)  # e.g. "Denver-Aurora-Lakewood, CO Metro Area"
+    median_income = models.IntegerField(null=True, blank=True)  # B19013_001E
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        app_label = 'audney'
+
+# Define a LocationSnapshot model caching the rendered Census summary for a city, shared by all users there
+class LocationSnapshot(models.Model):
+    city_key = models.CharField(max_length=200)  # normalize_place_name(city), e.g. "denver"
+    state = models.CharField(max_length=2)
+    location_message = models.TextField()
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.ticker}: {self.condition}"
+        return f"{self.city_key}, {self.state}"
 
     class Meta:
         app_label = 'audney'
+        constraints = [
+            models.UniqueConstraint(fields=['city_key', 'state'], name='unique_location_snapshot'),
+        ]
+
+# Define a DailyBar model holding one day of OHLCV data for a tracked ticker
+class DailyBar(models.Model):
+    ticker = models.CharField(max_length=10)
+    date = models.DateField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    adjusted_close = models.FloatField()
+    volume = models.BigIntegerField()
 
+    def __str__(self):
+        return f"{self.ticker} {self.date}: {self.close}"
+
+    class Meta:
+        app_label = 'audney'
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'date'], name='unique_daily_bar'),
+        ]
+
+# Define a Stock model holding one listed symbol from the exchange listings, for local ticker lookups
+class Stock(models.Model):
+    ticker_symbol = models.CharField(max_length=20, unique=True)
+    company_name = models.CharField(max_length=255)
+    exchange = models.CharField(max_length=20, blank=True)
+    asset_type = models.CharField(max_length=20, blank=True)  # "Stock" or "ETF" in Alpha Vantage listings
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.company_name} ({self.ticker_symbol})"
+
+    class Meta:
+        app_label = 'audney'
@@ -0,0 +1,147 @@
+# Import necessary modules
+import logging
+import numpy as np
+from scipy.optimize import minimize
+from django.conf import settings
+from django.core.cache import cache
+from .correlations import get_aligned_returns
+from .market_data import get_latest_bar_date
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# ETFs the optimizer allocates across, overridable with settings.PORTFOLIO_UNIVERSE. Tickers
+# without stored bars are left out.
+DEFAULT_PORTFOLIO_UNIVERSE = ['SPY', 'QQQ', 'IWM', 'EFA', 'AGG', 'TLT', 'GLD', 'VNQ']
+
+# Daily returns the estimates are drawn from (about five years)
+OPTIMIZER_WINDOW = 1260
+TRADING_DAYS_PER_YEAR = 252
+
+FRONTIER_POINTS = 25
+
+# Largest share of the portfolio any one ETF may take
+MAX_POSITION_WEIGHT = 0.6
+
+# Annualized volatility each risk tolerance is comfortable with; it gets the highest-return
+# frontier portfolio at or below its target, or the minimum-variance portfolio if none is
+TARGET_VOLATILITY = {
+    'conservative': 0.06,
+    'moderate': 0.11,
+    'aggressive': 0.17,
+}
+
+# The frontier only changes when a new bar arrives; this bounds how long a stale entry is kept
+FRONTIER_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+# Function to get the configured ETF universe
+def get_portfolio_universe():
+    return list(getattr(settings, 'PORTFOLIO_UNIVERSE', DEFAULT_PORTFOLIO_UNIVERSE))
+
+
+# Function to trace the long-only efficient frontier for annualized expected returns and covariance
+def compute_efficient_frontier(expected_returns, covariance, points=FRONTIER_POINTS, max_weight=MAX_POSITION_WEIGHT):
+    """
+    Returns {'weights': (points, assets), 'returns': (points,), 'volatility': (points,)} from
+    the minimum-variance portfolio up to the highest return reachable under the position cap,
+    solving one SLSQP problem (minimize w'Σw with Σw = 1, w'μ = target, 0 <= w <= cap) per point.
+    """
+    assets = len(expected_returns)
+    max_weight = max(max_weight, 1 / assets)
+    bounds = [(0.0, max_weight)] * assets
+    budget = {'type': 'eq', 'fun': lambda weights: weights.sum() - 1, 'jac': lambda weights: np.ones(assets)}
+
+    def variance(weights):
+        return weights @ covariance @ weights
+
+    def variance_gradient(weights):
+        return 2 * covariance @ weights
+
+    start = np.full(assets, 1 / assets)
+    minimum = minimize(variance, start, jac=variance_gradient, bounds=bounds, constraints=[budget], method='SLSQP')
+
+    # Highest reachable return: fill the best assets up to the cap
+    order = np.argsort(expected_returns)[::-1]
+    best = np.zeros(assets)
+    remaining = 1.0
+    for asset in order:
+        best[asset] = min(max_weight, remaining)
+        remaining -= best[asset]
+    targets = np.linspace(minimum.x @ expected_returns, best @ expected_returns, points)
+
+    weights = [minimum.x]
+    for target in targets[1:]:
+        on_target = {'type': 'eq', 'fun': lambda w, target=target: w @ expected_returns - target,
+                     'jac': lambda w: expected_returns}
+        result = minimize(variance, weights[-1], jac=variance_gradient, bounds=bounds,
+                          constraints=[budget, on_target], method='SLSQP')
+        weights.append(result.x if result.success else best)
+
+    weights = np.clip(np.array(weights), 0, None)
+    weights /= weights.sum(axis=1, keepdims=True)
+    return {
+        'weights': weights,
+        'returns': weights @ expected_returns,
+        'volatility': np.sqrt(np.einsum('pi,ij,pj->p', weights, covariance, weights)),
+    }
+
+
+# Function to get today's efficient frontier over the ETF universe, cached until the next bar
+def get_efficient_frontier():
+    universe = get_portfolio_universe()
+    cache_key = f"efficient_frontier_{'_'.join(sorted(universe))}_{get_latest_bar_date()}"
+    frontier = cache.get(cache_key)
+    if frontier is not None:
+        return frontier
+
+    aligned = get_aligned_returns(universe, window=OPTIMIZER_WINDOW)
+    if aligned is None or len(aligned['tickers']) < 2:
+        logger.warning(f"Not enough stored bars in {universe} for an efficient frontier")
+        return None
+
+    returns = aligned['returns']
+    expected_returns = returns.mean(axis=0) * TRADING_DAYS_PER_YEAR
+    covariance = np.cov(returns, rowvar=False) * TRADING_DAYS_PER_YEAR
+    frontier = compute_efficient_frontier(expected_returns, covariance)
+    frontier.update({'tickers': aligned['tickers'], 'start': str(aligned['dates'][0]), 'end': str(aligned['dates'][-1])})
+    cache.set(cache_key, frontier, FRONTIER_CACHE_TIMEOUT)
+    logger.info(f"Computed efficient frontier over {aligned['tickers']}")
+    return frontier
+
+
+# Function to pick the frontier portfolio for a risk tolerance
+def get_allocation(risk_tolerance):
+    frontier = get_efficient_frontier()
+    if frontier is None:
+        return None
+
+    target = TARGET_VOLATILITY.get(risk_tolerance, TARGET_VOLATILITY['moderate'])
+    within_target = np.flatnonzero(frontier['volatility'] <= target)
+    point = within_target[np.argmax(frontier['returns'][within_target])] if len(within_target) else 0
+    weights = frontier['weights'][point]
+    return {
+        'weights': {ticker: float(weight) for ticker, weight in zip(frontier['tickers'], weights) if weight >= 0.005},
+        'expected_return': float(frontier['returns'][point]),
+        'volatility': float(frontier['volatility'][point]),
+        'target_volatility': target,
+        'start': frontier['start'],
+        'end': frontier['end'],
+    }
+
+
+# Function to render a risk tolerance's frontier allocation for a prompt
+def get_allocation_message(risk_tolerance):
+    allocation = get_allocation(risk_tolerance)
+    if allocation is None:
+        return None
+
+    holdings = ", ".join(
+        f"{weight:.0%} {ticker}" for ticker, weight in sorted(allocation['weights'].items(), key=lambda item: -item[1])
+    )
+    return (
+        f"Mean-variance efficient allocation for a {risk_tolerance or 'moderate'} investor "
+        f"(target volatility {allocation['target_volatility']:.0%}, estimated from daily returns {allocation['start']} to {allocation['end']}): "
+        f"{holdings}. Historical expected return {allocation['expected_return']:.1%} a year with "
+        f"{allocation['volatility']:.1%} annualized volatility; past returns are not a forecast."
+    )
@@ -0,0 +1,169 @@
+# Import necessary modules
+import os
+import json
+import logging
+import requests
+import numpy as np
+from datetime import date, timedelta
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Directory holding one sub-directory of column files per ticker, written by `manage.py load_polygon_bars`
+PRICE_SERIES_DIR = os.path.join(os.path.dirname(__file__), 'data', 'price_series')
+
+POLYGON_AGGS_URL = 'https://api.polygon.io/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start}/{end}'
+
+# Polygon aggregate fields and the fixed dtype of the column each is stored in. Timestamps are
+# epoch milliseconds; volume stays float because crypto volumes are fractional.
+POLYGON_COLUMNS = {
+    't': np.int64,
+    'o': np.float64,
+    'h': np.float64,
+    'l': np.float64,
+    'c': np.float64,
+    'vw': np.float64,
+    'v': np.float64,
+    'n': np.int64,
+}
+
+
+# Function to turn a ticker into a directory name; crypto tickers like "X:BTCUSD" contain a colon
+def get_series_directory(ticker, directory=PRICE_SERIES_DIR):
+    return os.path.join(directory, ticker.upper().replace(':', '_'))
+
+
+# Function to parse a Polygon /aggs payload (a dict or its JSON text) into typed column arrays
+def parse_polygon_aggs(payload):
+    """
+    Returns a dict mapping each POLYGON_COLUMNS field to a NumPy array, sorted by timestamp.
+    Missing values (Polygon omits vw and n for some bars) become NaN, or 0 for integer columns.
+    """
+    if isinstance(payload, (str, bytes)):
+        payload = json.loads(payload)
+    results = payload.get('results') or []
+
+    columns = {}
+    for field, dtype in POLYGON_COLUMNS.items():
+        missing = np.nan if dtype is np.float64 else 0
+        columns[field] = np.fromiter((bar.get(field, missing) for bar in results), dtype=dtype, count=len(results))
+
+    order = np.argsort(columns['t'], kind='stable')
+    return {field: values[order] for field, values in columns.items()}
+
+
+# Function to merge two sets of columns on timestamp; bars in `newer` replace bars in `older`
+def merge_columns(older, newer):
+    timestamps = np.concatenate([newer['t'], older['t']])
+    _, first = np.unique(timestamps, return_index=True)  # unique sorts, first occurrence wins
+    return {field: np.concatenate([newer[field], older[field]])[first] for field in POLYGON_COLUMNS}
+
+
+# Function to write a ticker's columns as .npy files, merging with any series already stored
+def write_price_series(ticker, columns, directory=PRICE_SERIES_DIR):
+    series_directory = get_series_directory(ticker, directory)
+    if os.path.isdir(series_directory):
+        existing = PriceSeries(series_directory)
+        columns = merge_columns({field: np.array(existing[field]) for field in POLYGON_COLUMNS}, columns)
+        del existing  # release the maps before the files are replaced
+
+    os.makedirs(series_directory, exist_ok=True)
+    # Timestamps go last: readers remap when t.npy changes, by which point every other column is in place
+    for field in sorted(POLYGON_COLUMNS, key=lambda field: field == 't'):
+        # Write then rename, so a reader never maps a half-written file
+        temporary_path = os.path.join(series_directory, f'{field}.tmp.npy')
+        np.save(temporary_path, np.ascontiguousarray(columns[field], dtype=POLYGON_COLUMNS[field]))
+        os.replace(temporary_path, os.path.join(series_directory, f'{field}.npy'))
+
+    logger.info(f"Stored {len(columns['t'])} bars for {ticker} in {series_directory}")
+    return len(columns['t'])
+
+
+# Function to load a saved Polygon /aggs dump, e.g. SPY_response.txt, into the price series store
+def load_polygon_file(path, directory=PRICE_SERIES_DIR):
+    with open(path) as file:
+        payload = json.load(file)
+    ticker = payload.get('ticker') or os.path.basename(path).split('_response')[0]
+    return ticker, write_price_series(ticker, parse_polygon_aggs(payload), directory)
+
+
+# Function to download aggregate bars for a ticker from Polygon, following pagination
+def fetch_polygon_aggs(ticker, start, end, timespan='day', multiplier=1):
+    api_key = os.getenv('POLYGON_API_KEY')
+    if not api_key:
+        logger.error("Polygon API key not found in environment variables.")
+        return None
+
+    url = POLYGON_AGGS_URL.format(ticker=ticker, multiplier=multiplier, timespan=timespan, start=start, end=end)
+    params = {'adjusted': 'true', 'sort': 'asc', 'limit': 50000, 'apiKey': api_key}
+    pages = []
+    try:
+        while url:
+            response = requests.get(url, params=params, timeout=30)
+            if response.status_code != 200:
+                logger.error(f"Error fetching Polygon aggregates for {ticker}: {response.text}")
+                return None
+            payload = response.json()
+            pages.append(parse_polygon_aggs(payload))
+            # next_url carries the cursor; only the key has to be added again
+            url = payload.get('next_url')
+            params = {'apiKey': api_key}
+    except Exception as e:
+        logger.error(f"Error fetching Polygon aggregates for {ticker}: {e}")
+        return None
+
+    columns = pages[0]
+    for page in pages[1:]:
+        columns = merge_columns(columns, page)
+    return columns
+
+
+# Function to fetch recent daily bars for a ticker from Polygon and add them to the store
+def update_price_series(ticker, days=730, directory=PRICE_SERIES_DIR):
+    end = date.today()
+    columns = fetch_polygon_aggs(ticker, end - timedelta(days=days), end)
+    if columns is None:
+        return None
+    return write_price_series(ticker, columns, directory)
+
+
+class PriceSeries:
+    """
+    Read-only view over one ticker's column files. Arrays are opened with mmap_mode='r', so
+    opening a series only maps the files and pages are read from the OS cache on access.
+    """
+
+    def __init__(self, series_directory):
+        self.columns = {
+            field: np.load(os.path.join(series_directory, f'{field}.npy'), mmap_mode='r')
+            for field in POLYGON_COLUMNS
+        }
+
+    def __len__(self):
+        return len(self.columns['t'])
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    @property
+    def dates(self):
+        return self.columns['t'].astype('datetime64[ms]').astype('datetime64[D]')
+
+
+# Series mapped by this process, with the modification time of the files they were mapped from
+price_series = {}
+
+
+# Function to get a ticker's memory-mapped price series, or None if it has not been loaded
+def get_price_series(ticker, directory=PRICE_SERIES_DIR):
+    series_directory = get_series_directory(ticker, directory)
+    try:
+        modified = os.stat(os.path.join(series_directory, 't.npy')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cached = price_series.get(series_directory)
+    if cached is None or cached[0] != modified:
+        cached = (modified, PriceSeries(series_directory))
+        price_series[series_directory] = cached
+    return cached[1]
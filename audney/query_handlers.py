@@ -6,6 +6,7 @@ client = OpenAI()
 from openai import OpenAI
 from .market_analysis import get_stock_price, extract_company_name, calculate_user_age, search_company_or_ticker
 from .financial_statistics import get_census_data_msa_or_place, estimate_expenses
+from .portfolio_optimizer import get_allocation_message
 from scipy.spatial.distance import cosine
 
 
@@ -118,7 +119,7 @@ def handle_stock_price_query(user_input):
         logger.warning("No valid company name or symbol found in user input.")
         return response_message, False
 
-    possible_matches = search_company_or_ticker(company_name_or_symbol)
+    possible_matches = search_company_or_ticker(company_name_or_symbol, extract=False)
     logger.debug(f"Possible matches found for company_name_or_symbol '{company_name_or_symbol}': {possible_matches}")
 
     if isinstance(possible_matches, tuple):
@@ -173,10 +174,16 @@ def handle_investment_strategy(user_input, user):
     user_profile = user.userprofile
     risk_tolerance = user_profile.get_risk_tolerance_display()
 
+    # Ground the advice in a concrete allocation from the efficient frontier
+    allocation_message = get_allocation_message(user_profile.risk_tolerance)
+    system_message = f"Provide investment strategy advice for a user with this risk tolerance: {risk_tolerance}."
+    if allocation_message:
+        system_message += f" Base any allocation you suggest on this optimizer output: {allocation_message}"
+
     try:
         client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         messages = [
-            {"role": "system", "content": f"Provide investment strategy advice for a user with this risk tolerance: {risk_tolerance}."},
+            {"role": "system", "content": system_message},
             {"role": "user", "content": user_input}
         ]
         response = client.chat.completions.create(model="chatgpt-4o-latest", messages=messages)
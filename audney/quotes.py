@@ -0,0 +1,230 @@
+# Import necessary modules
+import os
+import logging
+import re
+import threading
+import requests
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.html import escape
+from .market_data import ALPHA_VANTAGE_URL, is_market_open, next_market_open
+from .stock_index import get_stock_index
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# How long a quote is reused while the market is open, and around the clock for crypto
+OPEN_MARKET_QUOTE_TTL = 60
+CRYPTO_QUOTE_TTL = 60
+
+# Longest a closed-market quote is kept, so a missed holiday or halt can't pin a price for days
+CLOSED_MARKET_QUOTE_TTL = 24 * 60 * 60
+
+# Seconds to wait on the quote API
+QUOTE_TIMEOUT = 10
+
+# Prefix of crypto pairs, e.g. X:BTCUSD, which trade 24/7
+CRYPTO_PREFIX = 'X:'
+
+# Most tickers quoted in one batch, and threads quoting them concurrently
+MAX_BATCH_QUOTES = 10
+QUOTE_WORKERS = 8
+
+# All-caps words that aren't ticker symbols when scanning a message for a list of tickers
+NON_TICKER_WORDS = {
+    'I', 'A', 'AND', 'OR', 'VS', 'THE', 'OF', 'TO', 'IN', 'IS', 'ON', 'FOR', 'ME', 'MY', 'US', 'USA', 'USD', 'ETF',
+    'CEO', 'IPO', 'EPS', 'PE', 'ASAP', 'NYSE', 'NOW', 'FAQ', 'AI', 'IRA', 'ROTH', 'GDP', 'CPI', 'FED', 'SEC', 'OK',
+}
+TICKER_TOKEN_PATTERN = re.compile(r'(?<![\w$])(\$[A-Za-z]{1,5}(?::[A-Za-z]{3,8})?|[A-Z]{1,5}(?:\.[A-Z])?|X:[A-Z]{6,8})(?![\w:])')
+
+# Shared pool for batched quotes; each batch only waits on its own futures
+_quote_pool = ThreadPoolExecutor(max_workers=QUOTE_WORKERS, thread_name_prefix='quotes')
+
+# Fetches in progress, by ticker; concurrent misses wait on the same future instead of calling the API again
+_inflight_quotes = {}
+_inflight_lock = threading.Lock()
+
+
+class QuoteFetchError(Exception):
+    """Raised when the quote API couldn't be reached or refused the request, as opposed to having no quote."""
+
+
+# Function to decide how long a quote stays fresh
+def quote_ttl(ticker, now=None):
+    """
+    Crypto quotes and quotes taken while the market is open expire after about a minute; a
+    quote taken while the market is closed can't change before the next open, so it is kept
+    until then (capped at CLOSED_MARKET_QUOTE_TTL).
+    """
+    now = now or timezone.now()
+    if ticker.startswith(CRYPTO_PREFIX):
+        return CRYPTO_QUOTE_TTL
+    if is_market_open(now):
+        return OPEN_MARKET_QUOTE_TTL
+    until_open = int((next_market_open(now) - now).total_seconds())
+    return max(OPEN_MARKET_QUOTE_TTL, min(until_open, CLOSED_MARKET_QUOTE_TTL))
+
+
+# Function to fetch the latest quote for a ticker from Alpha Vantage
+def fetch_quote(ticker):
+    """
+    Uses GLOBAL_QUOTE for stocks and CURRENCY_EXCHANGE_RATE for crypto pairs; both return a
+    single record instead of a whole intraday series. Returns {'ticker', 'price', 'change',
+    'change_percent', 'as_of'}, or None when Alpha Vantage has no quote for the ticker; raises
+    QuoteFetchError when the request itself fails (no API key, HTTP or network error, rate limit).
+    """
+    api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        logger.error("Alpha Vantage API key not found in environment variables.")
+        raise QuoteFetchError("API key not found.")
+
+    if ticker.startswith(CRYPTO_PREFIX):
+        pair = ticker[len(CRYPTO_PREFIX):]
+        params = {'function': 'CURRENCY_EXCHANGE_RATE', 'from_currency': pair[:-3], 'to_currency': pair[-3:]}
+    else:
+        params = {'function': 'GLOBAL_QUOTE', 'symbol': ticker}
+    try:
+        response = requests.get(ALPHA_VANTAGE_URL, params={**params, 'apikey': api_key}, timeout=QUOTE_TIMEOUT)
+        data = response.json() if response.status_code == 200 else None
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"Error fetching quote for {ticker}: {e}")
+        raise QuoteFetchError(str(e)) from e
+    if data is None:
+        logger.error(f"Error fetching quote for {ticker} from Alpha Vantage: {response.text}")
+        raise QuoteFetchError(str(response.status_code))
+    # Rate limits come back as a 200 with a note instead of data
+    if 'Note' in data or 'Information' in data:
+        logger.error(f"Alpha Vantage refused the quote request for {ticker}: {data}")
+        raise QuoteFetchError("rate limit reached, please try again shortly.")
+
+    try:
+        if ticker.startswith(CRYPTO_PREFIX):
+            rate = data.get('Realtime Currency Exchange Rate', {})
+            if not rate.get('5. Exchange Rate'):
+                logger.warning(f"No exchange rate available for {ticker}: {data}")
+                return None
+            return {'ticker': ticker, 'price': float(rate['5. Exchange Rate']), 'change': None,
+                    'change_percent': None, 'as_of': rate.get('6. Last Refreshed')}
+
+        quote = data.get('Global Quote', {})
+        if not quote.get('05. price'):
+            logger.warning(f"No quote available for {ticker}: {data}")
+            return None
+        return {
+            'ticker': ticker,
+            'price': float(quote['05. price']),
+            'change': float(quote.get('09. change') or 0),
+            'change_percent': float((quote.get('10. change percent') or '0').rstrip('%')),
+            'as_of': quote.get('07. latest trading day'),
+        }
+    except (AttributeError, ValueError) as e:
+        logger.error(f"Error parsing quote for {ticker}: {e}")
+        raise QuoteFetchError(f"unexpected response ({e})") from e
+
+
+# Function to get a ticker's quote from the cache, fetching it once for all concurrent callers on a miss
+def get_quote(ticker):
+    """
+    Returns the quote, or None when there is none for the ticker. A failed fetch raises
+    QuoteFetchError, for the caller that made it and for every caller waiting on it.
+    """
+    ticker = ticker.upper()
+    cache_key = f"quote_{ticker}".replace(':', '_')
+    quote = cache.get(cache_key)
+    if quote is not None:
+        return quote
+
+    with _inflight_lock:
+        future = _inflight_quotes.get(ticker)
+        leader = future is None
+        if leader:
+            future = _inflight_quotes[ticker] = Future()
+
+    if not leader:
+        try:
+            return future.result(timeout=QUOTE_TIMEOUT * 2)
+        except FutureTimeoutError:
+            logger.warning(f"Timed out waiting for an in-flight quote for {ticker}")
+            raise QuoteFetchError("timed out waiting for the quote.")
+
+    quote, error = None, None
+    try:
+        quote = fetch_quote(ticker)
+        if quote is not None:
+            cache.set(cache_key, quote, quote_ttl(ticker))
+    except QuoteFetchError as e:
+        error = e
+    finally:
+        with _inflight_lock:
+            _inflight_quotes.pop(ticker, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(quote)
+    if error is not None:
+        raise error
+    return quote
+
+
+# Function to get quotes for several tickers concurrently, in about one round trip
+def get_quotes(tickers, timeout=QUOTE_TIMEOUT):
+    """
+    Quotes up to MAX_BATCH_QUOTES distinct tickers on the shared pool, each through get_quote
+    so cached and in-flight quotes are reused. Returns {ticker: quote or None} in the order
+    given; a ticker not answered within `timeout` seconds of the batch starting maps to None.
+    """
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))[:MAX_BATCH_QUOTES]
+    futures = {ticker: _quote_pool.submit(get_quote, ticker) for ticker in tickers}
+    wait(futures.values(), timeout=timeout)
+
+    quotes = {}
+    for ticker, future in futures.items():
+        if future.done() and future.exception() is None:
+            quotes[ticker] = future.result()
+        else:
+            logger.warning(f"No quote for {ticker} within {timeout}s")
+            quotes[ticker] = None
+    return quotes
+
+
+# Function to find a list of ticker symbols written out in a message, e.g. "compare AAPL, MSFT and $nvda"
+def find_quote_tickers(user_input):
+    """
+    Cashtags always count. Bare capitals count only with at least two letters and, when the Stock
+    table has been loaded, only if they are listed symbols, so "S&P", "ASAP" or "NYSE" don't
+    become quote rows.
+    """
+    try:
+        listed = get_stock_index().by_symbol
+    except Exception as e:
+        logger.error(f"Error loading the stock index: {e}")
+        listed = {}
+
+    tickers = []
+    for token in TICKER_TOKEN_PATTERN.findall(user_input or ''):
+        ticker = token.lstrip('$').upper()
+        if token.startswith('$') or ticker.startswith(CRYPTO_PREFIX):
+            tickers.append(ticker)
+        elif len(ticker) > 1 and ticker not in NON_TICKER_WORDS and (not listed or ticker in listed):
+            tickers.append(ticker)
+    return list(dict.fromkeys(tickers))
+
+
+# Function to render batched quotes as an HTML table for the chat window
+def render_quotes_table(quotes, names=None):
+    names = names or {}
+    rows = []
+    for ticker, quote in quotes.items():
+        label = escape(f"{names[ticker]} ({ticker})" if names.get(ticker) else ticker)
+        if quote is None:
+            rows.append(f"<tr><td>{label}</td><td colspan='3'>Not available</td></tr>")
+            continue
+        change = f"{quote['change']:+.2f} ({quote['change_percent']:+.2f}%)" if quote['change'] is not None else "—"
+        rows.append(
+            f"<tr><td>{label}</td><td>${quote['price']:,.2f}</td><td>{change}</td><td>{escape(quote['as_of'] or '')}</td></tr>"
+        )
+    return (
+        "<table class='quote-table'><thead><tr><th>Symbol</th><th>Price</th><th>Change</th><th>As of</th></tr></thead>"
+        f"<tbody>{''.join(rows)}</tbody></table>"
+    )
@@ -0,0 +1,147 @@
+# Import necessary modules
+import re
+import logging
+import numpy as np
+from .market_data import get_bars
+from .market_analysis import calculate_user_age
+from .budget_engine import INCOME_LEVEL_ESTIMATES
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Index whose history the stock returns are drawn from
+RETIREMENT_INDEX_TICKER = 'SPY'
+
+SIMULATION_PATHS = 10000
+RETIREMENT_AGE = 67
+PLAN_TO_AGE = 95
+
+# Everything is simulated in today's dollars: returns are net of inflation
+INFLATION_RATE = 0.03
+
+# Share of the portfolio in stocks for each risk tolerance; the rest is in bonds
+STOCK_ALLOCATION = {
+    'aggressive': 0.9,
+    'moderate': 0.6,
+    'conservative': 0.3,
+}
+DEFAULT_STOCK_ALLOCATION = 0.6
+
+# Bonds aren't in the bar store, so they are drawn from a normal distribution of real annual returns
+BOND_REAL_RETURN = 0.015
+BOND_VOLATILITY = 0.06
+
+# Share of income saved each year; people supporting dependents are assumed to save less
+SAVINGS_RATE = {'yes': 0.10, 'no': 0.15}
+DEFAULT_SAVINGS_RATE = 0.12
+
+# Retirement spending as a share of pre-retirement income, and the share Social Security is assumed to cover
+REPLACEMENT_RATIO = 0.80
+SOCIAL_SECURITY_REPLACEMENT = 0.40
+
+# Phrases that ask about retirement, which get the simulation in the advice prompt
+RETIREMENT_PATTERN = re.compile(r'\b(?:retir\w*|pension|401\(?k\)?|iras?|nest egg)(?!\w)', re.IGNORECASE)
+
+
+# Function to get the distribution of one-year real log returns from the stored index history
+def get_annual_returns(ticker=RETIREMENT_INDEX_TICKER, inflation_rate=INFLATION_RATE):
+    """
+    Returns every overlapping 252-trading-day log return in the stored history, less inflation,
+    or None if there is less than a year of bars.
+    """
+    bars = get_bars(ticker)
+    if bars is None or len(bars['close']) <= 252:
+        return None
+    log_closes = np.log(bars['close'])
+    return log_closes[252:] - log_closes[:-252] - np.log1p(inflation_rate)
+
+
+# Function to simulate a saver's retirement across many return paths at once
+def simulate_retirement(annual_returns, age, income, starting_balance, savings_rate, stock_allocation,
+                        retirement_age=RETIREMENT_AGE, plan_to_age=PLAN_TO_AGE, paths=SIMULATION_PATHS, seed=None):
+    """
+    Draws a (paths, years) matrix of real portfolio returns, bootstrapping stock returns from
+    `annual_returns` and drawing bond returns from a normal distribution, then runs every path
+    from `age` to `plan_to_age` in closed form: with G_t the growth of $1 up to year t and c_t
+    the flow at the start of year t (savings before retirement, withdrawals after),
+    B_t = G_t * (B_0 + sum_{j<=t} c_j / G_{j-1}) for every path and year in two cumulative
+    passes. A path fails the first year its balance would go below zero.
+
+    Returns a dict with the success probability, 10th/50th/90th percentile balances at
+    retirement and at the end of the plan, and the inputs used.
+    """
+    years = max(plan_to_age - age, 1)
+    working_years = max(retirement_age - age, 0)
+    random = np.random.default_rng(seed)
+
+    stock_returns = np.expm1(annual_returns)[random.integers(0, len(annual_returns), size=(paths, years))]
+    bond_returns = BOND_REAL_RETURN + BOND_VOLATILITY * random.standard_normal(size=(paths, years), dtype=np.float32)
+    returns = stock_allocation * stock_returns + (1 - stock_allocation) * bond_returns
+
+    withdrawal = income * (REPLACEMENT_RATIO - SOCIAL_SECURITY_REPLACEMENT)
+    flows = np.where(np.arange(years) < working_years, income * savings_rate, -withdrawal)
+
+    # growth[:, t] is the growth of $1 invested at the start of year 0 through the end of year t
+    growth = np.cumprod(1 + returns, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth_before = np.concatenate([np.ones((paths, 1)), growth[:, :-1]], axis=1)
+        # Balance at the end of each year: every flow grows from the start of its year
+        balances = growth * (starting_balance + np.cumsum(flows[None, :] / growth_before, axis=1))
+
+    depleted = balances < 0
+    succeeded = ~depleted.any(axis=1)
+    balances = np.where(np.maximum.accumulate(depleted, axis=1), 0.0, balances)
+
+    at_retirement = balances[:, working_years - 1] if working_years else np.full(paths, float(starting_balance))
+    return {
+        'success_probability': float(succeeded.mean()),
+        'retirement_balance': dict(zip((10, 50, 90), np.percentile(at_retirement, [10, 50, 90]).tolist())),
+        'ending_balance': dict(zip((10, 50, 90), np.percentile(balances[:, -1], [10, 50, 90]).tolist())),
+        'annual_withdrawal': withdrawal,
+        'annual_savings': income * savings_rate,
+        'paths': paths,
+    }
+
+
+# Function to get the simulation inputs from a user's profile
+def get_retirement_inputs(user_profile):
+    age = calculate_user_age(user_profile.date_of_birth)
+    income = INCOME_LEVEL_ESTIMATES.get(user_profile.income_level)
+    if age is None or not income:
+        return None
+
+    # Savings coverage is months of income already saved
+    savings_months = int((user_profile.savings_months or '0_months').split('_')[0])
+    return {
+        'age': age,
+        'income': income,
+        'starting_balance': income * savings_months / 12,
+        'savings_rate': SAVINGS_RATE.get(user_profile.has_dependents, DEFAULT_SAVINGS_RATE),
+        'stock_allocation': STOCK_ALLOCATION.get(user_profile.risk_tolerance, DEFAULT_STOCK_ALLOCATION),
+    }
+
+
+# Function to run the retirement simulation for a user and render it for the advice prompt
+def get_retirement_message(user_profile, user_input):
+    if user_profile.financial_goals != 'retirement_planning' and not RETIREMENT_PATTERN.search(user_input):
+        return None
+
+    inputs = get_retirement_inputs(user_profile)
+    annual_returns = get_annual_returns()
+    if inputs is None or annual_returns is None:
+        logger.info("Not enough profile or market data for a retirement simulation")
+        return None
+
+    result = simulate_retirement(annual_returns, **inputs)
+    return (
+        f"Retirement Monte Carlo ({result['paths']:,} paths, today's dollars, {RETIREMENT_INDEX_TICKER} history for stocks): "
+        f"age {inputs['age']}, retiring at {RETIREMENT_AGE} and planning to {PLAN_TO_AGE}; assumes ${inputs['income']:,.0f} income, "
+        f"${inputs['starting_balance']:,.0f} saved now, ${result['annual_savings']:,.0f}/year saved until retirement, "
+        f"{inputs['stock_allocation']:.0%} stocks / {1 - inputs['stock_allocation']:.0%} bonds, and "
+        f"${result['annual_withdrawal']:,.0f}/year withdrawn in retirement on top of Social Security.\n"
+        f"- Probability the savings last to {PLAN_TO_AGE}: {result['success_probability']:.0%}\n"
+        f"- Balance at retirement: ${result['retirement_balance'][10]:,.0f} (10th percentile), "
+        f"${result['retirement_balance'][50]:,.0f} (median), ${result['retirement_balance'][90]:,.0f} (90th percentile)\n"
+        f"- Balance at {PLAN_TO_AGE}: ${result['ending_balance'][10]:,.0f} (10th percentile), "
+        f"${result['ending_balance'][50]:,.0f} (median), ${result['ending_balance'][90]:,.0f} (90th percentile)"
+    )
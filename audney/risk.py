@@ -0,0 +1,153 @@
+# Import necessary modules
+import re
+import logging
+import numpy as np
+from scipy.stats import norm
+from .correlations import get_aligned_returns
+from .market_data import find_mentioned_tickers
+from .backtester import AMOUNT_PATTERN
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+CONFIDENCE_LEVELS = (0.95, 0.99)
+HORIZONS = {'1 day': 1, '1 week': 5, '1 month': 21}
+
+# Daily returns the estimates are drawn from (about five years)
+RISK_WINDOW = 1260
+
+BOOTSTRAP_PATHS = 10000
+
+# Model portfolio each risk tolerance is assumed to hold: fully invested stock (SPY) / bond (AGG)
+# mixes of the settings.PORTFOLIO_UNIVERSE ETFs, e.g. the classic 60/40 for a moderate investor
+RISK_PORTFOLIOS = {
+    'aggressive': {'SPY': 0.9, 'AGG': 0.1},
+    'moderate': {'SPY': 0.6, 'AGG': 0.4},
+    'conservative': {'SPY': 0.3, 'AGG': 0.7},
+}
+
+# Portfolio value quoted when the user doesn't name an amount
+DEFAULT_PORTFOLIO_VALUE = 10000
+
+# Phrases that ask how much could be lost
+RISK_PATTERN = re.compile(r"\b(?:lose|losing|loss|losses|downside|worst[- ]case|value at risk|drawdown|crash\w*)\b", re.IGNORECASE)
+
+
+# Function to compound daily returns into overlapping returns over each horizon
+def horizon_returns(daily_returns, horizon):
+    log_growth = np.concatenate([[0.0], np.cumsum(np.log1p(daily_returns))])
+    return np.expm1(log_growth[horizon:] - log_growth[:-horizon])
+
+
+# Function to compute historical, parametric and bootstrap VaR and CVaR for every confidence level and horizon
+def compute_risk(daily_returns, confidence_levels=CONFIDENCE_LEVELS, horizons=HORIZONS, paths=BOOTSTRAP_PATHS, seed=None):
+    """
+    Takes a portfolio's daily returns and returns {method: {'var', 'cvar'}} for the 'historical',
+    'parametric' and 'bootstrap' methods, each a (horizons, confidence levels) array of losses
+    as positive fractions of the portfolio, plus the historical 'max_drawdown'.
+
+    Historical figures use overlapping returns over each horizon; parametric figures assume
+    normal returns scaled by the horizon; bootstrap figures compound `paths` resampled daily
+    returns out to the longest horizon in one matrix, reading every shorter horizon off it.
+    """
+    daily_returns = np.asarray(daily_returns, dtype=np.float64)
+    confidence = np.asarray(confidence_levels, dtype=np.float64)
+    tail = 1 - confidence
+    lengths = np.array(list(horizons.values()))
+
+    def tail_stats(samples):
+        # samples: (horizons, draws) -> VaR and CVaR of shape (horizons, confidence levels)
+        thresholds = np.quantile(samples, tail, axis=1).T
+        in_tail = samples[:, None, :] <= thresholds[:, :, None]
+        tail_means = (samples[:, None, :] * in_tail).sum(axis=2) / in_tail.sum(axis=2)
+        return -thresholds, -tail_means
+
+    # Historical: overlapping horizon returns, trimmed to the same count so they stack
+    historical = [horizon_returns(daily_returns, horizon) for horizon in lengths]
+    count = min(len(returns) for returns in historical)
+    historical_var, historical_cvar = tail_stats(np.stack([returns[-count:] for returns in historical]))
+
+    # Parametric: normal with mean and volatility scaled by the horizon
+    mean = daily_returns.mean() * lengths[:, None]
+    volatility = daily_returns.std(ddof=1) * np.sqrt(lengths)[:, None]
+    z = norm.ppf(tail)[None, :]
+    parametric_var = -(mean + z * volatility)
+    parametric_cvar = -(mean - volatility * norm.pdf(z) / tail[None, :])
+
+    # Bootstrap: resampled daily returns compounded along each path
+    random = np.random.default_rng(seed)
+    draws = daily_returns[random.integers(0, len(daily_returns), size=(paths, lengths.max()))]
+    growth = np.cumprod(1 + draws, axis=1)
+    bootstrap_var, bootstrap_cvar = tail_stats(growth[:, lengths - 1].T - 1)
+
+    wealth = np.cumprod(1 + daily_returns)
+    max_drawdown = -float((wealth / np.maximum.accumulate(np.concatenate([[1.0], wealth]))[1:] - 1).min())
+
+    return {
+        'historical': {'var': historical_var, 'cvar': historical_cvar},
+        'parametric': {'var': parametric_var, 'cvar': parametric_cvar},
+        'bootstrap': {'var': bootstrap_var, 'cvar': bootstrap_cvar},
+        'max_drawdown': max(max_drawdown, 0.0),
+    }
+
+
+# Function to get the daily returns of a weighted portfolio of stored tickers
+def get_portfolio_returns(weights, window=RISK_WINDOW):
+    """
+    Returns {'dates', 'returns', 'weights'}. Tickers without stored bars are dropped and the rest
+    rescaled to sum to 1, so a missing ticker never turns into an unstated cash position; 'weights'
+    are the ones actually used.
+    """
+    tickers = sorted(weights)
+    aligned = get_aligned_returns(tickers, window=window)
+    if aligned is None:
+        return None
+    held = {ticker: weights[ticker] for ticker in aligned['tickers']}
+    if set(held) != set(weights):
+        logger.warning(f"No stored returns for {sorted(set(weights) - set(held))}; rescaling the rest of the portfolio")
+    total = sum(held.values())
+    held = {ticker: weight / total for ticker, weight in held.items()}
+    vector = np.array([held[ticker] for ticker in aligned['tickers']])
+    return {'dates': aligned['dates'], 'returns': aligned['returns'] @ vector, 'weights': held}
+
+
+# Function to pick the portfolio to describe: tickers the user names, or the model portfolio for their risk tolerance
+def get_risk_portfolio(user_input, risk_tolerance):
+    mentioned = find_mentioned_tickers(user_input)
+    if mentioned:
+        return {ticker: 1 / len(mentioned) for ticker in mentioned}
+    return RISK_PORTFOLIOS.get(risk_tolerance, RISK_PORTFOLIOS['moderate'])
+
+
+# Function to answer "how much could I lose" questions with VaR/CVaR figures for the advice prompt
+def get_risk_message(user_input, risk_tolerance):
+    if not RISK_PATTERN.search(user_input):
+        return None
+
+    weights = get_risk_portfolio(user_input, risk_tolerance)
+    portfolio = get_portfolio_returns(weights)
+    if portfolio is None or len(portfolio['returns']) <= max(HORIZONS.values()):
+        logger.info("Not enough stored returns for a risk estimate")
+        return None
+
+    amount_match = AMOUNT_PATTERN.search(user_input)
+    value = float(amount_match.group(1).replace(',', '')) * (1000 if amount_match.group(2) else 1) if amount_match else DEFAULT_PORTFOLIO_VALUE
+    risk = compute_risk(portfolio['returns'])
+
+    holdings = ", ".join(f"{weight:.0%} {ticker}" for ticker, weight in portfolio['weights'].items())
+    lines = [
+        f"Loss estimates for a ${value:,.0f} portfolio of {holdings}, from daily returns "
+        f"{portfolio['dates'][0]} to {portfolio['dates'][-1]} (VaR = loss not exceeded at that confidence; "
+        f"CVaR = average loss beyond it):",
+        "| Horizon | Confidence | Historical VaR / CVaR | Normal VaR / CVaR | Bootstrap VaR / CVaR |",
+        "|---|---|---|---|---|",
+    ]
+    for row, horizon in enumerate(HORIZONS):
+        for column, confidence in enumerate(CONFIDENCE_LEVELS):
+            cells = " | ".join(
+                f"${risk[method]['var'][row, column] * value:,.0f} / ${risk[method]['cvar'][row, column] * value:,.0f}"
+                for method in ('historical', 'parametric', 'bootstrap')
+            )
+            lines.append(f"| {horizon} | {confidence:.0%} | {cells} |")
+    lines.append(f"Largest peak-to-trough drop over the period: {risk['max_drawdown']:.1%} (${risk['max_drawdown'] * value:,.0f}).")
+    return "\n".join(lines)
@@ -0,0 +1,178 @@
+# Import necessary modules
+import logging
+import numpy as np
+import us
+from scipy.spatial import cKDTree
+from .models import CensusPlace
+from .census_table import get_census_table, get_census_fingerprint
+from .cost_of_living import MIN_POPULATION
+from .financial_statistics import get_state_fips, find_place
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Feature vector used to compare places; dollar amounts are compared on a log scale
+SIMILARITY_FEATURES = ['median_income', 'median_gross_rent', 'median_home_value', 'employment_rate', 'poverty_rate']
+LOG_FEATURES = {'median_income', 'median_gross_rent', 'median_home_value'}
+
+# Raw ACS columns the features are derived from
+SOURCE_FIELDS = ['median_income', 'median_gross_rent', 'median_home_value', 'employed', 'labor_force',
+                 'below_poverty', 'total_population', 'state_fips', 'place_fips']
+
+# Phrases that ask for comparable places, e.g. "cheaper places with a similar job market"
+SIMILAR_PLACES_KEYWORDS = ['similar', 'places like', 'cities like', 'towns like', 'where should i move',
+                           'relocat', 'cheaper place', 'cheaper cit', 'more affordable place', 'more affordable cit']
+
+
+# Function to derive the (unscaled) feature matrix from raw ACS columns
+def compute_features(columns):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features = {
+            'median_income': columns['median_income'],
+            'median_gross_rent': columns['median_gross_rent'],
+            'median_home_value': columns['median_home_value'],
+            'employment_rate': columns['employed'] / columns['labor_force'] * 100,
+            'poverty_rate': columns['below_poverty'] / columns['total_population'] * 100,
+        }
+        for feature in LOG_FEATURES:
+            features[feature] = np.log(features[feature])
+    return np.column_stack([np.asarray(features[feature], dtype=np.float64) for feature in SIMILARITY_FEATURES])
+
+
+class SimilarPlacesIndex:
+    """
+    KD-tree over z-scored feature vectors of every place with complete data and at least
+    MIN_POPULATION residents, so the k nearest places are found in O(log n) per query.
+    """
+
+    def __init__(self, columns, names):
+        columns = {field: np.asarray(values, dtype=np.float64) for field, values in columns.items()}
+        features = compute_features(columns)
+        included = np.all(np.isfinite(features), axis=1) & (columns['total_population'] >= MIN_POPULATION)
+
+        features = features[included]
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0)
+        self.scale[self.scale == 0] = 1
+        self.tree = cKDTree((features - self.mean) / self.scale)
+
+        rows = np.flatnonzero(included)
+        self.names = [names[row] for row in rows]
+        self.state_fips = columns['state_fips'][included].astype(int)
+        self.place_fips = columns['place_fips'][included].astype(int)
+        self.values = {field: columns[field][included] for field in ('median_income', 'median_gross_rent', 'median_home_value')}
+        self.employment_rate = columns['employed'][included] / columns['labor_force'][included] * 100
+        self.poverty_rate = columns['below_poverty'][included] / columns['total_population'][included] * 100
+
+    def __len__(self):
+        return len(self.names)
+
+    def vector(self, place):
+        columns = {field: np.array([float(getattr(place, field)) if getattr(place, field) is not None else np.nan])
+                   for field in SOURCE_FIELDS if field not in ('state_fips', 'place_fips')}
+        return (compute_features(columns)[0] - self.mean) / self.scale
+
+    def query(self, place, k=5, cheaper=False):
+        """
+        Returns up to k places closest to place, excluding the place itself. With cheaper=True
+        only places with a lower median gross rent are returned.
+        """
+        vector = self.vector(place)
+        if not np.all(np.isfinite(vector)):
+            return []
+
+        own_key = (int(place.state_fips), int(place.place_fips))
+        candidates = k + 1
+        while True:
+            distances, positions = self.tree.query(vector, k=min(candidates, len(self)))
+            results = []
+            for distance, position in zip(np.atleast_1d(distances), np.atleast_1d(positions)):
+                if (self.state_fips[position], self.place_fips[position]) == own_key:
+                    continue
+                if cheaper and not self.values['median_gross_rent'][position] < place.median_gross_rent:
+                    continue
+                results.append(self.result(position, distance))
+                if len(results) == k:
+                    return results
+            if candidates >= len(self):
+                return results
+            candidates *= 4
+
+    def result(self, position, distance):
+        state = us.states.lookup(f"{self.state_fips[position]:02d}")
+        return {
+            'name': self.names[position].split(',')[0],
+            'state': state.abbr if state else None,
+            'distance': round(float(distance), 3),
+            'median_income': int(self.values['median_income'][position]),
+            'median_gross_rent': int(self.values['median_gross_rent'][position]),
+            'median_home_value': int(self.values['median_home_value'][position]),
+            'employment_rate': round(float(self.employment_rate[position]), 1),
+            'poverty_rate': round(float(self.poverty_rate[position]), 1),
+        }
+
+
+# Index shared by the process, with the fingerprint of the Census data it was built from
+similar_places_index = None
+similar_places_fingerprint = None
+
+
+# Function to get the similar-places KD-tree, rebuilt whenever the Census table or store has been reloaded
+def get_similar_places_index():
+    global similar_places_index, similar_places_fingerprint
+    fingerprint = get_census_fingerprint()
+    if similar_places_index is not None and fingerprint == similar_places_fingerprint:
+        return similar_places_index
+
+    table = get_census_table()
+    if table is not None:
+        columns = {field: table[field] for field in SOURCE_FIELDS}
+        names = [table.name(row) for row in range(len(table))]
+    else:
+        places = list(CensusPlace.objects.values_list('name', *SOURCE_FIELDS))
+        if not places:
+            return None
+        names = [place[0] for place in places]
+        values = np.array([place[1:] for place in places], dtype=np.float64)  # None becomes NaN
+        columns = {field: values[:, position] for position, field in enumerate(SOURCE_FIELDS)}
+
+    similar_places_index = SimilarPlacesIndex(columns, names)
+    similar_places_fingerprint = fingerprint
+    logger.info(f"Built similar-places index over {len(similar_places_index)} places")
+    return similar_places_index
+
+
+# Function to find the k US places most similar to a city
+def find_similar_places(city, state_name_or_abbr, k=5, cheaper=False):
+    if not city or not state_name_or_abbr:
+        return []
+    index = get_similar_places_index()
+    state_fips = get_state_fips(state_name_or_abbr)
+    if index is None or not state_fips:
+        return []
+
+    place = find_place(city, state_fips)
+    if not place:
+        return []
+    return index.query(place, k=k, cheaper=cheaper)
+
+
+# Function to render similar places for the advice prompt when the user asks for comparable places
+def get_similar_places_message(user_input, city, state):
+    lowered = user_input.lower()
+    if not any(keyword in lowered for keyword in SIMILAR_PLACES_KEYWORDS):
+        return None
+
+    cheaper = 'cheaper' in lowered or 'affordable' in lowered
+    places = find_similar_places(city, state, cheaper=cheaper)
+    if not places:
+        return None
+
+    lines = [
+        f"- {place['name']}, {place['state']}: median household income ${place['median_income']:,}, "
+        f"median gross rent ${place['median_gross_rent']:,}, median home value ${place['median_home_value']:,}, "
+        f"employment rate {place['employment_rate']}%, poverty rate {place['poverty_rate']}%"
+        for place in places
+    ]
+    qualifier = "cheaper " if cheaper else ""
+    return f"US places most similar to {city}, {state} ({qualifier}by income, rent, home value, employment and poverty):\n" + "\n".join(lines)
@@ -0,0 +1,324 @@
+# Import necessary modules
+import io
+import os
+import re
+import csv
+import logging
+import heapq
+import unicodedata
+import requests
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, Max
+from .models import Stock
+from .market_data import ALPHA_VANTAGE_URL
+from .financial_statistics import get_trigrams
+
+# Get the logger for this module
+logger = logging.getLogger(__name__)
+
+# Candidates kept at each trie node, best first
+MAX_PREFIX_MATCHES = 10
+
+# Most candidates offered when a name is ambiguous
+MATCH_LIST_SIZE = 5
+
+# Words dropped from the end of a company name to get the name people use, e.g. "Apple Inc." -> "apple"
+CORPORATE_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'plc', 'llc', 'lp',
+    'sa', 'nv', 'ag', 'se', 'holdings', 'group', 'class', 'a', 'b', 'c', 'common', 'stock', 'shares', 'ordinary',
+}
+
+# Names people use that aren't the listed company name
+COMPANY_ALIASES = {
+    'google': 'GOOGL',
+    'facebook': 'META',
+    'coke': 'KO',
+    'coca cola': 'KO',
+    'jp morgan': 'JPM',
+    'jpmorgan': 'JPM',
+    'berkshire': 'BRK-B',
+    'walmart': 'WMT',
+    'amazon': 'AMZN',
+    'exxon': 'XOM',
+    'disney': 'DIS',
+    'p&g': 'PG',
+    'johnson & johnson': 'JNJ',
+    'j&j': 'JNJ',
+    'home depot': 'HD',
+    'nvidia': 'NVDA',
+    'tesla': 'TSLA',
+    's&p 500': 'SPY',
+}
+
+# Fuzzy matches need at least this similarity, and only those within FUZZY_MARGIN of the best are offered
+FUZZY_THRESHOLD = 0.45
+FUZZY_MARGIN = 0.15
+
+# Names with the most shared trigrams that are rescored with edit distance
+FUZZY_CANDIDATES = 50
+
+# Exchanges whose listings rank ahead of others sharing a name or prefix
+PRIMARY_EXCHANGES = {'NYSE', 'NASDAQ', 'NYSE ARCA', 'NYSE MKT', 'BATS'}
+
+
+# Function to normalize a company name such as "The Clorox Company" for lookups
+def normalize_company_name(name):
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    name = " ".join(re.sub(r"[^a-z0-9&]+", " ", name.replace("'", "")).split())
+    return name[4:] if name.startswith("the ") else name
+
+
+# Function to strip trailing corporate suffixes from a normalized name, e.g. "alphabet inc class a" -> "alphabet"
+def base_company_name(normalized_name):
+    words = normalized_name.split()
+    while len(words) > 1 and words[-1] in CORPORATE_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+# Function to count the single-character edits turning one string into another
+def edit_distance(first, second):
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for row, first_character in enumerate(first, start=1):
+        current = [row]
+        for column, second_character in enumerate(second, start=1):
+            current.append(min(previous[column] + 1, current[column - 1] + 1,
+                               previous[column - 1] + (first_character != second_character)))
+        previous = current
+    return previous[-1]
+
+
+# Function to score how alike two normalized names are, from 0 to 1
+def name_similarity(query, name, query_trigrams=None):
+    """
+    Averages trigram (Jaccard) similarity, which tolerates reordered and missing words, with
+    edit-distance similarity, which tolerates typos. Names that start with the query (e.g.
+    "alphabet" for "alphabet inc class a") score at least 0.9.
+    """
+    if not query or not name:
+        return 0.0
+    query_trigrams = query_trigrams or get_trigrams(query)
+    name_trigrams = get_trigrams(name)
+    shared = len(query_trigrams & name_trigrams)
+    jaccard = shared / (len(query_trigrams) + len(name_trigrams) - shared)
+    edits = 1 - edit_distance(query, name) / max(len(query), len(name))
+    score = (jaccard + edits) / 2
+    if name.startswith(query + " "):
+        score = max(score, 0.9)
+    return score
+
+
+# Function to rank (company name, symbol) candidates against a query, best first
+def rank_matches(query, matches, limit, threshold=FUZZY_THRESHOLD, margin=FUZZY_MARGIN):
+    query = base_company_name(normalize_company_name(query))
+    query_trigrams = get_trigrams(query)
+    scored = []
+    for name, symbol in matches:
+        normalized = normalize_company_name(name)
+        score = max(name_similarity(query, normalized, query_trigrams),
+                    name_similarity(query, base_company_name(normalized), query_trigrams),
+                    1.0 if query.upper() == symbol.upper() else 0.0)
+        if score >= threshold:
+            scored.append((score, name, symbol))
+    scored.sort(key=lambda match: -match[0])
+    if not scored:
+        return []
+    best = scored[0][0]
+    return [(name, symbol) for score, name, symbol in scored[:limit] if score >= best - margin]
+
+
+class StockIndex:
+    """
+    In-memory index over the listed symbols: a hash of exact symbols, a hash of normalized full
+    and base names and aliases, and a character trie over normalized names whose nodes each keep
+    their MAX_PREFIX_MATCHES best listings. Exact and prefix lookups are a few dict hits,
+    independent of how many symbols are listed.
+
+    Anything else (typos, reordered or extra words) goes to a trigram index over the base names
+    and aliases: the FUZZY_CANDIDATES names sharing the most trigrams with the query are rescored
+    with name_similarity, and the best few are returned.
+    """
+
+    def __init__(self, stocks):
+        # Common stock on a primary exchange first, then shorter names, so better candidates fill each node
+        self.stocks = sorted(stocks, key=lambda stock: (
+            stock.asset_type.lower() not in ('stock', ''),
+            stock.exchange.upper() not in PRIMARY_EXCHANGES,
+            len(stock.company_name),
+        ))
+        self.by_symbol = {}
+        self.by_name = {}
+        self.trie = {}
+
+        for position, stock in enumerate(self.stocks):
+            self.by_symbol.setdefault(stock.ticker_symbol.upper(), position)
+            normalized = normalize_company_name(stock.company_name)
+            for key in {normalized, base_company_name(normalized)}:
+                self.by_name.setdefault(key, []).append(position)
+
+            node = self.trie
+            for character in normalized:
+                node = node.setdefault(character, {})
+                matches = node.setdefault(None, [])
+                if len(matches) < MAX_PREFIX_MATCHES:
+                    matches.append(position)
+
+        # Aliases resolve like names, ahead of any listing that happens to share them
+        for alias, symbol in COMPANY_ALIASES.items():
+            if symbol in self.by_symbol:
+                self.by_name[normalize_company_name(alias)] = [self.by_symbol[symbol]]
+
+        # Trigram postings over base names and aliases; full names add nothing their base name doesn't
+        self.fuzzy_names = []
+        self.trigrams = defaultdict(list)
+        for key, positions in self.by_name.items():
+            if key != base_company_name(key):
+                continue
+            for position in positions:
+                self.add_fuzzy_name(key, position)
+
+    def add_fuzzy_name(self, name, position):
+        name_id = len(self.fuzzy_names)
+        self.fuzzy_names.append((name, position))
+        for trigram in get_trigrams(name):
+            self.trigrams[trigram].append(name_id)
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def match(self, position):
+        stock = self.stocks[position]
+        return (stock.company_name, stock.ticker_symbol)
+
+    def lookup(self, query, limit=MAX_PREFIX_MATCHES):
+        """
+        Returns [(company name, symbol), ...] for a symbol ("clx", "$CLX"), a name ("Clorox",
+        "The Clorox Company") or a name prefix ("Cloro"), best first; [] if nothing matches.
+
+        Cashtags and queries in capitals are tried as symbols first; anything else is tried as a
+        name, alias or name prefix first, so "Ford" finds F rather than FORD and "Coke" finds KO
+        rather than COKE.
+        """
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        symbol = query.lstrip('$').upper()
+        symbol_first = query.startswith('$') or query == query.upper()
+        if symbol_first and symbol in self.by_symbol:
+            return [self.match(self.by_symbol[symbol])]
+
+        normalized = normalize_company_name(query)
+        for key in (normalized, base_company_name(normalized)):
+            if key in self.by_name:
+                return [self.match(position) for position in self.by_name[key][:limit]]
+
+        node = self.trie
+        for character in normalized:
+            node = node.get(character)
+            if node is None:
+                break
+        if node and node.get(None):
+            return [self.match(position) for position in node[None][:limit]]
+
+        if symbol in self.by_symbol:
+            return [self.match(self.by_symbol[symbol])]
+        return self.fuzzy_lookup(query, limit)
+
+    def fuzzy_lookup(self, query, limit=MAX_PREFIX_MATCHES):
+        query = base_company_name(normalize_company_name(query))
+        query_trigrams = get_trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.trigrams.get(trigram, ()))
+
+        # Rescore the names sharing the most trigrams, keeping each listing's best name
+        best = {}
+        for name_id, _ in heapq.nlargest(FUZZY_CANDIDATES, shared.items(), key=lambda item: item[1]):
+            name, position = self.fuzzy_names[name_id]
+            score = name_similarity(query, name, query_trigrams)
+            if score >= FUZZY_THRESHOLD and score > best.get(position, 0):
+                best[position] = score
+        if not best:
+            return []
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        top_score = ranked[0][1]
+        matches = [self.match(position) for position, score in ranked[:limit] if score >= top_score - FUZZY_MARGIN]
+        logger.debug(f"Fuzzy matched '{query}' to {matches}")
+        return matches
+
+
+# The index built in this process, with the fingerprint of the Stock table it was built from
+stock_index = None
+stock_index_fingerprint = None
+
+
+# Function to get the stock index, rebuilt whenever the Stock table has been reloaded
+def get_stock_index():
+    global stock_index, stock_index_fingerprint
+    fingerprint = tuple(Stock.objects.aggregate(count=Count('id'), updated=Max('last_updated')).values())
+    if stock_index is None or fingerprint != stock_index_fingerprint:
+        stock_index = StockIndex(list(Stock.objects.all()))
+        stock_index_fingerprint = fingerprint
+        logger.info(f"Built stock index over {len(stock_index)} symbols")
+    return stock_index
+
+
+# Function to look up a company name or ticker in the local index
+def find_stocks(query, limit=MAX_PREFIX_MATCHES):
+    try:
+        return get_stock_index().lookup(query, limit)
+    except Exception as e:
+        logger.error(f"Error looking up {query} in the stock index: {e}")
+        return []
+
+
+# Function to turn listings CSV rows into unsaved Stock records
+def parse_listings(rows):
+    """
+    Accepts Alpha Vantage LISTING_STATUS rows (symbol, name, exchange, assetType, status) or the
+    older "Ticker Symbol" / "Company Name" layout. Inactive and duplicate symbols are skipped.
+    """
+    stocks = {}
+    for row in rows:
+        symbol = (row.get('symbol') or row.get('Ticker Symbol') or '').strip().upper()
+        name = (row.get('name') or row.get('Company Name') or '').strip()
+        if not symbol or not name or (row.get('status') or 'Active').strip().lower() != 'active':
+            continue
+        stocks.setdefault(symbol, Stock(
+            ticker_symbol=symbol,
+            company_name=name,
+            exchange=(row.get('exchange') or '').strip(),
+            asset_type=(row.get('assetType') or '').strip(),
+        ))
+    return list(stocks.values())
+
+
+# Function to download the current listings CSV from Alpha Vantage
+def fetch_listings():
+    api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        logger.error("Alpha Vantage API key not found.")
+        return None
+
+    try:
+        response = requests.get(ALPHA_VANTAGE_URL, params={'function': 'LISTING_STATUS', 'apikey': api_key}, timeout=60)
+        if response.status_code != 200:
+            logger.error(f"Error fetching listings from Alpha Vantage: {response.text}")
+            return None
+        return list(csv.DictReader(io.StringIO(response.text)))
+    except Exception as e:
+        logger.error(f"Error fetching listings: {e}")
+        return None
+
+
+# Function to replace the Stock table with a new set of listings in one transaction
+def load_stocks(stocks):
+    with transaction.atomic():
+        Stock.objects.all().delete()
+        Stock.objects.bulk_create(stocks, batch_size=1000)
+    return len(stocks)
@@ -1,10 +1,40 @@
+from django.conf import settings
 from django.urls import reverse
 from django.test import TestCase, Client
 from unittest.mock import patch, MagicMock
-from .market_analysis import get_stock_price, extract_company_name, get_ticker_symbol_from_name
-from .financial_statistics import extract_location
+from .market_analysis import get_stock_price, extract_company_name, get_ticker_symbol_from_name, search_company_or_ticker, update_market_conditions, get_market_conditions, get_market_conditions_message
+from .market_data import sync_daily_bars, load_daily_bars, next_market_refresh, get_bars, indicator_cache_key
+from .financial_statistics import extract_location, estimate_expenses, find_location_mentions, get_location_message, get_place_gazetteer, place_indexes, PlaceIndex, normalize_place_name, get_census_data_msa_or_place, get_demographic_data, get_employment_data, get_housing_data
+from .models import CensusPlace, CensusMetroArea, LocationSnapshot, DailyBar, MarketCondition, MarketConditionHistory, Stock
+from .census_table import CensusTable, build_census_table, get_census_table
+from .cost_of_living import CostOfLivingIndex, get_cost_of_living_index, get_cost_of_living_message
+from .similar_places import SimilarPlacesIndex, get_similar_places_index
+from .budget_engine import project_budget
+from .market_regimes import compute_regimes, classify_market
+from .indicators import IndicatorState, INDICATOR_PATTERN, sma, ema, rsi, rolling_volatility, get_indicators, get_indicators_message
+from .correlations import align_returns, compute_correlations, get_correlation_matrix, get_correlation_message
+from .backtester import backtest, run_backtest, parse_backtest_question, get_backtest_message
+from .retirement import simulate_retirement, get_retirement_inputs, get_retirement_message
+from .risk import RISK_PORTFOLIOS, compute_risk, get_risk_message
+from .portfolio_optimizer import compute_efficient_frontier, get_allocation, get_allocation_message
+from .quotes import QuoteFetchError, get_quote, get_quotes, quote_ttl, find_quote_tickers
+from .stock_index import StockIndex, parse_listings, load_stocks, find_stocks, rank_matches
+from .mentions import AhoCorasick, find_mentions
+from .price_series import parse_polygon_aggs, write_price_series, get_price_series, fetch_polygon_aggs
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+import io
 import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+import numpy as np
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
 class ExtractCompanyNameTestCase(TestCase):
     @patch('audney.market_analysis.client.chat.completions.create')  # Corrected patch path
@@ -20,6 +50,10 @@ class ExtractCompanyNameTestCase(TestCase):
 
 
 class TestStockPriceQuery(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch.dict('os.environ', {'ALPHA_VANTAGE_API_KEY': 'test'})
     @patch('audney.market_analysis.requests.get')
     def test_clorox_ticker_and_stock_price(self, mock_get):
         mock_response_ticker = MagicMock()
@@ -44,14 +78,12 @@ class TestStockPriceQuery(TestCase):
         mock_response_ticker.json.return_value = mock_ticker_data
 
         mock_stock_price_data = {
-            "Time Series (5min)": {
-                "2024-10-07 16:00:00": {
-                    "1. open": "145.00",
-                    "2. high": "146.00",
-                    "3. low": "144.50",
-                    "4. close": "145.50",
-                    "5. volume": "1200000"
-                }
+            "Global Quote": {
+                "01. symbol": "CLX",
+                "05. price": "145.5000",
+                "07. latest trading day": "2024-10-07",
+                "09. change": "0.5000",
+                "10. change percent": "0.3448%"
             }
         }
         mock_response_price.status_code = 200
@@ -65,6 +97,11 @@ class TestStockPriceQuery(TestCase):
         stock_price = get_stock_price('CLX')
         self.assertEqual(stock_price, "$145.50", "Stock price should be $145.50 for CLX")
 
+        # A second question is answered from the quote cache
+        self.assertEqual(get_stock_price('CLX'), "$145.50")
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args.kwargs['params']['function'], 'GLOBAL_QUOTE')
+
 class ExtractLocationTestCase(TestCase):
     @patch('audney.financial_statistics.client.chat.completions.create')  # Mock OpenAI for location extraction
     def test_extract_location(self, mock_openai_create):
@@ -97,4 +134,1152 @@ class ExtractLocationTestCase(TestCase):
                 city, state = extract_location(input_text, user_profile)
                 self.assertEqual(city, expected_city, f"Expected city '{expected_city}' but got '{city}'")
                 self.assertEqual(state, expected_state, f"Expected state '{expected_state}' but got '{state}'")
-            
\ No newline at end of file
+
+        # Every case is resolved by the rule-based extractor without calling the model
+        mock_openai_create.assert_not_called()
+
+class CensusStoreTestCase(TestCase):
+    def setUp(self):
+        patcher = patch('audney.financial_statistics.get_census_table', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        place_indexes.clear()
+        CensusPlace.objects.create(
+            state_fips='08', place_fips='20000', name='Denver city, Colorado', place_name='denver',
+            median_income=68592, total_population=705576, below_poverty=86000,
+            labor_force=420000, employed=400000, unemployed=20000,
+            median_home_value=394400, median_gross_rent=1311,
+        )
+        CensusMetroArea.objects.create(cbsa_code='19740', name='Denver-Aurora-Lakewood, CO Metro Area', median_income=75177)
+
+    @patch('audney.financial_statistics.cbsa_crosswalk', {('08', '20000'): '19740'})
+    @patch('audney.financial_statistics.requests.get')
+    def test_lookups_answer_from_store(self, mock_get):
+        self.assertEqual(get_census_data_msa_or_place('Denver', 'CO'), 75177)
+        self.assertEqual(get_demographic_data('Denver', 'CO')['total_population'], 705576)
+        self.assertAlmostEqual(get_employment_data('Denver', 'CO')['unemployment_rate'], 20000 / 420000 * 100)
+        self.assertEqual(get_housing_data('Denver', 'CO'), {'median_home_value': 394400, 'median_gross_rent': 1311})
+        mock_get.assert_not_called()
+
+    @patch('audney.financial_statistics.cbsa_crosswalk', {('08', '04000'): '14500'})
+    @patch('audney.financial_statistics.requests.get')
+    def test_place_outside_crosswalk_uses_place_income(self, mock_get):
+        self.assertEqual(get_census_data_msa_or_place('Denver', 'CO'), 68592)
+        mock_get.assert_not_called()
+
+    @patch('audney.financial_statistics.cbsa_crosswalk', {})
+    @patch('audney.financial_statistics.requests.get')
+    def test_missing_crosswalk_matches_metro_by_principal_city(self, mock_get):
+        CensusPlace.objects.create(state_fips='08', place_fips='03455', name='Aurora city, Colorado', place_name='aurora', median_income=65100)
+        CensusPlace.objects.create(state_fips='08', place_fips='07850', name='Boulder city, Colorado', place_name='boulder', median_income=69520)
+        CensusPlace.objects.create(state_fips='17', place_fips='03012', name='Aurora city, Illinois', place_name='aurora', median_income=76000)
+        self.assertEqual(get_census_data_msa_or_place('Denver', 'CO'), 75177)
+        self.assertEqual(get_census_data_msa_or_place('Aurora', 'CO'), 75177)
+        self.assertEqual(get_census_data_msa_or_place('Boulder', 'CO'), 69520)
+        self.assertEqual(get_census_data_msa_or_place('Aurora', 'IL'), 76000)
+        mock_get.assert_not_called()
+
+    @patch('audney.financial_statistics.requests.get')
+    def test_missing_place_in_loaded_state_skips_api(self, mock_get):
+        self.assertIsNone(get_housing_data('Boulder', 'CO'))
+        mock_get.assert_not_called()
+
+class MergedCensusFetchTestCase(TestCase):
+    def setUp(self):
+        patcher = patch('audney.financial_statistics.get_census_table', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        place_indexes.clear()
+
+    @patch('audney.financial_statistics.cbsa_crosswalk', {('08', '20000'): '19740'})
+    @patch('audney.financial_statistics.requests.get')
+    def test_one_fetch_serves_all_lookups(self, mock_get):
+        def census_response(url, params):
+            response = MagicMock(status_code=200)
+            if 'metropolitan' in params['for']:
+                self.assertTrue(params['for'].endswith(':19740'), "Only the crosswalked CBSA should be requested")
+                response.json.return_value = [
+                    ['NAME', 'B19013_001E', 'metropolitan statistical area/micropolitan statistical area'],
+                    ['Denver-Aurora-Lakewood, CO Metro Area', '75177', '19740'],
+                ]
+            elif url.endswith('/profile'):
+                response.json.return_value = [['DP05_0001E', 'state', 'place'], ['705576', '08', '20000']]
+            else:
+                response.json.return_value = [
+                    params['get'].split(',') + ['state', 'place'],
+                    ['Denver city, Colorado', '68592', '86000', '420000', '400000', '20000', '394400', '1311', '08', '20000'],
+                ]
+            return response
+        mock_get.side_effect = census_response
+
+        self.assertEqual(get_census_data_msa_or_place('Denver', 'CO'), 75177)
+        self.assertEqual(get_demographic_data('Denver', 'CO')['total_population'], 705576)
+        self.assertEqual(get_employment_data('Denver', 'CO')['labor_force'], 420000)
+        self.assertEqual(get_housing_data('Denver', 'CO')['median_gross_rent'], 1311)
+        # One detailed and one profile request shared by all four lookups, plus the crosswalked MSA
+        self.assertEqual(mock_get.call_count, 3)
+
+class PlaceIndexTestCase(TestCase):
+    def setUp(self):
+        names = ['New York city, New York', 'York CDP, New York', 'Jersey City city, New Jersey',
+                 'Carson City, Nevada', 'St. Louis city, Missouri', 'Sacramento city, California']
+        self.index = PlaceIndex([
+            CensusPlace(name=name, place_name=normalize_place_name(name), total_population=1000)
+            for name in names
+        ])
+
+    def test_exact_lookup_does_not_match_substrings(self):
+        self.assertEqual(self.index.lookup('York').name, 'York CDP, New York')
+        self.assertEqual(self.index.lookup('new york').name, 'New York city, New York')
+
+    def test_descriptors_and_punctuation_are_normalized(self):
+        self.assertEqual(self.index.lookup('Jersey City').name, 'Jersey City city, New Jersey')
+        self.assertEqual(self.index.lookup('Carson City').name, 'Carson City, Nevada')
+        self.assertEqual(self.index.lookup('St Louis').name, 'St. Louis city, Missouri')
+
+    def test_fuzzy_fallback(self):
+        self.assertEqual(self.index.lookup('Sacremento').name, 'Sacramento city, California')
+        self.assertIsNone(self.index.lookup('Albuquerque'))
+
+class LocationSnapshotTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Background refreshes run inline, without closing the test's connection
+        for target, kwargs in (('get_census_table_stamp', {'return_value': None}), ('connection', {}),
+                               ('threading.Thread', {'side_effect': lambda target, daemon: MagicMock(start=target)})):
+            patcher = patch(f'audney.financial_statistics.{target}', **kwargs)
+            setattr(self, target.replace('.', '_'), patcher.start())
+            self.addCleanup(patcher.stop)
+
+    @patch('audney.financial_statistics.build_location_message')
+    def test_snapshot_is_read_without_rebuilding(self, mock_build):
+        LocationSnapshot.objects.create(city_key='denver', state='CO', location_message='Denver data')
+        self.assertEqual(get_location_message('Denver', 'Colorado'), 'Denver data')
+        mock_build.assert_not_called()
+
+    @patch('audney.financial_statistics.build_location_message', return_value=('Austin data', True))
+    def test_missing_snapshot_is_built_in_background_and_shared(self, mock_build):
+        self.assertEqual(get_location_message('Austin', 'TX'), 'Location data for Austin, TX is still being gathered.')
+        self.threading_Thread.assert_called_once()
+        self.assertEqual(get_location_message('austin', 'tx'), 'Austin data')
+        mock_build.assert_called_once()
+
+    @patch('audney.financial_statistics.build_location_message', return_value=('Income data not available.', False))
+    def test_failed_lookups_are_not_stored(self, mock_build):
+        get_location_message('Austin', 'TX')
+        mock_build.assert_called_once()
+        self.assertFalse(LocationSnapshot.objects.exists())
+
+    @patch('audney.financial_statistics.build_location_message', return_value=('New Denver data', True))
+    def test_stale_snapshot_is_served_while_refreshed(self, mock_build):
+        LocationSnapshot.objects.create(city_key='denver', state='CO', location_message='Old Denver data')
+        CensusPlace.objects.create(state_fips='08', place_fips='20000', name='Denver city, Colorado', place_name='denver')
+        self.assertEqual(get_location_message('Denver', 'CO'), 'Old Denver data')
+        self.assertEqual(get_location_message('Denver', 'CO'), 'New Denver data')
+        mock_build.assert_called_once()
+
+    @patch('audney.financial_statistics.CensusPlace.objects.aggregate', return_value={'updated': None})
+    def test_census_stamp_is_cached(self, mock_aggregate):
+        LocationSnapshot.objects.create(city_key='denver', state='CO', location_message='Denver data')
+        for _ in range(3):
+            get_location_message('Denver', 'CO')
+        mock_aggregate.assert_called_once()
+
+    @patch('audney.financial_statistics.schedule_location_snapshot')
+    def test_profile_save_schedules_snapshot(self, mock_schedule):
+        user = User.objects.create_user(username='denverite', password='password')
+        profile = user.userprofile
+        profile.city, profile.state = 'Denver', 'CO'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        mock_schedule.assert_called_once_with('Denver', 'CO')
+
+class CensusTableTestCase(TestCase):
+    def setUp(self):
+        CensusPlace.objects.create(
+            state_fips='08', place_fips='20000', name='Denver city, Colorado', place_name='denver',
+            median_income=68592, total_population=705576, median_gross_rent=1311,
+        )
+        CensusPlace.objects.create(
+            state_fips='34', place_fips='36000', name='Jersey City city, New Jersey', place_name='jersey city',
+            median_income=70752, total_population=262146,
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_census_table(directory.name)
+        self.table = CensusTable(directory.name)
+
+    def test_lookup_round_trip(self):
+        self.assertEqual(len(self.table), 2)
+        place = self.table.record(self.table.find('08', 'denver'))
+        self.assertEqual((place.name, place.place_fips, place.median_income), ('Denver city, Colorado', '20000', 68592))
+        self.assertIsNone(place.median_home_value)
+        self.assertEqual(self.table.name(self.table.find('34', 'jersey city city')), 'Jersey City city, New Jersey')
+        self.assertIsNone(self.table.find('08', 'boulder'))
+
+    @patch.multiple('audney.census_table', census_table=None, census_table_loaded=False, census_table_stamp=None)
+    def test_rebuild_swaps_files_under_readers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        build_census_table(directory)
+        mapped = get_census_table(directory)
+        self.assertIs(get_census_table(directory), mapped)
+
+        CensusPlace.objects.filter(place_fips='20000').update(median_income=70000)
+        build_census_table(directory)
+        # The old mapping still reads the old files, and the next lookup maps the rebuilt ones
+        self.assertEqual(mapped.record(mapped.find('08', 'denver')).median_income, 68592)
+        remapped = get_census_table(directory)
+        self.assertIsNot(remapped, mapped)
+        self.assertEqual(remapped.record(remapped.find('08', 'denver')).median_income, 70000)
+        self.assertFalse([name for name in os.listdir(directory) if name.endswith('.tmp.npy')])
+
+    @patch('audney.financial_statistics.requests.get')
+    def test_find_place_reads_table(self, mock_get):
+        with patch('audney.financial_statistics.get_census_table', return_value=self.table):
+            self.assertEqual(get_housing_data('Denver', 'CO')['median_gross_rent'], 1311)
+        mock_get.assert_not_called()
+
+class RuleBasedLocationTestCase(TestCase):
+    gazetteer = {
+        'austin': [('TX', 961855), ('MN', 24563)],
+        'denver': [('CO', 705576)],
+        'boulder': [('CO', 106392)],
+        'new york': [('NY', 8419316)],
+    }
+    user_profile = {"city": "Sacramento", "state": "CA"}
+
+    @patch('audney.financial_statistics.client.chat.completions.create')
+    def test_rules_resolve_without_model(self, mock_openai_create):
+        test_cases = [
+            ("Is Austin Texas expensive?", "Austin", "TX"),
+            ("Rent in Denver CO vs here?", "Denver", "CO"),
+            ("How is the job market in Boulder?", "Boulder", "CO"),
+            ("What's it like to live in New York?", "New York", "NY"),
+            ("Should I invest in Tesla?", "Sacramento", "CA"),
+        ]
+        with patch('audney.financial_statistics.get_place_gazetteer', return_value=self.gazetteer):
+            for input_text, expected_city, expected_state in test_cases:
+                with self.subTest(input_text=input_text):
+                    self.assertEqual(extract_location(input_text, self.user_profile), (expected_city, expected_state))
+        mock_openai_create.assert_not_called()
+
+    @patch('audney.financial_statistics.client.chat.completions.create')
+    def test_ambiguous_mentions_fall_back_to_model(self, mock_openai_create):
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "Austin, Texas"
+        mock_openai_create.return_value = mock_response
+
+        with patch('audney.financial_statistics.get_place_gazetteer', return_value=self.gazetteer):
+            self.assertEqual(extract_location("How expensive is Austin?", {"city": "Denver", "state": "CO"}), ("Austin", "TX"))
+            self.assertEqual(extract_location("What's rent like in Austin?", {}), ("Austin", "TX"))
+        self.assertEqual(mock_openai_create.call_count, 2)
+
+    @patch('audney.financial_statistics.client.chat.completions.create')
+    def test_model_answer_without_comma_uses_profile(self, mock_openai_create):
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "None"
+        mock_openai_create.return_value = mock_response
+
+        with patch('audney.financial_statistics.get_place_gazetteer', return_value=self.gazetteer):
+            self.assertEqual(extract_location("Is Texas a good place to retire?", self.user_profile), ("Sacramento", "CA"))
+        mock_openai_create.assert_called_once()
+
+    def test_find_location_mentions_for_comparisons(self):
+        with patch('audney.financial_statistics.get_place_gazetteer', return_value=self.gazetteer):
+            self.assertEqual(
+                find_location_mentions("Is Austin expensive compared to Denver?", {"city": "Sacramento", "state": "CA"}),
+                [("Austin", "TX"), ("Denver", "CO")]
+            )
+            self.assertEqual(find_location_mentions("Is Austin cheap?", {"state": "MN"}), [("Austin", "MN")])
+
+    @patch('audney.census_table.get_census_table', return_value=None)
+    @patch('audney.financial_statistics.get_census_table', return_value=None)
+    def test_gazetteer_is_rebuilt_after_census_reload(self, mock_table, mock_census_table):
+        CensusPlace.objects.create(state_fips='08', place_fips='20000', name='Denver city, Colorado', place_name='denver',
+                                   total_population=705576)
+        gazetteer = get_place_gazetteer()
+        self.assertIs(get_place_gazetteer(), gazetteer)
+        self.assertNotIn('boulder', gazetteer)
+
+        CensusPlace.objects.create(state_fips='08', place_fips='07850', name='Boulder city, Colorado', place_name='boulder',
+                                   total_population=106392)
+        self.assertEqual(get_place_gazetteer()['boulder'], [('CO', 106392)])
+
+
+class CostOfLivingTestCase(TestCase):
+    def setUp(self):
+        # Four comparable places plus one too small to be part of the national distribution
+        self.index = CostOfLivingIndex({
+            'median_income': [40000, 60000, 80000, 100000, 500000],
+            'median_gross_rent': [800, 1000, 1200, 1400, 5000],
+            'median_home_value': [150000, 250000, 350000, 450000, 2000000],
+            'below_poverty': [200, 150, 100, 50, 0],
+            'total_population': [1000, 1000, 1000, 1000, 10],
+            'unemployed': [80, 60, 40, 20, 0],
+            'labor_force': [1000, 1000, 1000, 1000, 5],
+        })
+
+    def test_percentiles(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.percentile('median_income', 80000), 62.5)
+        self.assertEqual(self.index.percentile('median_income', 1000000), 100)
+        self.assertIsNone(self.index.percentile('median_income', None))
+
+    def test_rank_place_and_message(self):
+        place = CensusPlace(median_income=100000, median_gross_rent=800, median_home_value=None,
+                            below_poverty=50, total_population=1000, unemployed=20, labor_force=1000)
+        ranking = self.index.rank_place(place)
+        self.assertEqual(ranking['median_income']['percentile'], 87.5)
+        self.assertAlmostEqual(ranking['poverty_rate']['value'], 5.0)
+        self.assertNotIn('median_home_value', ranking)
+
+        with patch('audney.cost_of_living.get_cost_of_living_index', return_value=self.index), \
+                patch('audney.cost_of_living.find_place', return_value=place):
+            message = get_cost_of_living_message([('Denver', 'CO')])
+        self.assertIn("Denver, CO: median household income $100,000 (88th percentile)", message)
+
+    @patch('audney.census_table.get_census_table', return_value=None)
+    @patch('audney.cost_of_living.get_census_table', return_value=None)
+    def test_index_is_rebuilt_after_census_reload(self, mock_table, mock_census_table):
+        CensusPlace.objects.create(state_fips='08', place_fips='20000', name='Denver city, Colorado', place_name='denver',
+                                   median_income=68592, total_population=705576)
+        index = get_cost_of_living_index()
+        self.assertIs(get_cost_of_living_index(), index)
+
+        CensusPlace.objects.create(state_fips='08', place_fips='07850', name='Boulder city, Colorado', place_name='boulder',
+                                   median_income=69520, total_population=105000)
+        rebuilt = get_cost_of_living_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(len(rebuilt.distributions['median_income']), 2)
+
+
+class SimilarPlacesTestCase(TestCase):
+    def setUp(self):
+        self.places = [
+            # name, income, rent, home value, employed, poverty, state, place
+            ('Denver city, Colorado', 68000, 1300, 400000, 950, 120, 8, 20000),
+            ('Aurora city, Colorado', 65000, 1250, 330000, 945, 110, 8, 4000),
+            ('Austin city, Texas', 71000, 1280, 350000, 955, 130, 48, 5000),
+            ('Boise City city, Idaho', 60000, 1000, 280000, 960, 140, 16, 8830),
+            ('Flint city, Michigan', 28000, 650, 30000, 800, 380, 26, 29000),
+        ]
+        columns = {
+            'median_income': [p[1] for p in self.places],
+            'median_gross_rent': [p[2] for p in self.places],
+            'median_home_value': [p[3] for p in self.places],
+            'employed': [p[4] for p in self.places],
+            'labor_force': [1000] * 5,
+            'below_poverty': [p[5] for p in self.places],
+            'total_population': [1000] * 5,
+            'state_fips': [p[6] for p in self.places],
+            'place_fips': [p[7] for p in self.places],
+        }
+        self.index = SimilarPlacesIndex(columns, [p[0] for p in self.places])
+        self.denver = CensusPlace(state_fips='08', place_fips='20000', median_income=68000, median_gross_rent=1300,
+                                  median_home_value=400000, employed=950, labor_force=1000, below_poverty=120,
+                                  total_population=1000)
+
+    def test_nearest_places_exclude_the_place_itself(self):
+        results = self.index.query(self.denver, k=2)
+        self.assertEqual([(r['name'], r['state']) for r in results], [('Austin city', 'TX'), ('Aurora city', 'CO')])
+
+    def test_cheaper_filter(self):
+        results = self.index.query(self.denver, k=4, cheaper=True)
+        self.assertTrue(all(r['median_gross_rent'] < 1300 for r in results))
+        self.assertEqual(results[-1]['name'], 'Flint city')
+
+    @patch('audney.census_table.get_census_table', return_value=None)
+    @patch('audney.similar_places.get_census_table', return_value=None)
+    def test_index_is_rebuilt_after_census_reload(self, mock_table, mock_census_table):
+        for name, income, rent, home_value, employed, poverty, state_fips, place_fips in self.places[:3]:
+            CensusPlace.objects.create(name=name, median_income=income, median_gross_rent=rent, median_home_value=home_value,
+                                       employed=employed, labor_force=1000, below_poverty=poverty, total_population=1000,
+                                       state_fips=f'{state_fips:02d}', place_fips=f'{place_fips:05d}', place_name=normalize_place_name(name))
+        index = get_similar_places_index()
+        self.assertIs(get_similar_places_index(), index)
+
+        CensusPlace.objects.filter(place_fips='05000').delete()
+        self.assertIsNot(get_similar_places_index(), index)
+
+
+class BudgetEngineTestCase(TestCase):
+    def test_projection_view_rejects_oversized_and_non_finite_input(self):
+        self.client.force_login(User.objects.create_user(username='planner', password='secret'))
+        url = reverse('budget_projection')
+        self.assertTrue(self.client.get(url, {'incomes': '50000,80000', 'savings_rates': '0.1'}).json()['success'])
+        for params in ({'incomes': ','.join(['50000'] * 11)}, {'incomes': '50000', 'savings_rates': ','.join(['0.1'] * 11)},
+                       {'incomes': 'nan'}, {'incomes': '50000', 'inflation': 'inf'}):
+            response = self.client.get(url, params).json()
+            self.assertFalse(response['success'], params)
+
+    def test_estimate_expenses_keeps_guideline_allocation(self):
+        self.assertEqual(estimate_expenses(50000)['housing'], 15000.0)
+        self.assertEqual(estimate_expenses(50000, 'debt_management')['debt_repayment'], 7500.0)
+
+    def test_projection_shapes_and_values(self):
+        projection = project_budget([50000, 100000], years=3, inflation_rate=0.1, income_growth=0.0,
+                                    savings_rates=[0.1, 0.2], savings_return=0.0)
+        self.assertEqual(projection['expenses'].shape, (2, 2, 3, len(projection['categories'])))
+        self.assertEqual(projection['savings'].shape, (2, 2, 3))
+        # Housing inflates 10% a year: 30% of 100k -> 33k -> 36.3k
+        housing = projection['categories'].index('housing')
+        self.assertEqual(projection['expenses'][0, 1, 2, housing], 36300.0)
+        # 20% of 50k saved for three years
+        self.assertEqual(projection['cumulative_savings'][1, 0, 2], 30000.0)
+        # 50k - 72% allocated - 10% saved
+        self.assertEqual(projection['discretionary'][0, 0, 0], 9000.0)
+
+    def test_cumulative_savings_compound(self):
+        projection = project_budget([10000], years=2, income_growth=0.0, savings_rates=[0.1], savings_return=0.5)
+        self.assertEqual(projection['cumulative_savings'][0, 0].tolist(), [1000.0, 2500.0])
+
+
+class DailyBarStoreTestCase(TestCase):
+    def alpha_vantage_response(self, closes, adjustment=1.0):
+        # closes[0] is the oldest bar; the newest bar is yesterday
+        today = date.today()
+        series = {
+            str(today - timedelta(days=len(closes) - position)): {
+                '1. open': str(close), '2. high': str(close), '3. low': str(close), '4. close': str(close),
+                '5. adjusted close': str(close * adjustment), '6. volume': '1000',
+            }
+            for position, close in enumerate(closes)
+        }
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'Time Series (Daily)': series}
+        return response
+
+    @patch.dict('os.environ', {'ALPHA_VANTAGE_API_KEY': 'test'})
+    @patch('audney.market_data.requests.get')
+    def test_backfill_then_append_tail(self, mock_get):
+        mock_get.return_value = self.alpha_vantage_response([100.0, 110.0, 120.0])
+        self.assertEqual(sync_daily_bars('SPY'), 3)
+        self.assertEqual(mock_get.call_args.kwargs['params']['outputsize'], 'full')
+
+        # Pretend the newest bar hasn't been stored yet
+        DailyBar.objects.filter(ticker='SPY', date=date.today() - timedelta(days=1)).delete()
+        self.assertEqual(sync_daily_bars('SPY'), 1)
+        self.assertEqual(mock_get.call_args.kwargs['params']['outputsize'], 'compact')
+
+        bars = load_daily_bars('SPY')
+        self.assertEqual(bars['adjusted_close'].tolist(), [100.0, 110.0, 120.0])
+        self.assertEqual(bars['date'].dtype, 'datetime64[D]')
+
+    @patch.dict('os.environ', {'ALPHA_VANTAGE_API_KEY': 'test'})
+    @patch('audney.market_data.requests.get')
+    def test_changed_adjusted_closes_reload_history(self, mock_get):
+        mock_get.return_value = self.alpha_vantage_response([100.0, 110.0, 120.0])
+        sync_daily_bars('SPY')
+        DailyBar.objects.filter(ticker='SPY', date=date.today() - timedelta(days=1)).delete()
+
+        # A dividend rescaled every adjusted close
+        mock_get.return_value = self.alpha_vantage_response([100.0, 110.0, 120.0], adjustment=0.5)
+        self.assertEqual(sync_daily_bars('SPY'), 3)
+        self.assertEqual(load_daily_bars('SPY')['adjusted_close'].tolist(), [50.0, 55.0, 60.0])
+
+    @patch('audney.market_analysis.sync_daily_bars')
+    def test_conditions_classified_from_store(self, mock_sync):
+        DailyBar.objects.bulk_create([
+            DailyBar(ticker=ticker, date=date.today() - timedelta(days=days_ago), open=close, high=close,
+                     low=close, close=close, adjusted_close=close, volume=1000)
+            for ticker, closes in {'TQQQ': [50.0, 100.0], 'SPY': [100.0, 70.0], 'CLX': [100.0, 105.0]}.items()
+            for days_ago, close in zip((30, 1), closes)
+        ])
+        update_market_conditions()
+        conditions = dict(MarketCondition.objects.filter(horizon='5Y').values_list('ticker', 'condition'))
+        self.assertEqual(conditions, {'TQQQ': 'Bull', 'SPY': 'Bear', 'CLX': 'Neutral'})
+        self.assertEqual(mock_sync.call_count, 3)
+
+
+class MarketRefreshTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch('audney.market_analysis.threading.Thread')
+    def test_fresh_conditions_are_read_without_refreshing(self, mock_thread):
+        MarketCondition.objects.create(ticker='SPY', condition='Bull')
+        self.assertEqual([mc.condition for mc in get_market_conditions()], ['Bull'])
+        mock_thread.assert_not_called()
+
+    @patch('audney.market_analysis.threading.Thread')
+    def test_stale_conditions_schedule_one_refresh(self, mock_thread):
+        MarketCondition.objects.create(ticker='SPY', condition='Bull')
+        MarketCondition.objects.update(last_updated=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual([mc.condition for mc in get_market_conditions()], ['Bull'])
+        get_market_conditions()
+        mock_thread.assert_called_once()
+
+    def test_next_refresh_skips_weekends(self):
+        # Friday 5pm Eastern -> Monday 4:30pm Eastern
+        friday_evening = datetime(2024, 3, 8, 22, 0, tzinfo=dt_timezone.utc)
+        next_refresh = next_market_refresh(friday_evening)
+        self.assertEqual((next_refresh.date(), next_refresh.hour, next_refresh.minute), (date(2024, 3, 11), 16, 30))
+        # Monday morning -> same day
+        self.assertEqual(next_market_refresh(datetime(2024, 3, 11, 14, 0, tzinfo=dt_timezone.utc)).date(), date(2024, 3, 11))
+
+
+class PriceSeriesTestCase(TestCase):
+    payload = {
+        'ticker': 'X:BTCUSD',
+        'results': [
+            {'v': 2.5, 'vw': 101.0, 'o': 100.0, 'c': 102.0, 'h': 103.0, 'l': 99.0, 't': 1643932800000, 'n': 10},
+            {'v': 1.5, 'vw': 100.0, 'o': 99.0, 'c': 100.0, 'h': 101.0, 'l': 98.0, 't': 1643846400000},
+        ],
+    }
+
+    def test_parse_sorts_and_types_columns(self):
+        columns = parse_polygon_aggs(json.dumps(self.payload))
+        self.assertEqual(columns['t'].tolist(), [1643846400000, 1643932800000])
+        self.assertEqual(columns['c'].tolist(), [100.0, 102.0])
+        self.assertEqual(columns['n'].tolist(), [0, 10])
+        self.assertEqual(columns['v'].dtype, 'float64')
+
+    def test_series_is_memory_mapped_and_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_price_series('X:BTCUSD', parse_polygon_aggs(self.payload), directory)
+            series = get_price_series('X:BTCUSD', directory)
+            self.assertEqual(series['c'].tolist(), [100.0, 102.0])
+            self.assertEqual(str(series.dates[0]), '2022-02-03')
+            self.assertIsNotNone(getattr(series['c'], 'filename', None))
+
+            # A newer bar is appended and a revised bar replaces the stored one
+            update = {'results': [
+                {'v': 3.0, 'vw': 104.0, 'o': 102.0, 'c': 105.0, 'h': 106.0, 'l': 101.0, 't': 1644019200000, 'n': 12},
+                {'v': 2.5, 'vw': 101.0, 'o': 100.0, 'c': 102.5, 'h': 103.0, 'l': 99.0, 't': 1643932800000, 'n': 11},
+            ]}
+            self.assertEqual(write_price_series('X:BTCUSD', parse_polygon_aggs(update), directory), 3)
+            self.assertEqual(get_price_series('X:BTCUSD', directory)['c'].tolist(), [100.0, 102.5, 105.0])
+            self.assertIsNone(get_price_series('SPY', directory))
+
+    @patch.dict('os.environ', {'POLYGON_API_KEY': 'test'})
+    @patch('audney.price_series.requests.get')
+    def test_fetch_follows_next_url(self, mock_get):
+        first_page = MagicMock(status_code=200)
+        first_page.json.return_value = {'results': self.payload['results'][:1], 'next_url': 'https://api.polygon.io/next'}
+        second_page = MagicMock(status_code=200)
+        second_page.json.return_value = {'results': self.payload['results'][1:]}
+        mock_get.side_effect = [first_page, second_page]
+
+        columns = fetch_polygon_aggs('X:BTCUSD', '2022-02-01', '2022-02-05')
+        self.assertEqual(columns['t'].tolist(), [1643846400000, 1643932800000])
+        self.assertEqual(mock_get.call_args_list[1].args[0], 'https://api.polygon.io/next')
+
+
+class MarketRegimeTestCase(TestCase):
+    def test_regimes_for_tickers_of_different_lengths(self):
+        rising = 100 * 1.01 ** np.arange(300)  # +1% a day
+        crashed = np.concatenate([np.full(250, 100.0), np.linspace(100, 70, 50)])
+        short = np.array([10.0, 11.0])
+        regimes = compute_regimes([rising, crashed, short])
+
+        self.assertAlmostEqual(regimes['1M']['return'][0], 1.01 ** 21 - 1)
+        self.assertEqual(regimes['1Y']['condition'].tolist(), ['Bull', 'Bear', 'Neutral'])
+        self.assertAlmostEqual(regimes['3M']['drawdown'][1], -0.30)
+        self.assertAlmostEqual(regimes['1Y']['volatility'][0], 0.0)
+        # The two-bar series is measured over its only return, which has no volatility estimate
+        self.assertAlmostEqual(regimes['5Y']['return'][2], 0.10)
+        self.assertTrue(np.isnan(regimes['5Y']['volatility'][2]))
+
+    def test_classify_market_scalars_and_arrays(self):
+        self.assertEqual(classify_market(0.25), 'Bull')
+        self.assertEqual(classify_market(0.25, drawdowns=-0.30), 'Bear')
+        self.assertEqual(classify_market([0.0, -0.3, np.nan]).tolist(), ['Neutral', 'Bear', 'Unknown'])
+
+    @patch('audney.market_analysis.sync_daily_bars')
+    def test_conditions_stored_per_horizon_with_history(self, mock_sync):
+        closes = 100 * 1.001 ** np.arange(30)
+        DailyBar.objects.bulk_create([
+            DailyBar(ticker='SPY', date=date.today() - timedelta(days=30 - position), open=close, high=close,
+                     low=close, close=close, adjusted_close=close, volume=1000)
+            for position, close in enumerate(closes)
+        ])
+        update_market_conditions()
+        update_market_conditions()
+
+        self.assertEqual(MarketCondition.objects.filter(ticker='SPY').count(), 4)
+        self.assertEqual(MarketConditionHistory.objects.filter(ticker='SPY').count(), 4)
+        message = get_market_conditions_message(MarketCondition.objects.all())
+        self.assertIn("'SPY' seems to be in a Neutral market over 5 years", message)
+        self.assertIn("1M Neutral (+2.1%)", message)
+
+
+class IndicatorTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        random = np.random.default_rng(0)
+        closes = 100 * np.exp(np.cumsum(random.normal(0, 0.01, 260)))
+        self.bars = {
+            'date': np.datetime64('2023-01-01') + np.arange(260),
+            'close': closes,
+            'high': closes * 1.01,
+            'low': closes * 0.99,
+        }
+
+    def bars_until(self, end):
+        return {field: values[:end] for field, values in self.bars.items()}
+
+    def test_vectorized_indicators(self):
+        self.assertEqual(sma([1, 2, 3, 4], 2)[1:].tolist(), [1.5, 2.5, 3.5])
+        self.assertEqual(ema([1.0, 1.0, 1.0], 5).tolist(), [1.0, 1.0, 1.0])
+        self.assertEqual(rsi([1, 2, 3, 4])[-1], 100.0)
+        self.assertAlmostEqual(rolling_volatility(100 * 1.01 ** np.arange(30))[-1], 0.0)
+
+    def test_incremental_updates_match_full_rebuild(self):
+        state = IndicatorState(self.bars_until(200))
+        for position in range(200, 260):
+            state.update(self.bars['date'][position], self.bars['high'][position], self.bars['low'][position], self.bars['close'][position])
+        rebuilt = IndicatorState(self.bars).snapshot()
+        for name, value in state.snapshot().items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(value, rebuilt[name], places=2, msg=name)
+            else:
+                self.assertEqual(value, rebuilt[name])
+
+    @patch('audney.indicators.get_bars')
+    def test_cached_state_advances_with_new_bars(self, mock_get_bars):
+        mock_get_bars.return_value = self.bars_until(259)
+        self.assertEqual(get_indicators('spy')['as_of'], '2023-09-16')
+        mock_get_bars.return_value = {field: values[259:] for field, values in self.bars.items()}
+        readings = get_indicators('SPY')
+        mock_get_bars.assert_called_with('SPY', start=date(2023, 9, 17))
+        self.assertEqual(readings['as_of'], '2023-09-17')
+        self.assertAlmostEqual(readings['sma_20'], round(float(self.bars['close'][-20:].mean()), 2))
+
+    @patch('audney.market_data.fetch_daily_bars')
+    def test_full_reload_drops_cached_state(self, mock_fetch):
+        latest = date.today() - timedelta(days=3)
+        DailyBar.objects.create(ticker='SPY', date=latest, open=100, high=100, low=100, close=100, adjusted_close=100, volume=1)
+        cache.set(indicator_cache_key('SPY'), IndicatorState(self.bars))
+        mock_fetch.return_value = [DailyBar(ticker='SPY', date=latest, open=100, high=100, low=100, close=100,
+                                            adjusted_close=98, volume=1)]
+        sync_daily_bars('SPY')
+        self.assertIsNone(cache.get(indicator_cache_key('SPY')))
+
+    def test_keywords_match_whole_words(self):
+        self.assertIsNotNone(INDICATOR_PATTERN.search("Is the market trending up?"))
+        self.assertIsNotNone(INDICATOR_PATTERN.search("How volatile is it right now?"))
+        for text in ("Should I buy a small house?", "Will rates remain high?", "I got an email about my account"):
+            self.assertIsNone(INDICATOR_PATTERN.search(text), text)
+
+    @patch('audney.indicators.get_indicators', return_value={
+        'as_of': '2024-03-08', 'close': 510.0, 'sma_20': 500.0, 'sma_50': 490.0, 'sma_200': None, 'ema_12': 505.0,
+        'ema_26': 500.0, 'macd': 5.0, 'macd_signal': 4.0, 'macd_histogram': 1.0, 'rsi': 74.2, 'atr': 4.5, 'volatility_pct': 12.0})
+    def test_message_for_mentioned_ticker(self, mock_get_indicators):
+        message = get_indicators_message("Is SPY overbought?")
+        self.assertIn("RSI(14) 74.2 (overbought)", message)
+        mock_get_indicators.assert_called_once_with('SPY')
+        self.assertIsNone(get_indicators_message("How should I budget for a car?"))
+
+
+class CorrelationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        random = np.random.default_rng(1)
+        market = random.normal(0, 0.01, 120)
+        self.returns = {
+            'SPY': market,
+            'TQQQ': 3 * market,
+            'CLX': random.normal(0, 0.01, 120),
+        }
+
+    def store_bars(self):
+        for ticker, returns in self.returns.items():
+            closes = 100 * np.cumprod(np.concatenate([[1.0], 1 + returns]))
+            DailyBar.objects.bulk_create([
+                DailyBar(ticker=ticker, date=date(2024, 1, 1) + timedelta(days=position), open=close, high=close,
+                         low=close, close=close, adjusted_close=close, volume=1000)
+                for position, close in enumerate(closes)
+            ])
+
+    def test_beta_and_correlation(self):
+        returns = np.column_stack([self.returns['SPY'], self.returns['TQQQ'], self.returns['CLX']])
+        correlation, beta = compute_correlations(returns)
+        self.assertAlmostEqual(correlation[0, 1], 1.0)
+        self.assertAlmostEqual(beta[1, 0], 3.0)
+        self.assertAlmostEqual(beta[0, 1], 1 / 3)
+        self.assertTrue(np.allclose(correlation, np.corrcoef(returns.T)))
+
+    def test_align_returns_on_common_dates(self):
+        weekdays = np.datetime64('2024-01-01') + np.array([0, 1, 2, 3])
+        every_day = np.datetime64('2024-01-01') + np.arange(5)
+        dates, returns = align_returns({
+            'SPY': (weekdays, np.array([100.0, 110.0, 121.0, 133.1])),
+            'X:BTCUSD': (every_day, np.array([10.0, 20.0, 40.0, 80.0, 160.0])),
+        })
+        self.assertEqual(len(dates), 3)
+        self.assertTrue(np.allclose(returns, [[0.1, 1.0], [0.1, 1.0], [0.1, 1.0]]))
+
+    def test_matrix_cached_until_next_bar(self):
+        self.store_bars()
+        with patch('audney.correlations.get_bars', wraps=get_bars) as mock_get_bars:
+            matrices = get_correlation_matrix()
+            get_correlation_matrix()
+            self.assertEqual(mock_get_bars.call_count, 3)
+            DailyBar.objects.create(ticker='SPY', date=date(2024, 6, 1), open=1, high=1, low=1, close=1, adjusted_close=1, volume=1)
+            get_correlation_matrix()
+            self.assertEqual(mock_get_bars.call_count, 6)
+        self.assertEqual(matrices['tickers'], ['TQQQ', 'SPY', 'CLX'])
+
+        message = get_correlation_message("Does CLX diversify my portfolio?")
+        self.assertIn("| CLX |", message)
+        self.assertIn("| SPY |", message)
+        self.assertNotIn("| TQQQ |", message)
+        self.assertIn("Betas against SPY: CLX", message)
+
+
+class BacktestTestCase(TestCase):
+    def setUp(self):
+        # Two years of daily bars doubling each year, with a 50% dip in the middle of the first year
+        self.dates = np.datetime64('2022-01-01') + np.arange(731)
+        self.closes = 100 * 2 ** (np.arange(731) / 365)
+        self.closes[150:200] *= 0.5
+
+    def test_lump_sum_from_many_starts(self):
+        results = backtest(self.closes, self.dates, np.array([0, 365]), 1000)
+        self.assertAlmostEqual(results['final_value'][0], 4000.0)
+        self.assertAlmostEqual(results['final_value'][1], 2000.0)
+        self.assertAlmostEqual(results['annual_return'][1], 1.0, places=2)
+        self.assertAlmostEqual(results['max_drawdown'][0], -0.5, places=2)
+        self.assertEqual(results['max_drawdown'][1], 0.0)
+
+    def test_monthly_contributions(self):
+        closes = np.full(731, 50.0)
+        results = backtest(closes, self.dates, np.array([0, 700]), 500, monthly=True)
+        # January 2022 through January 2024 is 25 contributions; starting in December 2023 adds January 2024's
+        self.assertEqual(results['total_invested'].tolist(), [12500.0, 1000.0])
+        self.assertAlmostEqual(results['final_value'][0], 12500.0)
+        self.assertAlmostEqual(results['annual_return'][0], 0.0, places=6)
+
+    def test_chunks_match_one_matrix(self):
+        starts = np.arange(0, 700, 7)
+        with patch('audney.backtester.BACKTEST_CHUNK', 1000):
+            whole = backtest(self.closes, self.dates, starts, 500, monthly=True)
+        chunked = backtest(self.closes, self.dates, starts, 500, monthly=True)
+        for name in whole:
+            self.assertTrue(np.allclose(whole[name], chunked[name], equal_nan=True), name)
+
+    @patch('audney.backtester.get_bars')
+    def test_long_history_samples_monthly_starts(self, mock_get_bars):
+        dates = np.datetime64('2000-01-03') + np.arange(9000)
+        mock_get_bars.return_value = {'date': dates, 'close': np.linspace(100, 400, 9000)}
+        with patch('audney.backtester.backtest', wraps=backtest) as mock_backtest:
+            result = run_backtest('SPY', 1000, date(2000, 1, 1))
+        scenario_starts, range_starts = (call.args[2] for call in mock_backtest.call_args_list)
+        self.assertEqual(scenario_starts.tolist(), [0])
+        self.assertLessEqual(len(range_starts), 360)
+        self.assertAlmostEqual(result['scenario']['final_value'], 4000.0)
+
+    def test_parse_question(self):
+        self.assertEqual(parse_backtest_question("What if I had put $500/month into TQQQ since 2022?"),
+                         {'amount': 500.0, 'monthly': True, 'ticker': 'TQQQ', 'start': date(2022, 1, 1)})
+        self.assertEqual(parse_backtest_question("What if I invested $10k in bitcoin in March 2022?"),
+                         {'amount': 10000.0, 'monthly': False, 'ticker': 'X:BTCUSD', 'start': date(2022, 3, 1)})
+        self.assertIsNone(parse_backtest_question("Should I put $500 into savings?"))
+
+    @patch('audney.backtester.get_bars')
+    def test_message(self, mock_get_bars):
+        mock_get_bars.return_value = {'date': self.dates, 'close': self.closes}
+        message = get_backtest_message("What if I had put $1,000 into SPY in 2021?")
+        self.assertIn("a $1,000 lump sum in SPY from 2022-01-01 to 2024-01-01", message)
+        self.assertIn("final value $4,000", message)
+        self.assertIn("only starts on 2022-01-01", message)
+
+
+class RetirementSimulationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='saver', password='password')
+        self.profile = self.user.userprofile
+        self.profile.date_of_birth = date(date.today().year - 40, 1, 1)
+        self.profile.income_level = '55001_89000'
+        self.profile.savings_months = '6_months'
+        self.profile.has_dependents = 'yes'
+        self.profile.risk_tolerance = 'conservative'
+        self.profile.financial_goals = 'retirement_planning'
+
+    def test_inputs_from_profile(self):
+        inputs = get_retirement_inputs(self.profile)
+        self.assertEqual(inputs['income'], 72000)
+        self.assertEqual(inputs['starting_balance'], 36000)
+        self.assertEqual(inputs['savings_rate'], 0.10)
+        self.assertEqual(inputs['stock_allocation'], 0.3)
+
+    def test_deterministic_paths(self):
+        # Zero real returns everywhere: the balance is just savings minus withdrawals
+        with patch('audney.retirement.BOND_VOLATILITY', 0.0), patch('audney.retirement.BOND_REAL_RETURN', 0.0):
+            result = simulate_retirement(np.zeros(10), age=60, income=100000, starting_balance=200000, savings_rate=0.1,
+                                         stock_allocation=0.5, retirement_age=65, plan_to_age=75, paths=100, seed=0)
+        # 200k + 5 years x 10k = 250k at retirement, then 40k a year runs out in the 7th year
+        self.assertEqual(result['retirement_balance'][50], 250000)
+        self.assertEqual(result['success_probability'], 0.0)
+        self.assertEqual(result['ending_balance'][50], 0.0)
+
+    def test_success_probability_with_strong_returns(self):
+        result = simulate_retirement(np.full(10, np.log(1.10)), age=30, income=72000, starting_balance=0,
+                                     savings_rate=0.15, stock_allocation=0.9, seed=0)
+        self.assertEqual(result['paths'], 10000)
+        self.assertGreater(result['success_probability'], 0.99)
+
+    @patch('audney.retirement.get_annual_returns', return_value=np.full(10, np.log(1.05)))
+    def test_message(self, mock_annual_returns):
+        message = get_retirement_message(self.profile, "Am I on track?")
+        self.assertIn("age 40, retiring at 67", message)
+        self.assertIn("Probability the savings last to 95", message)
+        self.profile.financial_goals = 'budgeting'
+        self.assertIsNone(get_retirement_message(self.profile, "How should I budget for a car?"))
+
+
+class RiskTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_normal_returns_agree_across_methods(self):
+        returns = np.random.default_rng(2).normal(0.0, 0.01, 5000)
+        risk = compute_risk(returns, seed=0)
+        self.assertEqual(risk['historical']['var'].shape, (3, 2))
+        # 95% one-day VaR of N(0, 1%) is 1.645%
+        for method in ('historical', 'parametric', 'bootstrap'):
+            self.assertAlmostEqual(risk[method]['var'][0, 0], 0.01645, delta=0.001, msg=method)
+            self.assertTrue(np.all(risk[method]['cvar'] > risk[method]['var']), msg=method)
+        # Longer horizons and higher confidence mean bigger losses
+        self.assertTrue(np.all(np.diff(risk['parametric']['var'], axis=0) > 0))
+        self.assertTrue(np.all(np.diff(risk['parametric']['var'], axis=1) > 0))
+
+    def test_max_drawdown(self):
+        risk = compute_risk(np.array([0.1, -0.5] + [0.0] * 30), seed=0)
+        self.assertAlmostEqual(risk['max_drawdown'], 0.5)
+
+    def test_message_for_mentioned_ticker(self):
+        closes = 100 * np.cumprod(1 + np.random.default_rng(3).normal(0, 0.01, 300))
+        DailyBar.objects.bulk_create([
+            DailyBar(ticker='TQQQ', date=date(2023, 1, 1) + timedelta(days=position), open=close, high=close,
+                     low=close, close=close, adjusted_close=close, volume=1000)
+            for position, close in enumerate(closes)
+        ])
+        message = get_risk_message("How much could I lose with $5k in TQQQ?", 'conservative')
+        self.assertIn("Loss estimates for a $5,000 portfolio of 100% TQQQ", message)
+        self.assertIn("| 1 month | 99% |", message)
+        self.assertIsNone(get_risk_message("What is TQQQ?", 'conservative'))
+
+    def test_model_portfolios_are_fully_invested_in_the_universe(self):
+        for tolerance, weights in RISK_PORTFOLIOS.items():
+            self.assertAlmostEqual(sum(weights.values()), 1.0, msg=tolerance)
+            self.assertTrue(set(weights) <= set(settings.PORTFOLIO_UNIVERSE), tolerance)
+
+        closes = 100 * np.cumprod(1 + np.random.default_rng(4).normal(0, 0.01, 300))
+        DailyBar.objects.bulk_create([
+            DailyBar(ticker='SPY', date=date(2023, 1, 1) + timedelta(days=position), open=close, high=close,
+                     low=close, close=close, adjusted_close=close, volume=1000)
+            for position, close in enumerate(closes)
+        ])
+        # Without AGG bars the stock sleeve is rescaled rather than the bond sleeve silently becoming cash
+        message = get_risk_message("How much could I lose in a crash?", 'moderate')
+        self.assertIn("portfolio of 100% SPY, from daily returns", message)
+
+
+class PortfolioOptimizerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_frontier_is_efficient(self):
+        expected_returns = np.array([0.10, 0.04, 0.07])
+        covariance = np.diag([0.04, 0.0025, 0.01])
+        frontier = compute_efficient_frontier(expected_returns, covariance, points=10, max_weight=1.0)
+        self.assertTrue(np.allclose(frontier['weights'].sum(axis=1), 1))
+        self.assertTrue(np.all(frontier['weights'] >= 0))
+        # Returns and volatility both rise along the frontier, ending fully in the best asset
+        self.assertTrue(np.all(np.diff(frontier['returns']) > 0))
+        self.assertTrue(np.all(np.diff(frontier['volatility']) > 0))
+        self.assertAlmostEqual(frontier['weights'][-1, 0], 1.0, places=3)
+        # Minimum variance for uncorrelated assets weights each by 1 / variance
+        inverse = 1 / np.diag(covariance)
+        self.assertTrue(np.allclose(frontier['weights'][0], inverse / inverse.sum(), atol=1e-3))
+
+    @patch('audney.portfolio_optimizer.get_portfolio_universe', return_value=['SPY', 'AGG'])
+    def test_allocation_by_risk_tolerance(self, mock_universe):
+        random = np.random.default_rng(4)
+        for ticker, (drift, volatility) in {'SPY': (0.0006, 0.012), 'AGG': (0.0001, 0.003)}.items():
+            closes = 100 * np.cumprod(1 + random.normal(drift, volatility, 600))
+            DailyBar.objects.bulk_create([
+                DailyBar(ticker=ticker, date=date(2022, 1, 1) + timedelta(days=position), open=close, high=close,
+                         low=close, close=close, adjusted_close=close, volume=1000)
+                for position, close in enumerate(closes)
+            ])
+
+        conservative = get_allocation('conservative')
+        aggressive = get_allocation('aggressive')
+        # With two ETFs and a 60% cap nothing reaches 6% volatility, so conservative falls back to minimum variance
+        self.assertGreater(conservative['volatility'], 0.06)
+        self.assertAlmostEqual(conservative['weights']['AGG'], 0.6, places=3)
+        self.assertLessEqual(aggressive['volatility'], 0.17 + 1e-6)
+        self.assertGreater(aggressive['weights']['SPY'], conservative['weights']['SPY'])
+        self.assertAlmostEqual(sum(aggressive['weights'].values()), 1.0, places=2)
+        self.assertIn("efficient allocation for a moderate investor", get_allocation_message('moderate'))
+
+
+class QuoteCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_ttl_follows_market_hours(self):
+        eastern = ZoneInfo('America/New_York')
+        # Tuesday mid-session, Friday after the close, and a crypto pair on a Sunday
+        self.assertEqual(quote_ttl('AAPL', datetime(2024, 10, 8, 11, 0, tzinfo=eastern)), 60)
+        self.assertEqual(quote_ttl('AAPL', datetime(2024, 10, 11, 17, 0, tzinfo=eastern)), 24 * 60 * 60)
+        self.assertEqual(quote_ttl('AAPL', datetime(2024, 10, 8, 9, 0, tzinfo=eastern)), 30 * 60)
+        self.assertEqual(quote_ttl('X:BTCUSD', datetime(2024, 10, 13, 12, 0, tzinfo=eastern)), 60)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        release = threading.Event()
+
+        def slow_fetch(ticker):
+            release.wait(5)
+            return {'ticker': ticker, 'price': 10.0, 'change': 0.0, 'change_percent': 0.0, 'as_of': '2024-10-07'}
+
+        with patch('audney.quotes.fetch_quote', side_effect=slow_fetch) as mock_fetch:
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                futures = [pool.submit(get_quote, 'AAPL') for _ in range(5)]
+                time.sleep(0.1)
+                release.set()
+                quotes = [future.result() for future in futures]
+            self.assertEqual(mock_fetch.call_count, 1)
+            self.assertTrue(all(quote['price'] == 10.0 for quote in quotes))
+            self.assertEqual(get_quote('aapl')['price'], 10.0)
+            self.assertEqual(mock_fetch.call_count, 1)
+
+    @patch.dict('os.environ', {'ALPHA_VANTAGE_API_KEY': 'test'})
+    @patch('audney.quotes.requests.get')
+    def test_crypto_uses_exchange_rate(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={
+            "Realtime Currency Exchange Rate": {"5. Exchange Rate": "67000.50", "6. Last Refreshed": "2024-10-13 12:00:00"}
+        }))
+        self.assertEqual(get_quote('X:BTCUSD')['price'], 67000.5)
+        params = mock_get.call_args.kwargs['params']
+        self.assertEqual((params['function'], params['from_currency'], params['to_currency']), ('CURRENCY_EXCHANGE_RATE', 'BTC', 'USD'))
+
+
+    @patch.dict('os.environ', {'ALPHA_VANTAGE_API_KEY': 'test'})
+    @patch('audney.quotes.requests.get')
+    def test_failed_fetch_is_told_apart_from_missing_quote(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=503, text='Service Unavailable')
+        self.assertEqual(get_stock_price('AAPL'), "Error fetching stock price: 503")
+        mock_get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={'Note': 'API call frequency exceeded'}))
+        self.assertTrue(get_stock_price('AAPL').startswith("Error fetching stock price: rate limit"))
+        mock_get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={'Global Quote': {}}))
+        self.assertEqual(get_stock_price('ZZZZ'), "Stock data not available for ZZZZ. It may be inactive or delisted.")
+
+    def test_failed_fetch_reaches_waiting_callers(self):
+        release = threading.Event()
+
+        def failing_fetch(ticker):
+            release.wait(5)
+            raise QuoteFetchError('503')
+
+        with patch('audney.quotes.fetch_quote', side_effect=failing_fetch):
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                futures = [pool.submit(get_quote, 'AAPL') for _ in range(3)]
+                time.sleep(0.1)
+                release.set()
+                for future in futures:
+                    self.assertIsInstance(future.exception(), QuoteFetchError)
+
+
+class QuoteBatchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_quotes_fetch_concurrently(self):
+        def slow_fetch(ticker):
+            time.sleep(0.2)
+            return {'ticker': ticker, 'price': 1.0, 'change': 0.0, 'change_percent': 0.0, 'as_of': '2024-10-07'}
+
+        with patch('audney.quotes.fetch_quote', side_effect=slow_fetch):
+            started = time.monotonic()
+            quotes = get_quotes(['AAPL', 'MSFT', 'NVDA', 'aapl', 'GOOG'])
+            elapsed = time.monotonic() - started
+        self.assertEqual(list(quotes), ['AAPL', 'MSFT', 'NVDA', 'GOOG'])
+        self.assertLess(elapsed, 0.6)
+
+    def test_slow_ticker_times_out_alone(self):
+        release = threading.Event()
+
+        def fetch(ticker):
+            if ticker == 'SLOW':
+                release.wait(5)
+            return {'ticker': ticker, 'price': 2.0, 'change': 0.0, 'change_percent': 0.0, 'as_of': '2024-10-07'}
+
+        with patch('audney.quotes.fetch_quote', side_effect=fetch):
+            quotes = get_quotes(['AAPL', 'SLOW'], timeout=0.2)
+            release.set()
+        self.assertEqual(quotes['AAPL']['price'], 2.0)
+        self.assertIsNone(quotes['SLOW'])
+
+    def test_find_quote_tickers(self):
+        self.assertEqual(find_quote_tickers("compare AAPL, MSFT and $nvda"), ['AAPL', 'MSFT', 'NVDA'])
+        self.assertEqual(find_quote_tickers("Should I buy X:BTCUSD or SPY?"), ['X:BTCUSD', 'SPY'])
+        self.assertEqual(find_quote_tickers("What is the price of Apple?"), [])
+        self.assertEqual(find_quote_tickers("How is NVDA doing vs the S&P 500?"), ['NVDA'])
+        self.assertEqual(find_quote_tickers("Quote AAPL? Need it ASAP, before the NYSE opens"), ['AAPL'])
+        self.assertEqual(find_quote_tickers("Is $F cheap?"), ['F'])
+
+    def test_find_quote_tickers_checks_listed_symbols(self):
+        load_stocks([Stock(ticker_symbol='AAPL', company_name='Apple Inc'), Stock(ticker_symbol='MSFT', company_name='Microsoft Corp')])
+        self.assertEqual(find_quote_tickers("AAPL vs MSFT, LOL"), ['AAPL', 'MSFT'])
+
+    def test_stock_prices_view(self):
+        user = User.objects.create_user(username='quotes', password='secret')
+        self.client.force_login(user)
+        quote = {'ticker': 'AAPL', 'price': 3.0, 'change': 0.1, 'change_percent': 1.0, 'as_of': '2024-10-07'}
+        with patch('audney.quotes.fetch_quote', return_value=quote):
+            response = self.client.get(reverse('get_stock_prices'), {'symbols': 'AAPL, MSFT'})
+        self.assertEqual(set(response.json()['quotes']), {'AAPL', 'MSFT'})
+
+    @patch('audney.views.classify_query_with_gpt', return_value='stock_price')
+    def test_quote_table_survives_chat_history_reload(self, mock_classify):
+        self.client.force_login(User.objects.create_user(username='history', password='secret'))
+        quotes = {'AAPL': {'ticker': 'AAPL', 'price': 190.0, 'change': 1.0, 'change_percent': 0.5, 'as_of': '2026-10-16'}, 'MSFT': None}
+        with patch('audney.views.get_quotes', return_value=quotes):
+            self.client.post(reverse('chatbot_response'), json.dumps({'message': "Compare AAPL and MSFT"}),
+                             content_type='application/json')
+        stored = self.client.get(reverse('get_chat_history')).json()[-1]['message']
+        self.assertIn('<table class="quote-table">', stored)
+        self.assertIn('<td>AAPL</td><td>$190.00</td>', stored)
+        self.assertIn('<td colspan="3">Not available</td>', stored)
+
+
+class StockIndexTestCase(TestCase):
+    def setUp(self):
+        rows = [
+            {'symbol': 'CLX', 'name': 'The Clorox Company', 'exchange': 'NYSE', 'assetType': 'Stock', 'status': 'Active'},
+            {'symbol': 'AAPL', 'name': 'Apple Inc', 'exchange': 'NASDAQ', 'assetType': 'Stock', 'status': 'Active'},
+            {'symbol': 'APLE', 'name': 'Apple Hospitality REIT Inc', 'exchange': 'NYSE', 'assetType': 'Stock', 'status': 'Active'},
+            {'symbol': 'GOOGL', 'name': 'Alphabet Inc - Class A', 'exchange': 'NASDAQ', 'assetType': 'Stock', 'status': 'Active'},
+            {'symbol': 'GOOG', 'name': 'Alphabet Inc - Class C', 'exchange': 'NASDAQ', 'assetType': 'Stock', 'status': 'Active'},
+            {'symbol': 'OLD', 'name': 'Delisted Corp', 'exchange': 'NYSE', 'assetType': 'Stock', 'status': 'Delisted'},
+        ]
+        self.stocks = parse_listings(rows)
+
+    def test_lookups(self):
+        index = StockIndex(self.stocks)
+        self.assertEqual(index.lookup('$clx'), [('The Clorox Company', 'CLX')])
+        self.assertEqual(index.lookup('Clorox'), [('The Clorox Company', 'CLX')])
+        self.assertEqual(index.lookup('Apple'), [('Apple Inc', 'AAPL')])
+        self.assertEqual(index.lookup('Appl'), [('Apple Inc', 'AAPL'), ('Apple Hospitality REIT Inc', 'APLE')])
+        self.assertEqual({symbol for _, symbol in index.lookup('Alphabet')}, {'GOOGL', 'GOOG'})
+        self.assertEqual(index.lookup('Delisted'), [])
+
+    def test_names_win_over_symbols_unless_written_as_one(self):
+        index = StockIndex(self.stocks + [
+            Stock(ticker_symbol='F', company_name='Ford Motor Co', exchange='NYSE', asset_type='Stock'),
+            Stock(ticker_symbol='FORD', company_name='Forward Industries Inc', exchange='NASDAQ', asset_type='Stock'),
+            Stock(ticker_symbol='KO', company_name='Coca-Cola Co', exchange='NYSE', asset_type='Stock'),
+            Stock(ticker_symbol='COKE', company_name='Coca-Cola Consolidated Inc', exchange='NASDAQ', asset_type='Stock'),
+        ])
+        self.assertEqual(index.lookup('Ford'), [('Ford Motor Co', 'F')])
+        self.assertEqual(index.lookup('Coke'), [('Coca-Cola Co', 'KO')])
+        self.assertEqual(index.lookup('FORD'), [('Forward Industries Inc', 'FORD')])
+        self.assertEqual(index.lookup('$coke'), [('Coca-Cola Consolidated Inc', 'COKE')])
+
+    @patch('audney.market_analysis.requests.get')
+    def test_loaded_table_answers_without_api(self, mock_get):
+        self.assertEqual(load_stocks(self.stocks), 5)
+        self.assertEqual(get_ticker_symbol_from_name('The Clorox Company'), [('The Clorox Company', 'CLX')])
+        self.assertEqual(find_stocks('aapl'), [('Apple Inc', 'AAPL')])
+        mock_get.assert_not_called()
+
+    def test_importstocks_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as listings:
+            listings.write("Ticker Symbol,Company Name\nCLX,The Clorox Company\nAAPL,Apple Inc\n")
+        call_command('importstocks', listings.name, stdout=io.StringIO())
+        os.unlink(listings.name)
+        self.assertEqual(sorted(Stock.objects.values_list('ticker_symbol', flat=True)), ['AAPL', 'CLX'])
+
+
+class FuzzyStockMatchTestCase(TestCase):
+    def setUp(self):
+        self.index = StockIndex([
+            Stock(ticker_symbol='CLX', company_name='The Clorox Company', exchange='NYSE', asset_type='Stock'),
+            Stock(ticker_symbol='MSFT', company_name='Microsoft Corporation', exchange='NASDAQ', asset_type='Stock'),
+            Stock(ticker_symbol='GOOGL', company_name='Alphabet Inc. Class A', exchange='NASDAQ', asset_type='Stock'),
+            Stock(ticker_symbol='GOOG', company_name='Alphabet Inc. Class C', exchange='NASDAQ', asset_type='Stock'),
+            Stock(ticker_symbol='META', company_name='Meta Platforms Inc', exchange='NASDAQ', asset_type='Stock'),
+        ])
+
+    def test_typos_and_aliases(self):
+        self.assertEqual(self.index.lookup('Microsfot'), [('Microsoft Corporation', 'MSFT')])
+        self.assertEqual(self.index.lookup('Cloroxx Co'), [('The Clorox Company', 'CLX')])
+        self.assertEqual(self.index.lookup('Facebook'), [('Meta Platforms Inc', 'META')])
+        self.assertEqual({symbol for _, symbol in self.index.lookup('Alphabet Inc')}, {'GOOGL', 'GOOG'})
+        self.assertEqual(self.index.lookup('Zebra Holdings'), [])
+
+    def test_rank_api_matches(self):
+        matches = [('CLX Health', 'CLXH'), ('The Clorox Company', 'CLX'), ('Clearone Inc', 'CLRO')]
+        self.assertEqual(rank_matches('Clorox', matches, 5), [('The Clorox Company', 'CLX')])
+
+    @patch('audney.market_analysis.extract_company_name', return_value='Clorox')
+    @patch('audney.market_analysis.requests.get')
+    def test_search_ranks_api_fallback(self, mock_get, mock_extract):
+        mock_get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={'bestMatches': [
+            {'1. symbol': 'CLXH', '2. name': 'CLX Health'},
+            {'1. symbol': 'CLX', '2. name': 'The Clorox Company'},
+        ]}))
+        with patch.dict('os.environ', {'ALPHA_VANTAGE_API_KEY': 'test'}):
+            self.assertEqual(search_company_or_ticker('What is Clorox trading at?'), ('The Clorox Company', 'CLX'))
+
+
+class MentionExtractorTestCase(TestCase):
+    def setUp(self):
+        load_stocks([
+            Stock(ticker_symbol='TSLA', company_name='Tesla Inc', exchange='NASDAQ', asset_type='Stock'),
+            Stock(ticker_symbol='AAPL', company_name='Apple Inc', exchange='NASDAQ', asset_type='Stock'),
+            Stock(ticker_symbol='BAC', company_name='Bank of America Corp', exchange='NYSE', asset_type='Stock'),
+            Stock(ticker_symbol='CLX', company_name='The Clorox Company', exchange='NYSE', asset_type='Stock'),
+            Stock(ticker_symbol='ON', company_name='ON Semiconductor Corp', exchange='NASDAQ', asset_type='Stock'),
+        ])
+
+    def test_automaton_finds_overlapping_patterns(self):
+        matcher = AhoCorasick()
+        for pattern in ('he', 'she', 'his', 'hers'):
+            matcher.add(pattern, pattern)
+        matcher.build()
+        self.assertEqual(sorted(matcher.search('ushers')), [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')])
+
+    def test_mentions(self):
+        mentions = find_mentions("Is $tsla a better buy than bank of america or The Clorox Company? I'm on the fence.")
+        self.assertEqual([mention['symbol'] for mention in mentions], ['TSLA', 'BAC', 'CLX'])
+        self.assertEqual(mentions[1]['text'], 'bank of america')
+        self.assertEqual(find_mentions("How is AAPL doing?")[0]['query'], 'AAPL')
+        # Symbols that double as common words need a cashtag
+        self.assertEqual(find_mentions("How is ON doing?"), [])
+        self.assertEqual(find_mentions("How is $ON doing?")[0]['symbol'], 'ON')
+        self.assertEqual(find_mentions("What is the price of gold?"), [])
+
+    def test_everyday_words_are_not_mentions(self):
+        load_stocks(list(Stock.objects.all()) + [
+            Stock(ticker_symbol='XYZ', company_name='Block Inc', exchange='NYSE', asset_type='Stock'),
+            Stock(ticker_symbol='MTCH', company_name='Match Group Inc', exchange='NASDAQ', asset_type='Stock'),
+            Stock(ticker_symbol='TGT', company_name='Target Corp', exchange='NYSE', asset_type='Stock'),
+            Stock(ticker_symbol='PGR', company_name='Progressive Corp', exchange='NYSE', asset_type='Stock'),
+        ])
+        mentions = find_mentions("What is the stock price of Apple? I want to block out time to match my target")
+        self.assertEqual([mention['symbol'] for mention in mentions], ['AAPL'])
+        self.assertEqual([mention['symbol'] for mention in find_mentions("Target is up. Should I buy Target or $XYZ?")],
+                         ['TGT', 'XYZ'])
+        self.assertEqual([mention['explicit'] for mention in find_mentions("Apple, Tesla Inc or MTCH?")], [False, True, True])
+
+    @patch('audney.views.time.sleep')
+    @patch('audney.views.get_stock_price', return_value='$190.00')
+    @patch('audney.views.get_quotes')
+    @patch('audney.views.classify_query_with_gpt', return_value='stock_price')
+    def test_single_company_question_gets_one_quote(self, mock_classify, mock_get_quotes, mock_price, mock_sleep):
+        self.client.force_login(User.objects.create_user(username='investor', password='secret'))
+        response = self.client.post(reverse('chatbot_response'), json.dumps({'message': "How is Apple doing? I'm on the fence"}),
+                                    content_type='application/json')
+        mock_get_quotes.assert_not_called()
+        self.assertEqual(response.json()['message'], "Currently, Apple Inc (AAPL) is priced at $190.00.")
+
+    @patch('audney.market_analysis.client.chat.completions.create')
+    def test_extract_company_name_skips_model_on_hits(self, mock_openai_create):
+        self.assertEqual(extract_company_name("What's Apple trading at?"), 'AAPL')
+        mock_openai_create.assert_not_called()
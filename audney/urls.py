@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import get_chat_history
-from .views import audney, chatbot_response, login, register, logout, get_stock_price_view, update_profile, support, support_success
+from .views import audney, chatbot_response, login, register, logout, get_stock_price_view, get_stock_prices_view, update_profile, support, support_success, similar_places_view, budget_projection_view, indicators_view
 
 urlpatterns = [
     path('', audney, name='chatbot'),
@@ -9,6 +9,10 @@ urlpatterns = [
     path('register', register, name='register'),
     path('logout', logout, name='logout'),
     path('get_stock_price/', get_stock_price_view, name='get_stock_price'),
+    path('get_stock_prices/', get_stock_prices_view, name='get_stock_prices'),
+    path('similar_places/', similar_places_view, name='similar_places'),
+    path('budget_projection/', budget_projection_view, name='budget_projection'),
+    path('indicators/', indicators_view, name='indicators'),
     path('update_profile/', update_profile, name='update_profile'),
     path('chat/history/', get_chat_history, name='get_chat_history'),
     path('support/', support, name='support'),
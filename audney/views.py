@@ -1,5 +1,6 @@
 # Import necessary modules and functions
 import os
+import math
 from datetime import datetime
 from django.utils import timezone
 from django.utils.timezone import make_aware, now, timedelta
@@ -24,10 +25,10 @@ import json
 from django.utils.timezone import now
 
 # Import local modules and functions
-from .models import UserMessage, AudneyMessage, StockPriceResponse, MarketCondition, UserProfile
+from .models import UserMessage, AudneyMessage, StockPriceResponse, UserProfile
 from audney.models import UserProfile
 from .forms import UserProfileForm, UserForm
-from .market_analysis import get_stock_price, calculate_user_age, update_market_conditions, extract_company_name, get_ticker_symbol_from_name
+from .market_analysis import get_stock_price, calculate_user_age, get_market_conditions, get_market_conditions_message, extract_company_name, get_ticker_symbol_from_name
 from django.core.mail import EmailMessage
 from .forms import SupportForm
 import pandas as pd
@@ -37,7 +38,18 @@ import requests
 from openai import OpenAI
 
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-from .financial_statistics import get_census_data_msa_or_place, estimate_expenses, extract_location, get_demographic_data, get_employment_data, get_housing_data
+from .financial_statistics import extract_location, get_location_message, find_location_mentions, get_census_data_msa_or_place
+from .cost_of_living import get_cost_of_living_message
+from .similar_places import find_similar_places, get_similar_places_message
+from .indicators import get_indicators, get_indicators_message
+from .retirement import get_retirement_message
+from .risk import get_risk_message
+from .portfolio_optimizer import get_allocation_message
+from .backtester import get_backtest_message
+from .correlations import CORRELATION_GOALS, get_correlation_message
+from .quotes import get_quotes, find_quote_tickers, render_quotes_table
+from .mentions import find_mentions
+from .budget_engine import BUDGET_KEYWORDS, INCOME_LEVEL_ESTIMATES, MAX_PROJECTION_SCENARIOS, get_budget_scenarios_message, project_budget, projection_rows
 from .query_handlers import classify_query_with_gpt, handle_stock_price_query
 
 # Set the OpenAI API key
@@ -87,10 +99,20 @@ def ask_openai(user_input, user):
         logger.info(f"Query type '{query_type}' is not 'stock_price', proceeding with financial advice flow.")
 
     try:
-        # Fetch and update market conditions
-        update_market_conditions()
-        market_conditions = MarketCondition.objects.all()
-        market_conditions_str = '\n'.join([f"Currently, '{mc.ticker}' seems to be in a {mc.condition} market." for mc in market_conditions])
+        # Read the stored market conditions; stale ones are refreshed in the background
+        market_conditions = get_market_conditions()
+        market_conditions_str = get_market_conditions_message(market_conditions)
+
+        # Add technical indicator readings when the user asks about a ticker's technicals
+        indicators_message = get_indicators_message(user_input)
+        if indicators_message:
+            market_conditions_str += f"\n\n{indicators_message}"
+
+        # Answer "what if I had invested" questions from the stored price history
+        backtest_message = get_backtest_message(user_input)
+        if backtest_message:
+            market_conditions_str += f"\n\n{backtest_message}"
+        logger.debug(f"Backtest: {backtest_message}")
         logger.debug(f"Market conditions: {market_conditions_str}")
 
         # Gather user financial profile details
@@ -118,69 +140,60 @@ def ask_openai(user_input, user):
             location_context = f"Based on data for your location ({city}, {state}):"
         logger.debug(f"Location context: {location_context}")
 
-        # Get census data for user's city and state or the specified location
-        median_income = get_census_data_msa_or_place(city, state)
-        logger.debug(f"Median income for {city}, {state}: {median_income}")
-
-        # Get additional demographic, employment, and housing data
-        demographic_data = get_demographic_data(city, state)
-        logger.debug(f"Demographic data for {city}, {state}: {demographic_data}")
-
-        employment_data = get_employment_data(city, state)
-        logger.debug(f"Employment data for {city}, {state}: {employment_data}")
-
-        housing_data = get_housing_data(city, state)
-        logger.debug(f"Housing data for {city}, {state}: {housing_data}")
-
-        # Construct location message with the retrieved data
-        location_messages = []
-
-        if isinstance(median_income, int):
-            location_messages.append(f"The median household income in {city}, {state} is ${median_income}.")
-            expense_estimates = estimate_expenses(median_income)
-            expenses_str = ", ".join([f"{category}: ${amount}" for category, amount in expense_estimates.items()])
-            location_messages.append(f"Estimated expenses based on median income are: {expenses_str}.")
-        else:
-            location_messages.append("Income data not available for the specified location.")
-
-        if demographic_data:
-            total_population = demographic_data.get('total_population')
-            poverty_rate = demographic_data.get('poverty_rate')
-            if total_population is not None and poverty_rate is not None:
-                location_messages.append(f"The total population is {total_population}, with a poverty rate of {poverty_rate:.2f}%.")
-            else:
-                location_messages.append("Demographic data is incomplete.")
-        else:
-            location_messages.append("Demographic data not available.")
-
-        if employment_data:
-            employment_rate = employment_data.get('employment_rate')
-            unemployment_rate = employment_data.get('unemployment_rate')
-            if employment_rate is not None and unemployment_rate is not None:
-                location_messages.append(f"The employment rate is {employment_rate:.2f}%, and the unemployment rate is {unemployment_rate:.2f}%.")
-            else:
-                location_messages.append("Employment data is incomplete.")
-        else:
-            location_messages.append("Employment data not available.")
-
-        if housing_data:
-            median_home_value = housing_data.get('median_home_value')
-            median_gross_rent = housing_data.get('median_gross_rent')
-            if median_home_value is not None:
-                location_messages.append(f"The median home value in {city}, {state} is ${median_home_value}.")
-            else:
-                location_messages.append("Median home value data not available.")
-            if median_gross_rent is not None:
-                location_messages.append(f"The median gross rent in {city}, {state} is ${median_gross_rent}.")
-            else:
-                location_messages.append("Median gross rent data not available.")
-        else:
-            location_messages.append("Housing data not available.")
-
-        # Combine all location messages
-        location_message = " ".join(location_messages)
+        # Read the pre-rendered location data shared by every user in the same place
+        location_message = get_location_message(city, state)
         logger.debug(f"Location message: {location_message}")
 
+        # Rank the location, and any other places the user compares it with, against every US place
+        compared_locations = [(city, state)] + [
+            location for location in find_location_mentions(user_input, {"city": city, "state": state})
+            if location != (city, state)
+        ]
+        cost_of_living_message = get_cost_of_living_message(compared_locations)
+        if cost_of_living_message:
+            location_message += f"\n\n{cost_of_living_message}"
+        logger.debug(f"Cost of living rankings: {cost_of_living_message}")
+
+        # Suggest comparable places when the user asks for them
+        similar_places_message = get_similar_places_message(user_input, city, state)
+        if similar_places_message:
+            location_message += f"\n\n{similar_places_message}"
+        logger.debug(f"Similar places: {similar_places_message}")
+
+        # Ground "how much could I lose" questions in VaR/CVaR from the stored returns
+        risk_message = get_risk_message(user_input, user_profile.risk_tolerance)
+        if risk_message:
+            market_conditions_str += f"\n\n{risk_message}"
+        logger.debug(f"Risk estimates: {risk_message}")
+
+        # Give strategy questions a concrete allocation from the efficient frontier
+        if query_type == 'investment_strategy':
+            allocation_message = get_allocation_message(user_profile.risk_tolerance)
+            if allocation_message:
+                market_conditions_str += f"\n\n{allocation_message}"
+            logger.debug(f"Allocation: {allocation_message}")
+
+        # Quote correlations and betas for investors thinking about diversification
+        if user_financial_goal in CORRELATION_GOALS:
+            correlation_message = get_correlation_message(user_input)
+            if correlation_message:
+                market_conditions_str += f"\n\n{correlation_message}"
+            logger.debug(f"Correlations: {correlation_message}")
+
+        # Show savings-rate scenarios for budgeting questions, from the user's income level or the local median income
+        if user_financial_goal == 'budgeting' or any(keyword in user_input.lower() for keyword in BUDGET_KEYWORDS):
+            income = INCOME_LEVEL_ESTIMATES.get(user_profile.income_level) or get_census_data_msa_or_place(city, state)
+            budget_scenarios_message = get_budget_scenarios_message(income, user_financial_goal)
+            if budget_scenarios_message:
+                location_message += f"\n\n{budget_scenarios_message}"
+            logger.debug(f"Budget scenarios: {budget_scenarios_message}")
+
+        # Simulate the user's retirement for retirement questions
+        retirement_message = get_retirement_message(user_profile, user_input)
+        if retirement_message:
+            location_message += f"\n\n{retirement_message}"
+        logger.debug(f"Retirement simulation: {retirement_message}")
+
         # Construct user financial context as system knowledge
         user_context = f"The user is {user_age} years old, with financial goals set as: {user_financial_goal}. {additional_user_details}"
         logger.debug(f"User context: {user_context}")
@@ -290,8 +303,31 @@ def chatbot_response(request):
     # Ensure debugging logs to capture the exact type and comparison
     logger.debug(f"Raw query_type: {repr(query_type)} (before comparison)")
 
-    # Handle stock price queries
+    # Handle stock questions that name several companies, e.g. "compare AAPL, MSFT and NVDA" or "Apple vs Microsoft", with one batched quote
+    quote_tickers = []
     if query_type == "stock_price":
+        # Beyond the first mention, only symbols and multi-word names are trusted to add rows to a quote table
+        mentions = find_mentions(user_input)
+        mentioned = [mention['symbol'] for position, mention in enumerate(mentions) if position == 0 or mention['explicit']]
+        quote_tickers = list(dict.fromkeys(mentioned + find_quote_tickers(user_input)))
+    if len(quote_tickers) > 1:
+        logger.debug(f"Quoting several tickers at once: {quote_tickers}")
+        quotes = get_quotes(quote_tickers)
+        response_message = "Here are the latest quotes: " + render_quotes_table(quotes)
+        contains_html = True
+
+        # Store the assistant's response
+        AudneyMessage.objects.create(
+            user=request.user,
+            user_query=user_input,
+            message=response_message,
+            contains_html=contains_html,
+            message_type='audney',
+            created_at=make_aware(datetime.now())
+        )
+
+    # Handle stock price queries
+    elif query_type == "stock_price":
         logger.debug(f"query_type is 'stock_price' (confirmed match), proceeding with stock price handling.")
         company_name_or_symbol = extract_company_name(user_input)
 
@@ -344,11 +380,15 @@ def chatbot_response(request):
 
         elif len(possible_matches) > 1:
             # If there are multiple matches, return them to the user for selection
+            # Quote every candidate in one concurrent batch so the list shows prices alongside the names
+            quotes = get_quotes([ticker for _, ticker in possible_matches])
             response_message = "I found multiple companies with that name, please choose the one you're referring to: "
             response_message += "<ul>"
             for name, ticker in possible_matches:
+                quote = quotes.get(ticker.upper())
+                price = f" — ${quote['price']:,.2f}" if quote else ""
                 # Updated to use class and data attributes instead of onclick
-                response_message += f"<li><a href='#' class='stock-link' data-ticker-symbol='{ticker}' data-company-name='{name}'>{name} ({ticker})</a></li>"
+                response_message += f"<li><a href='#' class='stock-link' data-ticker-symbol='{ticker}' data-company-name='{name}'>{name} ({ticker})</a>{price}</li>"
             response_message += "</ul>"
             contains_html = True
 
@@ -434,6 +474,88 @@ def get_stock_price_view(request):
         logger.warning(error_message)
         return JsonResponse({'success': False, 'error': error_message})
 
+@require_GET
+def get_stock_prices_view(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'User not authenticated.'})
+
+    symbols = [symbol.strip() for symbol in request.GET.get('symbols', '').split(',') if symbol.strip()]
+    if not symbols:
+        return JsonResponse({'success': False, 'error': 'No symbols provided.'})
+
+    quotes = get_quotes(symbols)
+    return JsonResponse({'success': True, 'quotes': quotes})
+
+@require_GET
+def similar_places_view(request):
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'User not authenticated.'})
+
+    # Default to the user's profile location
+    city = request.GET.get('city') or user.userprofile.city
+    state = request.GET.get('state') or user.userprofile.state
+    try:
+        k = min(max(int(request.GET.get('k', 5)), 1), 50)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'k must be a number.'})
+    cheaper = request.GET.get('cheaper', '').lower() in ('1', 'true', 'yes')
+
+    if not city or not state:
+        return JsonResponse({'success': False, 'error': 'No city and state provided.'})
+
+    places = find_similar_places(city, state, k=k, cheaper=cheaper)
+    return JsonResponse({'success': True, 'city': city, 'state': state, 'places': places})
+
+@require_GET
+def indicators_view(request):
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'User not authenticated.'})
+
+    ticker = request.GET.get('ticker', '').strip().upper()
+    if not ticker:
+        return JsonResponse({'success': False, 'error': 'No ticker provided.'})
+
+    indicators = get_indicators(ticker)
+    if indicators is None:
+        return JsonResponse({'success': False, 'error': f'No daily bars stored for {ticker}.'})
+    return JsonResponse({'success': True, 'ticker': ticker, 'indicators': indicators})
+
+@require_GET
+def budget_projection_view(request):
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'User not authenticated.'})
+
+    profile = user.userprofile
+    try:
+        if request.GET.get('incomes'):
+            incomes = [float(income) for income in request.GET['incomes'].split(',')]
+        else:
+            # Default to the user's income level, or the median income where they live
+            income = INCOME_LEVEL_ESTIMATES.get(profile.income_level) or get_census_data_msa_or_place(profile.city, profile.state)
+            incomes = [income] if income else []
+        savings_rates = [float(rate) for rate in request.GET['savings_rates'].split(',')] if request.GET.get('savings_rates') else None
+        years = min(max(int(request.GET.get('years', 10)), 1), 50)
+        inflation_rate = float(request.GET.get('inflation', 0.03))
+        income_growth = float(request.GET.get('income_growth', 0.03))
+        savings_return = float(request.GET.get('savings_return', 0.0))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid number in request.'})
+
+    if not incomes:
+        return JsonResponse({'success': False, 'error': 'No income provided and none found for your profile.'})
+    if len(incomes) > MAX_PROJECTION_SCENARIOS or len(savings_rates or []) > MAX_PROJECTION_SCENARIOS:
+        return JsonResponse({'success': False, 'error': f'At most {MAX_PROJECTION_SCENARIOS} incomes and savings rates per request.'})
+    if not all(math.isfinite(number) for number in incomes + (savings_rates or []) + [inflation_rate, income_growth, savings_return]):
+        return JsonResponse({'success': False, 'error': 'Invalid number in request.'})
+
+    goal = request.GET.get('goal') or profile.financial_goals
+    projection = project_budget(incomes, goal, years=years, inflation_rate=inflation_rate, income_growth=income_growth,
+                                savings_rates=savings_rates, savings_return=savings_return)
+    return JsonResponse({'success': True, 'goal': goal, 'categories': projection['categories'], 'rows': projection_rows(projection)})
+
 @login_required
 def audney(request):
     if request.method == 'POST':
@@ -178,3 +178,9 @@ LOGGING = {
 }
 
 LOGIN_URL = '/login'
+
+# Market conditions older than this many seconds are refreshed in the background on the next read
+MARKET_CONDITIONS_TTL = int(os.getenv('MARKET_CONDITIONS_TTL', 12 * 60 * 60))
+
+# ETFs the portfolio optimizer allocates across; `manage.py refresh_market` keeps their daily bars current
+PORTFOLIO_UNIVERSE = ['SPY', 'QQQ', 'IWM', 'EFA', 'AGG', 'TLT', 'GLD', 'VNQ']
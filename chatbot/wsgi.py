@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chatbot.settings")
 
 application = get_wsgi_application()
+
+# Map the Census table before the server forks workers so they all share its pages
+from audney.census_table import load_census_table
+
+load_census_table()